@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the SQL Anywhere Sync Tool
+Measures the costs that matter when the tool is launched by a scheduler.
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+
+
+def _time_command(cmd, runs):
+    """Run a command several times and return the wall-clock durations in ms"""
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def _report(label, durations):
+    print(f"  {label:<32} min {min(durations):8.1f} ms   "
+          f"median {statistics.median(durations):8.1f} ms   max {max(durations):8.1f} ms")
+
+
+def bench_startup(args):
+    """Cold-start time of the script or a built executable"""
+    if args.exe:
+        target = [str(Path(args.exe))]
+    else:
+        target = [sys.executable, "sync.py"]
+
+    print(f"⏱️  Startup benchmark ({args.runs} runs): {' '.join(target)}")
+
+    if not args.exe:
+        # Module import alone, i.e. what every launch pays before main() runs
+        _report("import sync", _time_command([sys.executable, "-c", "import sync"], args.runs))
+    _report("--help", _time_command(target + ["--help"], args.runs))
+    if Path(args.config).exists():
+        _report("--check-config", _time_command(target + ["--config", args.config, "--check-config"], args.runs))
+    else:
+        print(f"  (skipping --check-config: '{args.config}' not found)")
+
+
+# Values chosen to hit every branch of the validators: None, blanks,
+# whitespace padding, bad numbers, string and date-object dates
+_CODES = ["C001", " C002 ", "C003", "", None, "B010"]
+_TEXT = ["Sales", "Receipt", "  Payment ", "", None]
+_NUMBERS = [0, 1, 12.5, "7.25", "bad", None, 0.0, -3]
+_DATES = [date(2024, 4, 1), "2024-05-06", "06/07/2024", "2024/08/09", "not a date", "", None]
+_VOUCHERS = [12, 13.0, " 14 ", "15.0", "x", "", None]
+
+
+def synthetic_rows(table, count, seed=42):
+    """Deterministic raw rows for a table, shaped like DatabaseConnector output"""
+    rng = random.Random(seed)
+    pick = rng.choice
+    rows = []
+    for i in range(count):
+        if table == "acc_ledgers":
+            rows.append({"code": pick(_CODES), "particulars": pick(_TEXT), "debit": pick(_NUMBERS),
+                         "credit": pick(_NUMBERS), "entry_mode": pick(["S", "R", "P", None]),
+                         "entry_date": pick(_DATES), "voucher_no": pick(_VOUCHERS),
+                         "narration": pick(_TEXT), "super_code": pick(["DEBTO", " BANK", None])})
+        elif table == "acc_master":
+            rows.append({"code": pick(_CODES), "name": pick(_TEXT), "super_code": pick(["DEBTO", "SUNCR ", None]),
+                         "opening_balance": pick([0, 10.5, None]), "debit": pick([0, 2, None]),
+                         "credit": pick([1.5, None]), "place": pick(_TEXT), "phone2": pick(["123", None]),
+                         "openingdepartment": pick(["Main", None]), "area": pick(["No Area", " North ", "", None])})
+        elif table == "acc_invmast":
+            rows.append({"modeofpayment": "C", "customerid": pick(_CODES), "invdate": pick(_DATES),
+                         "nettotal": pick(_NUMBERS), "paid": pick(_NUMBERS), "bill_ref": f"S-{i}"})
+        elif table == "cashandbankaccmaster":
+            rows.append({"code": pick(_CODES), "name": pick(_TEXT), "super_code": pick(["CASH", "BANK"]),
+                         "opening_balance": pick([0, 5.5, None]), "opening_date": pick([date(2020, 4, 1), None]),
+                         "debit": pick([0, 3, None]), "credit": pick([0, 1.25, None])})
+        elif table == "users":
+            rows.append({"id": pick(["u1", " u2 ", "", None]), "pass": pick(["p", "", None]),
+                         "role": pick(["admin ", "", None]), "accountcode": pick(["A1", None])})
+        elif table == "misel":
+            rows.append({"firm_name": pick(["Firm", "", None]), "address": pick(_TEXT), "phones": pick(["1", None]),
+                         "mobile": None, "address1": "a", "address2": "", "address3": None,
+                         "pagers": None, "tinno": pick(["T1", None])})
+        elif table == "acc_tt_servicemaster":
+            rows.append({"slno": pick([1, "2", "x", None]), "type": pick(["AREA", None]),
+                         "code": pick(["N", None]), "name": pick(["North", ""])})
+    return rows
+
+
+def _best_of(repeat, fn, *fn_args):
+    """Best wall-clock time of fn(*fn_args) in seconds, with the GC paused while timing"""
+    import gc
+
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn(*fn_args)
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_validators(args):
+    """Time the generated validators against the hand-written ones (equivalence: tests/test_validators.py)"""
+    import sync
+
+    logging.disable(logging.CRITICAL)  # both sides log the same per-row warnings
+    tool = sync.SyncTool.__new__(sync.SyncTool)
+    tool.config = SimpleNamespace(client_id="BENCH")
+    specs = {spec.name: spec for spec in sync.TABLE_REGISTRY}
+    tables = args.tables.split(",") if args.tables else list(sync.VALIDATOR_SCHEMAS)
+
+    print(f"⏱️  Validator benchmark ({args.rows:,} rows)")
+    for table in tables:
+        legacy = getattr(tool, specs[table].validate)
+        compiled = sync.compile_validator(table, sync.VALIDATOR_SCHEMAS[table], {"client_id": "BENCH"})
+        rows = synthetic_rows(table, args.rows)
+        timings = {}
+        for label, fn in (("hand-written", legacy), ("generated", compiled)):
+            timings[label] = _best_of(args.repeat, fn, rows)
+        print(f"  {table:<22} hand-written {timings['hand-written']:7.2f} s   "
+              f"generated {timings['generated']:7.2f} s   "
+              f"speed-up {timings['hand-written'] / timings['generated']:4.2f}x")
+
+    if args.workers:
+        bench_validation_pool(args, tables)
+
+
+def bench_validation_pool(args, tables):
+    """Generated validators in-process vs. on a pool of worker processes"""
+    import sync
+
+    context = {"client_id": "BENCH"}
+    print(f"⏱️  Validation pool ({args.workers} workers, {args.chunk_rows:,} rows per chunk)")
+    pool = sync.create_validation_pool(args.workers, context)
+    try:
+        for table in tables:
+            compiled = sync.compile_validator(table, sync.VALIDATOR_SCHEMAS[table], context)
+            rows = synthetic_rows(table, args.rows)
+            if sync.validate_in_pool(pool, table, rows, args.chunk_rows) != compiled(rows):
+                print(f"  ❌ {table:<22} pool output differs from in-process output")
+                sys.exit(1)
+            single = _best_of(args.repeat, compiled, rows)
+            pooled = _best_of(args.repeat, sync.validate_in_pool, pool, table, rows, args.chunk_rows)
+            print(f"  {table:<22} in-process {single:7.2f} s   pool {pooled:7.2f} s   "
+                  f"speed-up {single / pooled:4.2f}x")
+    finally:
+        pool.shutdown()
+
+
+def bench_pushdown(args):
+    """Equivalence check and timing of pushdown queries against the live database"""
+    import json
+    import threading
+
+    import sync
+
+    logging.disable(logging.CRITICAL)
+    tables = args.tables.split(",") if args.tables else list(sync.DatabaseConnector.PUSHDOWN_SOURCES)
+    specs = {spec.name: spec for spec in sync.TABLE_REGISTRY}
+    tools = {}
+    for pushdown in (False, True):
+        tool = sync.SyncTool(args.config, dry_run=True, settings_overrides={"pushdown": pushdown})
+        if not tool.initialize() or not tool.db_connector.connect():
+            print("❌ Could not connect to the database")
+            sys.exit(1)
+        tool._db_lock = threading.Lock()
+        tool._pool_lock = threading.Lock()
+        tools[pushdown] = tool
+
+    print(f"🧪 Pushdown equivalence on '{args.config}'")
+    failed = False
+    try:
+        for table in tables:
+            results, timings = {}, {}
+            for pushdown, tool in tools.items():
+                start = time.perf_counter()
+                results[pushdown] = tool.validate_rows(specs[table], tool._fetch(specs[table]))
+                timings[pushdown] = time.perf_counter() - start
+            # Without ORDER BY both queries may return rows in any order
+            classic, pushed = ([json.dumps(row, sort_keys=True, default=str) for row in results[p]] for p in (False, True))
+            ok = sorted(classic) == sorted(pushed)
+            failed |= not ok
+            print(f"  {'✅' if ok else '❌'} {table:<22} {len(classic):>9} rows   "
+                  f"fetch+validate {timings[False]:7.2f} s   pushdown {timings[True]:7.2f} s")
+    finally:
+        for tool in tools.values():
+            tool.db_connector.close()
+    if failed:
+        sys.exit(1)
+
+
+def bench_logging(args):
+    """Cost of per-row validation warnings: direct file handler vs. queue, all vs. aggregated"""
+    import tempfile
+
+    import sync
+
+    rows = synthetic_rows("acc_ledgers", args.rows)
+    validate = sync.compile_validator("acc_ledgers", sync.VALIDATOR_SCHEMAS["acc_ledgers"], {"client_id": "BENCH"})
+    root = logging.getLogger()
+    # Keeps logging.warning() from installing a stderr handler via basicConfig
+    root.addHandler(logging.NullHandler())
+    print(f"⏱️  Logging benchmark (acc_ledgers, {args.rows:,} dirty rows)")
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = str(Path(tmp) / "bench.log")
+        scenarios = [
+            ("logging disabled", None, None),
+            ("direct file, every warning", "direct", float("inf")),
+            ("queue, every warning", "queue", float("inf")),
+            ("queue, aggregated", "queue", 5),
+        ]
+        for label, mode, samples in scenarios:
+            Path(log_file).unlink(missing_ok=True)
+            handler = None
+            if mode is None:
+                logging.disable(logging.CRITICAL)
+            elif mode == "direct":
+                handler = logging.FileHandler(log_file, encoding="utf-8")
+                handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+                root.addHandler(handler)
+                root.setLevel(logging.INFO)
+            else:
+                sync.configure_logging(logging.INFO, log_file, console=False)
+            sync.ROW_WARNINGS.samples = samples if samples is not None else 5
+
+            start = time.perf_counter()
+            validate(rows)
+            sync.ROW_WARNINGS.flush()
+            in_loop = time.perf_counter() - start
+            # Time until every record is on disk, including the listener draining the queue
+            if mode == "queue":
+                sync._log_listener.stop()
+                sync._log_listener = None
+                for h in [h for h in root.handlers if not isinstance(h, logging.NullHandler)]:
+                    root.removeHandler(h)
+            elif handler is not None:
+                root.removeHandler(handler)
+                handler.close()
+            written = time.perf_counter() - start
+            logging.disable(logging.NOTSET)
+            lines = sum(1 for _ in open(log_file, encoding="utf-8")) if Path(log_file).exists() else 0
+            print(f"  {label:<28} validate {in_loop:7.2f} s   until written {written:7.2f} s   {lines:>9,} lines")
+
+
+def bench_interning(args):
+    """Memory and upload size of acc_ledgers with and without interning / dictionary encoding"""
+    import gzip
+    import json
+    import tracemalloc
+
+    import sync
+
+    columns = sync.DEFAULT_INTERN_COLUMNS["acc_ledgers"]
+    validate = sync.compile_validator("acc_ledgers", sync.VALIDATOR_SCHEMAS["acc_ledgers"], {"client_id": "BENCH"})
+    print(f"⏱️  Interning benchmark (acc_ledgers, {args.rows:,} rows)")
+    results = {}
+    for interned in (False, True):
+        rows = synthetic_rows("acc_ledgers", args.rows)
+        # The ODBC driver hands back a new str object per value; synthetic_rows shares them
+        rows = [{k: (v + " ")[:-1] if isinstance(v, str) else v for k, v in row.items()} for row in rows]
+        tracemalloc.start()
+        start = time.perf_counter()
+        if interned:
+            interner = sync.ColumnInterner()
+            interner.intern(rows, columns)
+        valid = validate(rows)
+        del rows
+        if interned:
+            interner.intern(valid, columns)
+        seconds = time.perf_counter() - start
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[interned] = valid
+        label = "interned" if interned else "plain"
+        print(f"  {label:<10} {current / 2**20:8.1f} MiB held   {seconds:6.2f} s")
+    if results[False] != results[True]:
+        print("❌ interning changed the validated rows")
+        sys.exit(1)
+
+    batch = results[True][:args.batch_size]
+    plain = json.dumps(batch, separators=(",", ":")).encode()
+    encoded = json.dumps(sync.dictionary_encode(batch, columns), separators=(",", ":")).encode()
+    print(f"  {args.batch_size:,}-row batch  rows {len(plain):>10,} B (gzip {len(gzip.compress(plain)):,})   "
+          f"dictionary {len(encoded):>10,} B (gzip {len(gzip.compress(encoded)):,})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync Tool benchmarks")
+    sub = parser.add_subparsers(dest="benchmark")
+    sub.required = True
+
+    startup = sub.add_parser("startup", help="Measure cold-start time")
+    startup.add_argument("--exe", help="Built executable to measure (default: python sync.py)")
+    startup.add_argument("--runs", type=int, default=10)
+    startup.add_argument("--config", default="config.json")
+    startup.set_defaults(func=bench_startup)
+
+    validators = sub.add_parser("validators", help="Time the generated validators against the hand-written ones")
+    validators.add_argument("--rows", type=int, default=1000000)
+    validators.add_argument("--repeat", type=int, default=3)
+    validators.add_argument("--tables", help="Comma-separated tables (default: all with a schema)")
+    validators.add_argument("--workers", type=int, help="Also time validation on this many worker processes")
+    validators.add_argument("--chunk-rows", type=int, default=50000)
+    validators.set_defaults(func=bench_validators)
+
+    log_bench = sub.add_parser("logging", help="Measure the cost of per-row warnings in validation loops")
+    log_bench.add_argument("--rows", type=int, default=500000)
+    log_bench.set_defaults(func=bench_logging)
+
+    pushdown = sub.add_parser("pushdown", help="Check pushdown queries return what Python validation does")
+    pushdown.add_argument("--config", default="config.json")
+    pushdown.add_argument("--tables", help="Comma-separated tables (default: all with a pushdown query)")
+    pushdown.set_defaults(func=bench_pushdown)
+
+    interning = sub.add_parser("interning", help="Measure string interning and dictionary-encoded uploads")
+    interning.add_argument("--rows", type=int, default=500000)
+    interning.add_argument("--batch-size", type=int, default=5000)
+    interning.set_defaults(func=bench_interning)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Build script to create standalone executable for SQL Anywhere Sync Tool
 This script uses PyInstaller to create a single executable file.
 """
 
+import argparse
 import os
 import sys
 import subprocess
@@ -61,33 +62,33 @@ def create_build_directory():
     build_dir.mkdir(exist_ok=True)
     print("📁 Build directory created")
 
-def build_executable():
+def build_executable(onedir=False):
     """Build the executable using PyInstaller"""
-    print("🔨 Building executable...")
+    print(f"🔨 Building {'one-folder' if onedir else 'one-file'} executable...")
     
-    # PyInstaller command
+    # PyInstaller command - build options (excludes, bytecode optimization,
+    # onefile/onedir layout) live in SyncTool.spec
     cmd = [
         "pyinstaller",
-        "--onefile",                    # Create single executable
-        "--console",                    # Keep console window
-        "--name", "SyncTool",          # Executable name
+        "SyncTool.spec",               # Startup-optimized spec
         "--clean",                      # Clean cache
         "--noconfirm",                 # Don't ask for confirmation
         "--distpath", "dist",          # Output directory
         "--workpath", "build",         # Work directory
-        "--specpath", ".",             # Spec file location
-        "sync.py"                      # Main script
     ]
     
+    env = dict(os.environ)
+    env["SYNCTOOL_ONEDIR"] = "1" if onedir else "0"
+    
     try:
-        subprocess.check_call(cmd)
+        subprocess.check_call(cmd, env=env)
         print("✅ Executable built successfully")
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Build failed: {e}")
         return False
 
-def create_deployment_package():
+def create_deployment_package(onedir=False):
     """Create deployment package with executable and config"""
     print("📦 Creating deployment package...")
     
@@ -96,19 +97,28 @@ def create_deployment_package():
     if deploy_dir.exists():
         shutil.rmtree(deploy_dir)
     
-    deploy_dir.mkdir()
-    
-    # Copy executable
-    exe_source = Path("dist/SyncTool.exe")
-    if not exe_source.exists():
-        exe_source = Path("dist/SyncTool")  # Linux/Mac
-    
-    if exe_source.exists():
-        shutil.copy2(exe_source, deploy_dir / exe_source.name)
-        print("✅ Executable copied to deployment package")
+    if onedir:
+        # One-folder build: the executable and its support files live together
+        onedir_source = Path("dist/SyncTool")
+        if not onedir_source.is_dir():
+            print("❌ One-folder build not found")
+            return False
+        shutil.copytree(onedir_source, deploy_dir)
+        print("✅ One-folder build copied to deployment package")
     else:
-        print("❌ Executable not found")
-        return False
+        deploy_dir.mkdir()
+        
+        # Copy executable
+        exe_source = Path("dist/SyncTool.exe")
+        if not exe_source.exists():
+            exe_source = Path("dist/SyncTool")  # Linux/Mac
+        
+        if exe_source.exists():
+            shutil.copy2(exe_source, deploy_dir / exe_source.name)
+            print("✅ Executable copied to deployment package")
+        else:
+            print("❌ Executable not found")
+            return False
     
     # Copy config file
     config_source = Path("config.json")
@@ -203,8 +213,16 @@ For support, check the log files for detailed error messages.
     print(f"🎉 Deployment package created in '{deploy_dir}' directory")
     return True
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the SQL Anywhere Sync Tool executable")
+    parser.add_argument("--onedir", action="store_true",
+                        help="Build a one-folder package (faster startup, no unpack on every launch)")
+    return parser.parse_args()
+
 def main():
     """Main build process"""
+    args = parse_args()
+    
     print("=" * 60)
     print("    SQL Anywhere Sync Tool - Build Script")
     print("=" * 60)
@@ -229,11 +247,11 @@ def main():
     create_build_directory()
     
     # Build executable
-    if not build_executable():
+    if not build_executable(onedir=args.onedir):
         sys.exit(1)
     
     # Create deployment package
-    if not create_deployment_package():
+    if not create_deployment_package(onedir=args.onedir):
         sys.exit(1)
     
     print()
@@ -244,6 +262,7 @@ def main():
     print("1. Edit config.json with your database and API details")
     print("2. Test the executable on your system")
     print("3. Distribute the 'SQLAnywhereSync' folder to users")
+    print("4. Measure cold start with: python bench.py startup")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Mock Web API for testing the SQL Anywhere Sync Tool
+Accepts the upload endpoints and the bulk-import protocol and keeps the
+received rows in memory. Injected failures (--fail-rate) either reject a
+request or apply it and lose the response; replays carrying the same
+Idempotency-Key are answered without being applied again. Dictionary-encoded
+uploads (encoding=dictionary) are decoded back into rows, and /verify-ranges/
+answers range hashes for reconciliation; /upload-bundle/ applies several
+tables from one gzip-compressed envelope. Run it and point api.base_url at it:
+
+    python mock_api.py --port 8765 --fail-rate 0.2
+    "api": {"base_url": "http://127.0.0.1:8765/api"}
+
+--replicas N serves the same data on N consecutive ports, for api.base_urls
+load balancing and failover; in scripts, pass one MockAPIState to several
+MockAPIServers and set .delay or .down on each to make a replica slow or
+unreachable (answering 503).
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _range_key(row, field) -> str:
+    value = row.get(field)
+    return "" if value is None else str(value)
+
+
+class MockAPIState:
+    """What the mock server has received, shared by all handler threads"""
+    def __init__(self, fail_rate: float = 0.0, seed: int = 0, fail_methods=("POST", "PUT"),
+                 retry_after: float = None):
+        self.lock = threading.Lock()
+        self.fail_rate = fail_rate
+        self.fail_methods = set(fail_methods)
+        self.retry_after = retry_after
+        self.idempotent = {}  # Idempotency-Key -> (status, body) already answered
+        self.replays = 0
+        self.random = random.Random(seed)
+        self.tables = {}      # table -> list of rows currently stored
+        self.requests = []    # (method, path, query) of every request
+        self.bulk = {}        # upload_id -> session dict
+
+    def should_fail(self, method: str) -> bool:
+        with self.lock:
+            return method in self.fail_methods and self.fail_rate > 0 and self.random.random() < self.fail_rate
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    server_version = "MockSyncAPI/1.0"
+
+    @property
+    def state(self) -> MockAPIState:
+        return self.server.state
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _route(self):
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split("/") if p]
+        if parts and parts[0] == "api":
+            parts = parts[1:]
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        with self.state.lock:
+            self.state.requests.append((self.command, parsed.path, query))
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        return parts, query
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self, status: int, body=None, headers=None):
+        data = json.dumps(body if body is not None else {}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        parts, _ = self._route()
+        if self.server.down:
+            return self._reply(503, {"error": "replica down"})
+        if parts == ["health"]:
+            return self._reply(200, {"status": "ok"})
+        if len(parts) == 2 and parts[0] == "bulk-import":
+            session = self.state.bulk.get(parts[1])
+            if session is None:
+                return self._reply(404, {"error": "unknown upload"})
+            return self._reply(200, {"offset": len(session["data"]), "size": session["size"]})
+        self._reply(404, {"error": "not found"})
+
+    def do_PUT(self):
+        parts, _ = self._route()
+        body = self._body()
+        if self.server.down:
+            return self._reply(503, {"error": "replica down"})
+        if len(parts) != 2 or parts[0] != "bulk-import":
+            return self._reply(404, {"error": "not found"})
+        session = self.state.bulk.get(parts[1])
+        if session is None:
+            return self._reply(404, {"error": "unknown upload"})
+        start = int(self.headers["Content-Range"].split()[1].split("-")[0])
+        if self.state.should_fail(self.command):
+            # Half the injected failures lose the response after storing the chunk
+            if start == len(session["data"]) and self.state.random.random() < 0.5:
+                session["data"] += body
+            return self._fail()
+        if start != len(session["data"]):
+            return self._reply(409, {"error": "offset mismatch", "offset": len(session["data"])})
+        session["data"] += body
+        self._reply(200, {"offset": len(session["data"])})
+
+    def do_POST(self):
+        parts, query = self._route()
+        body = self._body()
+        if self.server.down:
+            return self._reply(503, {"error": "replica down"})
+        key = self.headers.get("Idempotency-Key")
+        with self.state.lock:
+            replayed = self.state.idempotent.get(key) if key else None
+        if replayed is not None:
+            # Already applied: answer as before without applying it twice
+            with self.state.lock:
+                self.state.replays += 1
+            return self._reply(*replayed)
+        fail = self.state.should_fail(self.command)
+        if fail and self.state.random.random() >= 0.5:
+            return self._fail()
+        if parts and parts[0] == "bulk-import":
+            result = self._bulk_post(parts, json.loads(body or b"{}"))
+        elif parts == ["upload-bundle"]:
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            result = self._bundle(json.loads(body))
+        elif parts == ["verify-ranges"]:
+            result = self._verify_ranges(query["table"], json.loads(body))
+        elif len(parts) == 1 and parts[0].startswith("upload-"):
+            result = self._upload(parts[0][len("upload-"):].replace("-", "_"), query, json.loads(body or b"[]"))
+        else:
+            result = (404, {"error": "not found"})
+        if key:
+            with self.state.lock:
+                self.state.idempotent[key] = result
+        if fail:
+            # The other half of the injected failures lose the response after applying
+            return self._fail()
+        self._reply(*result)
+
+    def _fail(self):
+        headers = {}
+        if self.state.retry_after is not None:
+            headers["Retry-After"] = str(self.state.retry_after)
+        self._reply(503, {"error": "injected failure"}, headers)
+
+    @staticmethod
+    def _decode(payload):
+        """Expand a dictionary-encoded upload back into row dicts"""
+        fields, dictionaries = payload["fields"], payload["dictionaries"]
+        lookups = [(fields.index(column), values) for column, values in dictionaries.items()]
+        rows = []
+        for values in payload["rows"]:
+            for i, table in lookups:
+                if values[i] is not None:
+                    values[i] = table[values[i]]
+            rows.append(dict(zip(fields, values)))
+        return rows
+
+    def _upload(self, table: str, query, payload):
+        if query.get("encoding") == "dictionary":
+            payload = self._decode(payload)
+        with self.state.lock:
+            if isinstance(payload, dict) and "replace_ranges" in payload:
+                length = payload["range_length"]
+                replace = set(payload["replace_ranges"])
+                rows = [r for r in self.state.tables.get(table, [])
+                        if _range_key(r, payload["range_field"])[:length] not in replace]
+                self.state.tables[table] = rows + payload["rows"]
+            elif isinstance(payload, dict) and "replace_keys" in payload:
+                key = payload["key_field"]
+                replace = set(payload["replace_keys"])
+                rows = [r for r in self.state.tables.get(table, []) if str(r.get(key)) not in replace]
+                self.state.tables[table] = rows + payload["rows"]
+            elif query.get("append") == "true" or query.get("upsert") == "true":
+                self.state.tables.setdefault(table, []).extend(payload)
+            else:
+                self.state.tables[table] = list(payload)
+        return 200, {"received": len(payload) if isinstance(payload, list) else len(payload.get("rows", []))}
+
+    def _bundle(self, envelope):
+        """Apply each table of an upload bundle on its own and report per table"""
+        results = {}
+        for entry in envelope["tables"]:
+            table = entry["table"]
+            if table in self.server.reject_tables:
+                results[table] = {"status": "error", "error": "rejected by mock"}
+                continue
+            query = {"upsert": "true"} if entry.get("mode") == "upsert" else {}
+            status, body = self._upload(table, query, entry["rows"])
+            results[table] = {"status": "ok", **body}
+        return 200, {"results": results}
+
+    def _verify_ranges(self, table: str, payload):
+        """Range hashes of the stored rows, computed like sync.RangeHashes"""
+        field, length = payload["field"], payload["length"]
+        within = set(payload["within"]) if payload.get("within") is not None else None
+        sums = {}
+        with self.state.lock:
+            rows = list(self.state.tables.get(table, []))
+        for row in rows:
+            key = _range_key(row, field)
+            if within is not None and key[:payload.get("within_length", 0)] not in within:
+                continue
+            digest = hashlib.sha256(json.dumps(row, sort_keys=True, separators=(",", ":")).encode("utf-8")).digest()
+            entry = sums.setdefault(key[:length], [0, 0])
+            entry[0] += 1
+            entry[1] += int.from_bytes(digest[:16], "big")
+        return 200, {"ranges": {prefix: {"count": count, "hash": format(total % (1 << 128), "032x")}
+                                for prefix, (count, total) in sums.items()}}
+
+    def _bulk_post(self, parts, payload):
+        if len(parts) == 1:
+            upload_id = uuid.uuid4().hex
+            self.state.bulk[upload_id] = dict(payload, data=b"")
+            return 201, {"upload_id": upload_id}
+        session = self.state.bulk.get(parts[1])
+        if session is None or parts[2:] != ["complete"]:
+            return 404, {"error": "unknown upload"}
+        if len(session["data"]) != session["size"] or hashlib.sha256(session["data"]).hexdigest() != session["sha256"]:
+            return 422, {"error": "incomplete or corrupt upload"}
+        text = gzip.decompress(session["data"]).decode("utf-8")
+        if session["format"] == "csv":
+            rows = list(csv.DictReader(io.StringIO(text, newline="")))
+        else:
+            rows = [json.loads(line) for line in text.splitlines() if line]
+        with self.state.lock:
+            if session.get("mode") == "upsert":
+                self.state.tables.setdefault(session["table"], []).extend(rows)
+            else:
+                self.state.tables[session["table"]] = rows
+        del self.state.bulk[parts[1]]
+        return 200, {"rows": len(rows)}
+
+
+class MockAPIServer:
+    """
+    Mock API on a background thread; use as a context manager in scripts.
+    Servers given the same state act as replicas of one backend.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, fail_rate: float = 0.0,
+                 seed: int = 0, verbose: bool = False, fail_methods=("POST", "PUT"), retry_after: float = None,
+                 state: MockAPIState = None):
+        self.httpd = ThreadingHTTPServer((host, port), MockAPIHandler)
+        self.httpd.state = state or MockAPIState(fail_rate, seed, fail_methods, retry_after)
+        self.httpd.verbose = verbose
+        self.httpd.reject_tables = set()  # tables the bundle endpoint reports as failed
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = 0           # requests this replica received
+        self.httpd.delay = 0.0            # seconds added to every request
+        self.httpd.down = False           # answer everything with 503
+        self._thread = None
+
+    @property
+    def state(self) -> MockAPIState:
+        return self.httpd.state
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self) -> "MockAPIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Web API for the Sync Tool")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 503")
+    parser.add_argument("--fail-methods", default="POST,PUT",
+                        help="Comma-separated HTTP methods --fail-rate applies to (default: POST,PUT)")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with injected failures")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replicas", type=int, default=1,
+                        help="Serve the same data on this many consecutive ports (for api.base_urls)")
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="Seconds added to every request of the last replica (to see latency weighting)")
+    args = parser.parse_args()
+
+    state = MockAPIState(args.fail_rate, args.seed, [m.strip().upper() for m in args.fail_methods.split(",")],
+                         args.retry_after)
+    servers = [MockAPIServer(args.host, args.port + i, verbose=True, state=state) for i in range(args.replicas)]
+    servers[-1].httpd.delay = args.delay
+    for server in servers:
+        print(f"🧪 Mock API listening on {server.base_url} (Ctrl+C to stop)")
+    for server in servers[:-1]:
+        server.start()
+    try:
+        servers[-1].httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers[:-1]:
+            server.stop()
+        servers[-1].httpd.server_close()
+        for server in servers:
+            print(f"  {server.base_url}: {server.httpd.requests} requests")
+        for table, rows in sorted(state.tables.items()):
+            print(f"  {table:<24} {len(rows)} rows")
+
+
+if __name__ == "__main__":
+    main()
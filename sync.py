@@ -4,18 +4,279 @@ SQL Anywhere to Web API Sync Tool
 Connects to SQL Anywhere database via ODBC and syncs data to web API
 """
 
+import abc
+import argparse
+import contextlib
+import io
 import json
 import logging
 import os
 import sys
 import traceback
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Dict, Any, Optional
 
-import pyodbc
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+# pyodbc, requests and urllib3 are imported lazily where they are first used.
+# The tool is shipped as a PyInstaller executable that a scheduler launches
+# every few minutes, so --help and --check-config must not pay for loading the
+# ODBC driver manager or the HTTP stack. --dry-run still reads the database
+# (pyodbc) but never loads the HTTP stack.
+
+
+# SQL Anywhere DATEFORMAT patterns for ledger aggregation periods
+LEDGER_PERIOD_FORMATS = {"day": "yyyy-mm-dd", "month": "yyyy-mm"}
+
+
+class RowWarnings:
+    """
+    Warnings raised per row inside validation loops. The first `samples`
+    occurrences of each kind are logged, later ones are only counted and
+    flush() logs the totals, so a dirty table costs a handful of log lines
+    instead of one per bad row. Messages use logging's lazy %-formatting.
+    """
+    def __init__(self, samples: int = 5):
+        import threading
+
+        self.samples = samples
+        self._counts: Dict[str, int] = {}
+        self._reported: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def warn(self, kind: str, message: str, *args):
+        with self._lock:
+            count = self._counts.get(kind, 0) + 1
+            self._counts[kind] = count
+        if count <= self.samples:
+            logging.warning(message, *args)
+            if count == self.samples:
+                logging.warning(f"Further '{kind}' warnings will be counted and summarized")
+
+    def take_counts(self) -> Dict[str, int]:
+        """Counts since the last call, for a worker process to hand to the parent"""
+        with self._lock:
+            delta = {kind: count - self._reported.get(kind, 0) for kind, count in self._counts.items()}
+            self._reported = dict(self._counts)
+        return {kind: count for kind, count in delta.items() if count}
+
+    def reset(self):
+        """Forget all counts without logging them (a forked worker starts from the parent's)"""
+        with self._lock:
+            self._counts, self._reported = {}, {}
+
+    def merge(self, counts: Dict[str, int]):
+        with self._lock:
+            for kind, count in counts.items():
+                self._counts[kind] = self._counts.get(kind, 0) + count
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts, self._reported = self._counts, {}, {}
+        for kind, count in counts.items():
+            if count > self.samples:
+                logging.warning(f"⚠️ {count} '{kind}' warnings in total (first {self.samples} logged)")
+
+
+ROW_WARNINGS = RowWarnings()
+
+# Background listener writing the records queued by the root logger
+_log_listener = None
+
+
+def configure_logging(level: int = logging.INFO, log_file: Optional[str] = None,
+                      max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5, console: bool = True):
+    """
+    Route all logging through a queue: callers only enqueue records and a
+    listener thread formats them and writes to stdout and, when log_file is
+    given, a rotating log file. Safe to call again to change the outputs.
+    """
+    import atexit
+    import queue
+    from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+    global _log_listener
+    root = logging.getLogger()
+    if _log_listener is not None:
+        _log_listener.stop()
+    else:
+        atexit.register(lambda: _log_listener.stop() if _log_listener is not None else None)
+    for handler in [h for h in root.handlers if isinstance(h, QueueHandler)]:
+        root.removeHandler(handler)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [logging.StreamHandler(sys.stdout)] if console else []
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        handlers.append(RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                            encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+    _log_listener = QueueListener(log_queue, *handlers)
+    _log_listener.start()
+
+
+# Low-cardinality columns repeated across many rows: {table: columns}
+DEFAULT_INTERN_COLUMNS = {
+    "acc_ledgers": ["particulars", "entry_mode", "entry_date", "super_code"],
+}
+
+
+class ColumnInterner:
+    """
+    Makes every row share one str object per distinct value of the given
+    low-cardinality columns (super_code, entry_mode, dates...), so a
+    million ledger rows hold a few thousand strings instead of millions.
+    A column that reaches max_distinct values is not low-cardinality: its
+    pool is dropped and the column is left alone from there on.
+    """
+    def __init__(self, max_distinct: int = 50000):
+        self.max_distinct = max_distinct
+        self._pools: Dict[str, Dict[str, str]] = {}
+        self._skipped = set()
+
+    def intern(self, rows: List[Dict[str, Any]], columns) -> List[Dict[str, Any]]:
+        for column in columns:
+            if column in self._skipped:
+                continue
+            pool = self._pools.setdefault(column, {})
+            get = pool.get
+            for row in rows:
+                value = row.get(column)
+                if value.__class__ is str:
+                    shared = get(value)
+                    if shared is None:
+                        if len(pool) >= self.max_distinct:
+                            logging.debug(f"Column {column} reached {self.max_distinct} distinct values, no longer interned")
+                            self._skipped.add(column)
+                            del self._pools[column]
+                            break
+                        shared = pool[value] = value
+                    row[column] = shared
+        return rows
+
+
+def dictionary_encode(rows: List[Dict[str, Any]], columns) -> Dict[str, Any]:
+    """
+    Encode rows for upload as {"fields", "dictionaries", "rows"}: rows become
+    value lists in "fields" order, and each dictionary-encoded column holds
+    an index into its code table ("dictionaries"[column]). Each payload
+    carries its own code tables, so batches stay independent of each other.
+    """
+    fields = list(rows[0])
+    encoded = [column for column in columns if column in rows[0]]
+    tables = {column: {} for column in encoded}
+    positions = [(fields.index(column), tables[column]) for column in encoded]
+    out = []
+    for row in rows:
+        values = [row.get(field) for field in fields]
+        for i, codes in positions:
+            value = values[i]
+            if value is not None:
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(codes)
+                values[i] = code
+        out.append(values)
+    return {"fields": fields, "dictionaries": {column: list(codes) for column, codes in tables.items()}, "rows": out}
+
+
+class RangeHashes:
+    """
+    Order-independent hashes of a table's rows grouped by ranges of one
+    field: the first `length` characters of its value ("2024" / "2024-05"
+    of a date, "C" / "C0" of a code), "" when the value is null.
+
+    A row hashes as sha256 of its JSON (sorted keys, no spaces); a range's
+    hash is the sum of its first 16 bytes over the range's rows, mod 2**128,
+    as 32 hex digits. The verification endpoint computes the same over the
+    rows it stores, so equal {"count", "hash"} means the range is in sync.
+    """
+    def __init__(self, rows: List[Dict[str, Any]], field: str):
+        import hashlib
+
+        self.rows = rows
+        self.keys = ["" if row.get(field) is None else str(row.get(field)) for row in rows]
+        self.digests = [int.from_bytes(hashlib.sha256(
+            json.dumps(row, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")).digest()[:16], "big")
+            for row in rows]
+
+    def level(self, length: int, within: Optional[List[str]] = None,
+              within_length: int = 0) -> Dict[str, Dict[str, Any]]:
+        """{range: {"count", "hash"}} at one prefix length, optionally only inside the given parent ranges"""
+        parents = set(within) if within is not None else None
+        sums: Dict[str, List[int]] = {}
+        for key, digest in zip(self.keys, self.digests):
+            if parents is not None and key[:within_length] not in parents:
+                continue
+            entry = sums.setdefault(key[:length], [0, 0])
+            entry[0] += 1
+            entry[1] += digest
+        return {prefix: {"count": count, "hash": format(total % (1 << 128), "032x")}
+                for prefix, (count, total) in sums.items()}
+
+    def rows_in(self, prefixes: List[str], length: int) -> Dict[str, List[Dict[str, Any]]]:
+        wanted = {prefix: [] for prefix in prefixes}
+        for key, row in zip(self.keys, self.rows):
+            bucket = wanted.get(key[:length])
+            if bucket is not None:
+                bucket.append(row)
+        return wanted
+
+
+class NaturalKeyIndex:
+    """
+    In-memory hash index over a table's natural key, built while validating.
+    Rows whose key was already seen are exact duplicates (dropped silently)
+    or conflicts, resolved by policy:
+      first-wins - keep the first row seen
+      last-wins  - keep the last row seen (in the first row's position)
+      reject     - keep the first row but report the table as failed
+    Rows with a NULL key part identify nothing and are always kept.
+    """
+    POLICIES = ("first-wins", "last-wins", "reject")
+
+    def __init__(self, table: str, key_fields: tuple, policy: str = "first-wins"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown duplicate policy: {policy}")
+        self.table = table
+        self.key_fields = key_fields
+        self.policy = policy
+        self._rows: List[Dict[str, Any]] = []
+        self._positions: Dict[tuple, int] = {}
+        self.duplicates = 0
+        self.unkeyed = 0
+        self.conflicts: List[tuple] = []
+
+    def key(self, row: Dict[str, Any]) -> tuple:
+        # Whitespace is not significant in ERP codes ("C001 " == "C001")
+        return tuple(str(row.get(f)).strip() if row.get(f) is not None else None for f in self.key_fields)
+
+    def add(self, row: Dict[str, Any]):
+        key = self.key(row)
+        if None in key:
+            self.unkeyed += 1
+            self._rows.append(row)
+            return
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(self._rows)
+            self._rows.append(row)
+        elif self._rows[position] == row:
+            self.duplicates += 1
+        else:
+            self.conflicts.append(key)
+            if self.policy == "last-wins":
+                self._rows[position] = row
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return list(self._rows)
+
+    @property
+    def rejected(self) -> bool:
+        return self.policy == "reject" and bool(self.conflicts)
 
 
 class DatabaseConfig:
@@ -43,6 +304,12 @@ class DatabaseConfig:
     @property
     def api_base_url(self): return self.config["api"]["base_url"]
     @property
+    def api_base_urls(self):
+        """api.base_url first, then the replicas listed in api.base_urls (same backend behind each)"""
+        return list(dict.fromkeys([self.api_base_url] + list(self.config["api"].get("base_urls", []))))
+    @property
+    def api_endpoint_recheck_seconds(self): return self.config["api"].get("endpoint_recheck_seconds", 30)
+    @property
     def api_timeout(self): return self.config["api"].get("timeout", 120)  # Increased default to 120
     @property
     def client_id(self): return self.config["settings"]["client_id"]
@@ -56,18 +323,376 @@ class DatabaseConfig:
     def large_table_batch_size(self): return self.config["settings"].get("large_table_batch_size", 500)
     @property
     def log_level(self): return self.config["settings"].get("log_level", "INFO")
+    @property
+    def max_workers(self): return self.config["settings"].get("max_workers", 4)
+    @property
+    def ledger_mode(self): return self.config["settings"].get("ledger_mode", "detail")  # "detail" or "aggregated"
+    @property
+    def ledger_aggregate_period(self): return self.config["settings"].get("ledger_aggregate_period", "month")  # "day" or "month"
+    @property
+    def ledger_detail_days(self): return self.config["settings"].get("ledger_detail_days", 90)
+    @property
+    def ledger_aggregation_enabled(self): return self.ledger_mode == "aggregated"
+    @property
+    def snapshot_extraction(self): return self.config["settings"].get("snapshot_extraction", False)
+    @property
+    def extraction_mode(self): return self.config["settings"].get("extraction_mode", "full")  # "full" or "cdc"
+    @property
+    def watch_interval_seconds(self): return self.config["settings"].get("watch_interval_seconds", 30)
+    @property
+    def watch_jitter_seconds(self): return self.config["settings"].get("watch_jitter_seconds", 5)
+    @property
+    def outbox_enabled(self): return self.config["settings"].get("outbox_enabled", False)
+    @property
+    def outbox_path(self): return self.config["settings"].get("outbox_path", "outbox.db")
+    @property
+    def outbox_mode(self): return self.config["settings"].get("outbox_mode", "on_failure")  # "on_failure" or "always"
+    @property
+    def outbox_drain_seconds(self): return self.config["settings"].get("outbox_drain_seconds", 60)
+    @property
+    def export_format(self): return self.config["settings"].get("export_format")  # None, "parquet" or "arrow"
+    @property
+    def export_dir(self): return self.config["settings"].get("export_dir", "exports")
+    @property
+    def export_row_group_size(self): return self.config["settings"].get("export_row_group_size", 100000)
+    @property
+    def export_compression(self): return self.config["settings"].get("export_compression", "zstd")
+    @property
+    def export_only(self): return self.config["settings"].get("export_only", False)
+    @property
+    def compiled_validators(self): return self.config["settings"].get("compiled_validators", False)
+    @property
+    def duplicate_policy(self): return self.config["settings"].get("duplicate_policy")  # None = dedup only for upserts
+    @property
+    def upload_mode(self): return self.config["settings"].get("upload_mode", "replace")  # "replace" or "upsert"
+    @property
+    def reference_cache(self): return self.config["settings"].get("reference_cache", False)
+    @property
+    def reference_cache_path(self): return self.config["settings"].get("reference_cache_path", "reference_cache.json")
+    @property
+    def resolve_references(self): return self.config["settings"].get("resolve_references", True)
+    @property
+    def intern_columns(self): return self.config["settings"].get("intern_columns", DEFAULT_INTERN_COLUMNS)
+    @property
+    def dictionary_upload(self): return self.config["settings"].get("dictionary_upload", False)
+    @property
+    def period_partitions(self): return self.config["settings"].get("period_partitions", False)
+    @property
+    def partitions_path(self): return self.config["settings"].get("partitions_path", "partitions.json")
+    @property
+    def financial_year_start_month(self): return self.config["settings"].get("financial_year_start_month", 4)
+    @property
+    def open_financial_years(self): return self.config["settings"].get("open_financial_years", 2)  # current + previous
+    @property
+    def partition_revalidate_hours(self): return self.config["settings"].get("partition_revalidate_hours", 168)
+    @property
+    def revalidate_partitions(self): return self.config["settings"].get("revalidate_partitions", False)
+    @property
+    def reconcile(self): return self.config["settings"].get("reconcile", False)
+    @property
+    def pushdown(self): return self.config["settings"].get("pushdown", False)
+    @property
+    def validation_workers(self): return self.config["settings"].get("validation_workers", 0)  # 0/1 = in-process
+    @property
+    def validation_min_rows(self): return self.config["settings"].get("validation_min_rows", 200000)
+    @property
+    def validation_chunk_rows(self): return self.config["settings"].get("validation_chunk_rows", 50000)
+    @property
+    def retry(self): return self.config["settings"].get("retry", {})
+    @property
+    def retry_endpoints(self): return self.config["settings"].get("retry_endpoints", {})
+    @property
+    def run_history_path(self): return self.config["settings"].get("run_history_path", "run_history.jsonl")
+    @property
+    def auto_tune(self): return self.config["settings"].get("auto_tune", False)
+    @property
+    def target_request_bytes(self): return self.config["settings"].get("target_request_bytes", 1024 * 1024)
+    @property
+    def bundle_tables(self): return self.config["settings"].get("bundle_tables", [])
+    @property
+    def bulk_tables(self): return self.config["settings"].get("bulk_tables", [])
+    @property
+    def bulk_format(self): return self.config["settings"].get("bulk_format", "ndjson")  # "ndjson" or "csv"
+    @property
+    def bulk_dir(self): return self.config["settings"].get("bulk_dir", "bulk")
+    @property
+    def bulk_chunk_bytes(self): return self.config["settings"].get("bulk_chunk_bytes", 8 * 1024 * 1024)
+    @property
+    def log_dir(self): return self.config["settings"].get("log_dir", ".")
+    @property
+    def log_file(self): return self.config["settings"].get("log_file", "sync.log")  # in log_dir; "" = console only
+    @property
+    def log_max_bytes(self): return self.config["settings"].get("log_max_bytes", 10 * 1024 * 1024)
+    @property
+    def log_backup_count(self): return self.config["settings"].get("log_backup_count", 5)
+    @property
+    def log_row_warning_samples(self): return self.config["settings"].get("log_row_warning_samples", 5)
+    @property
+    def profile(self): return self.config["settings"].get("profile", False)
+    @property
+    def trace_memory(self): return self.config["settings"].get("trace_memory", False)
+    @property
+    def profile_top_n(self): return self.config["settings"].get("profile_top_n", 25)
+
+    def identifier_problems(self) -> List[str]:
+        """Table names configured in settings are spliced into SQL, so only plain identifiers are allowed"""
+        import re
+
+        problems = []
+        for name in ("table_name_users", "table_name_misel"):
+            value = getattr(self, name)
+            if not isinstance(value, str) or not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?", value):
+                problems.append(f"'settings.{name}' must be a table name like 'owner.table', got {value!r}")
+        return problems
+
+    def table_settings(self, table: str) -> Dict[str, Any]:
+        """Per-table overrides from settings.tables.<table> (batch_size, retries, deadline_seconds, partition_revalidate_hours)"""
+        return self.config["settings"].get("tables", {}).get(table, {})
+
+    def validate(self) -> List[str]:
+        """Return a list of configuration problems (empty when the config is usable)"""
+        problems = []
+        required = {
+            "database": ["dsn", "username", "password"],
+            "api": ["base_url"],
+            "settings": ["client_id"],
+        }
+        for section, keys in required.items():
+            if not isinstance(self.config.get(section), dict):
+                problems.append(f"Missing section '{section}'")
+                continue
+            for key in keys:
+                if key not in self.config[section]:
+                    problems.append(f"Missing '{section}.{key}'")
+        if problems:
+            return problems
+
+        problems.extend(self.identifier_problems())
+        for name in ("batch_size", "large_table_batch_size", "max_workers", "watch_interval_seconds", "profile_top_n",
+                     "bulk_chunk_bytes", "validation_chunk_rows", "open_financial_years", "target_request_bytes"):
+            value = getattr(self, name)
+            if not isinstance(value, int) or value <= 0:
+                problems.append(f"'settings.{name}' must be a positive integer, got {value!r}")
+        if not isinstance(self.validation_workers, int) or self.validation_workers < 0:
+            problems.append(f"'settings.validation_workers' must be a non-negative integer, got {self.validation_workers!r}")
+        if not isinstance(self.api_timeout, (int, float)) or self.api_timeout <= 0:
+            problems.append(f"'api.timeout' must be a positive number, got {self.api_timeout!r}")
+        policies = [self.duplicate_policy] if self.duplicate_policy is not None else []
+        policies += [t["duplicate_policy"] for t in self.config["settings"].get("tables", {}).values()
+                     if t.get("duplicate_policy") is not None]
+        for policy in policies:
+            if policy not in NaturalKeyIndex.POLICIES:
+                problems.append(f"Duplicate policy must be one of {', '.join(NaturalKeyIndex.POLICIES)}, got {policy!r}")
+        if self.export_format is not None and self.export_format not in ArrowFileSink.FORMATS:
+            problems.append(f"'settings.export_format' must be one of {', '.join(ArrowFileSink.FORMATS)}, got {self.export_format!r}")
+        if self.outbox_mode not in ("on_failure", "always"):
+            problems.append(f"'settings.outbox_mode' must be 'on_failure' or 'always', got {self.outbox_mode!r}")
+        if self.upload_mode not in ("replace", "upsert"):
+            problems.append(f"'settings.upload_mode' must be 'replace' or 'upsert', got {self.upload_mode!r}")
+        for endpoint, policy in [("settings.retry", self.retry)] + [(f"settings.retry_endpoints.{k}", v)
+                                                                   for k, v in self.retry_endpoints.items()]:
+            for key, value in policy.items():
+                if key not in RetryPolicy.DEFAULTS and key != "deadline_seconds":
+                    problems.append(f"Unknown retry option '{endpoint}.{key}'")
+                elif key == "max_attempts" and (not isinstance(value, int) or value < 1):
+                    problems.append(f"'{endpoint}.max_attempts' must be a positive integer, got {value!r}")
+                elif key in ("base_delay", "max_delay", "deadline_seconds") and (
+                        not isinstance(value, (int, float)) or value <= 0):
+                    problems.append(f"'{endpoint}.{key}' must be a positive number, got {value!r}")
+        if self.bulk_format not in WebAPIClient.BULK_FORMATS:
+            problems.append(f"'settings.bulk_format' must be one of {', '.join(WebAPIClient.BULK_FORMATS)}, got {self.bulk_format!r}")
+        if not isinstance(self.bulk_tables, list):
+            problems.append(f"'settings.bulk_tables' must be a list of table names, got {self.bulk_tables!r}")
+        if not isinstance(self.bundle_tables, list):
+            problems.append(f"'settings.bundle_tables' must be a list of table names, got {self.bundle_tables!r}")
+        if not isinstance(self.compiled_validators, (bool, list)):
+            problems.append(f"'settings.compiled_validators' must be true/false or a list of table names, "
+                            f"got {self.compiled_validators!r}")
+        if self.financial_year_start_month not in range(1, 13):
+            problems.append(f"'settings.financial_year_start_month' must be 1-12, got {self.financial_year_start_month!r}")
+        if not isinstance(self.partition_revalidate_hours, (int, float)) or self.partition_revalidate_hours <= 0:
+            problems.append(f"'settings.partition_revalidate_hours' must be a positive number, got {self.partition_revalidate_hours!r}")
+        if self.extraction_mode not in ("full", "cdc"):
+            problems.append(f"'settings.extraction_mode' must be 'full' or 'cdc', got {self.extraction_mode!r}")
+        if self.ledger_mode not in ("detail", "aggregated"):
+            problems.append(f"'settings.ledger_mode' must be 'detail' or 'aggregated', got {self.ledger_mode!r}")
+        if self.ledger_aggregate_period not in LEDGER_PERIOD_FORMATS:
+            problems.append(f"'settings.ledger_aggregate_period' must be 'day' or 'month', got {self.ledger_aggregate_period!r}")
+        if not isinstance(self.ledger_detail_days, int) or self.ledger_detail_days < 0:
+            problems.append(f"'settings.ledger_detail_days' must be a non-negative integer, got {self.ledger_detail_days!r}")
+        if not str(self.api_base_url).startswith(("http://", "https://")):
+            problems.append(f"'api.base_url' must start with http:// or https://, got {self.api_base_url!r}")
+        base_urls = self.config["api"].get("base_urls", [])
+        if not isinstance(base_urls, list):
+            problems.append(f"'api.base_urls' must be a list of URLs, got {base_urls!r}")
+        else:
+            for url in base_urls:
+                if not str(url).startswith(("http://", "https://")):
+                    problems.append(f"'api.base_urls' entries must start with http:// or https://, got {url!r}")
+        recheck = self.api_endpoint_recheck_seconds
+        if not isinstance(recheck, (int, float)) or isinstance(recheck, bool) or recheck <= 0:
+            problems.append(f"'api.endpoint_recheck_seconds' must be a positive number, got {recheck!r}")
+        return problems
+
+
+def execute_params(cursor, sql: str, params=()):
+    """
+    Execute sql with bound params. pyodbc takes the parameters as separate
+    arguments; standard DB-API drivers (sqlite3 for the CDC stand-in) take
+    one sequence.
+    """
+    if type(cursor).__module__ == "pyodbc":
+        return cursor.execute(sql, *params)
+    return cursor.execute(sql, tuple(params))
+
+
+class StatementCache:
+    """
+    Parameterized statements prepared once per connection. pyodbc skips
+    SQLPrepare when a cursor runs the SQL text it ran last, so each distinct
+    statement keeps its own cursor and only the bound parameters change
+    between executions. Timings are kept per statement name: the first
+    execution (prepare + execute) and the prepared re-executions.
+    """
+    def __init__(self, connection, max_statements: int = 64):
+        self.connection = connection
+        self.max_statements = max_statements
+        self._cursors: Dict[str, Any] = {}
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def execute(self, name: str, sql: str, params=()):
+        """Execute sql with params on its prepared cursor and return the cursor"""
+        import time
+
+        cursor = self._cursors.get(sql)
+        prepared = cursor is not None
+        if not prepared:
+            if len(self._cursors) >= self.max_statements:
+                # Drop the oldest statement (dicts keep insertion order)
+                self._close(next(iter(self._cursors)))
+            cursor = self._cursors[sql] = self.connection.cursor()
+        started = time.perf_counter()
+        try:
+            execute_params(cursor, sql, params)
+        except Exception:
+            self._close(sql)
+            raise
+        elapsed = time.perf_counter() - started
+        stats = self.stats.setdefault(name, {"prepares": 0, "prepare_seconds": 0.0, "reuses": 0, "reuse_seconds": 0.0})
+        if prepared:
+            stats["reuses"] += 1
+            stats["reuse_seconds"] += elapsed
+        else:
+            stats["prepares"] += 1
+            stats["prepare_seconds"] += elapsed
+        return cursor
+
+    def _close(self, sql: str):
+        cursor = self._cursors.pop(sql, None)
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    def close(self):
+        for sql in list(self._cursors):
+            self._close(sql)
+
+    def log_stats(self):
+        for name, stats in sorted(self.stats.items()):
+            line = f"🗄️ {name}: prepared {stats['prepares']}x ({stats['prepare_seconds'] * 1000:.1f} ms)"
+            if stats["reuses"]:
+                line += (f", reused {stats['reuses']}x "
+                         f"(avg {stats['reuse_seconds'] * 1000 / stats['reuses']:.2f} ms)")
+            logging.info(line)
 
 
 class DatabaseConnector:
+    # Small lookup tables kept in the reference cache: the query reading the
+    # whole table and a version query (row count + content hash) that tells
+    # when the cached copy is stale
+    REFERENCE_TABLES = {
+        "acc_departments": (
+            "SELECT department_id, department FROM acc_departments",
+            "SELECT COUNT(*), HASH(LIST(STRING(department_id, '=', department), ',' ORDER BY department_id), 'MD5') "
+            "FROM acc_departments",
+        ),
+        "acc_tt_servicemaster": (
+            "SELECT slno, type, code, name FROM dba.acc_tt_servicemaster",
+            "SELECT COUNT(*), HASH(LIST(STRING(slno, '|', type, '|', code, '|', name), ',' ORDER BY slno), 'MD5') "
+            "FROM dba.acc_tt_servicemaster",
+        ),
+    }
+
+    # Pushdown mode (settings.pushdown): the FROM/WHERE of each table's query,
+    # the SQL expression behind each source field that is not a plain column
+    # name, and the column restricted by _key_filtered in CDC mode. The SELECT
+    # list itself is generated from VALIDATOR_SCHEMAS (generate_pushdown_select).
+    PUSHDOWN_SOURCES = {
+        "users": ("FROM {table_name_users} WHERE 1 = 1", {}, None),
+        "misel": ("FROM {table_name_misel} WHERE 1 = 1", {}, None),
+        "acc_master": (
+            """FROM acc_master
+                LEFT JOIN acc_departments
+                    ON acc_master.openingdepartment = acc_departments.department_id
+                LEFT JOIN acc_tt_servicemaster
+                    ON acc_master.area = acc_tt_servicemaster.code
+                WHERE acc_master.super_code IN ('DEBTO', 'SUNCR', 'CASH', 'BANK')""",
+            {"code": "acc_master.code", "name": "acc_master.name", "super_code": "acc_master.super_code",
+             "opening_balance": "acc_master.opening_balance", "debit": "acc_master.debit",
+             "credit": "acc_master.credit", "place": "acc_master.place", "phone2": "acc_master.phone2",
+             "openingdepartment": "acc_departments.department",
+             "area": "COALESCE(acc_tt_servicemaster.name, 'No Area')"},
+            "acc_master.code",
+        ),
+        "acc_ledgers": (
+            """FROM acc_ledgers l
+                INNER JOIN acc_master m ON TRIM(l.code) = TRIM(m.code)
+                WHERE TRIM(m.super_code) IN ('DEBTO', 'SUNCR', 'CASH', 'BANK')""",
+            {"code": "l.code", "particulars": "l.particulars", "debit": "l.debit", "credit": "l.credit",
+             "entry_mode": "l.entry_mode", "entry_date": 'l."date"', "voucher_no": "l.voucher_no",
+             "narration": "l.narration", "super_code": "m.super_code"},
+            "l.code",
+        ),
+        "acc_invmast": (
+            """FROM DBA.acc_invmast AS inv
+                INNER JOIN DBA.acc_master AS cust
+                    ON inv.customerid = cust.code
+                WHERE cust.super_code = 'DEBTO'
+                AND inv.paid < inv.nettotal
+                AND inv.modeofpayment = 'C'""",
+            {"modeofpayment": "inv.modeofpayment", "customerid": "inv.customerid", "invdate": "inv.invdate",
+             "nettotal": "inv.nettotal", "paid": "inv.paid", "bill_ref": "inv.type || '-' || inv.billno"},
+            "inv.customerid",
+        ),
+        "cashandbankaccmaster": ("FROM acc_master WHERE super_code IN ('CASH', 'BANK')", {}, None),
+    }
+
+    # Period partitions (settings.period_partitions): the source field whose
+    # month partitions each table; its SQL expression and the FROM/WHERE
+    # come from PUSHDOWN_SOURCES
+    PARTITION_FIELDS = {"acc_ledgers": "entry_date", "acc_invmast": "invdate"}
+
     def __init__(self, config: DatabaseConfig):
         self.config = config
         self.connection = None
+        self.statements: Optional[StatementCache] = None
+        self._saved_autocommit = False
 
     def connect(self) -> bool:
+        try:
+            import pyodbc
+        except ImportError:
+            logging.error("❌ pyodbc is not installed")
+            print("❌ pyodbc is not installed - cannot connect to database")
+            return False
+
         try:
             conn_str = f"DSN={self.config.dsn};UID={self.config.username};PWD={self.config.password};"
             logging.info(f"Connecting to database DSN: {self.config.dsn}")
             self.connection = pyodbc.connect(conn_str, timeout=10)
+            self.statements = StatementCache(self.connection)
             logging.info("✅ Successfully connected to database")
             return True
         except pyodbc.Error as e:
@@ -75,16 +700,55 @@ class DatabaseConnector:
             print(f"❌ Failed to connect to database: {e}")
             return False
 
-    def fetch_accttservicemaster(self) -> Optional[List[Dict[str, Any]]]:
+    def fetch_pushdown(self, table: str, codes: Optional[List[str]] = None, since: Optional[date] = None,
+                       periods: Optional[List[str]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Pushdown mode: one SELECT that trims, casts, formats dates and drops
+        rows missing required fields in the engine, returning rows that only
+        need the pass-through validator (see compile_pushdown_validator)
+        """
+        try:
+            from_where, sources, key_column = self.PUSHDOWN_SOURCES[table]
+            select_list, filters = generate_pushdown_select(VALIDATOR_SCHEMAS[table], sources)
+            from_where = from_where.format(table_name_users=self.config.table_name_users,
+                                           table_name_misel=self.config.table_name_misel)
+            query = f"SELECT {select_list} {from_where}" + "".join(f" AND {f}" for f in filters)
+            filter_sql, params = self._fetch_filters(table, since, periods)
+            query += filter_sql
+            logging.debug("Executing pushdown query: %s", query)
+            result = []
+            for sql, key_params in self._key_filtered(query, key_column, codes):
+                cursor = self.execute(f"pushdown {table}", sql, params + key_params)
+                columns = [column[0] for column in cursor.description]
+                result.extend(dict(zip(columns, row)) for row in cursor.fetchall())
+            return result
+        except Exception as e:
+            logging.error(f"❌ Failed fetching {table} (pushdown): {e}")
+            logging.error(f"{traceback.format_exc()}")
+            return None
+
+    def fetch_reference(self, table: str) -> Optional[List[Dict[str, Any]]]:
+        """Read a whole lookup table from REFERENCE_TABLES"""
+        try:
+            cursor = self.execute(f"reference {table}", self.REFERENCE_TABLES[table][0])
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"❌ Failed fetching {table}: {e}")
+            return None
+
+    def fetch_accttservicemaster(self, cached_rows: Optional[List[Dict[str, Any]]] = None) -> Optional[List[Dict[str, Any]]]:
+        if cached_rows is not None:
+            # Whole table already in the reference cache
+            return [r for r in cached_rows if str(r.get('type') or '').strip().upper() == 'AREA']
         try:
-            cursor = self.connection.cursor()
             query = """
                 SELECT slno, type, code, name
                 FROM dba.acc_tt_servicemaster
                 WHERE UPPER(TRIM(type)) = 'AREA'
             """
-            logging.info(f"Executing query: {query}")
-            cursor.execute(query)
+            logging.debug("Executing query: %s", query)
+            cursor = self.execute("acc_tt_servicemaster", query)
             columns = [column[0] for column in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
         except Exception as e:
@@ -93,10 +757,9 @@ class DatabaseConnector:
 
     def fetch_users(self) -> Optional[List[Dict[str, Any]]]:
         try:
-            cursor = self.connection.cursor()
             query = f"SELECT id, pass, role, accountcode FROM {self.config.table_name_users}"
-            logging.info(f"Executing query: {query}")
-            cursor.execute(query)
+            logging.debug("Executing query: %s", query)
+            cursor = self.execute("users", query)
             columns = [column[0] for column in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
         except Exception as e:
@@ -105,23 +768,91 @@ class DatabaseConnector:
 
     def fetch_misel(self) -> Optional[List[Dict[str, Any]]]:
         try:
-            cursor = self.connection.cursor()
             query = f"SELECT firm_name, address, phones, mobile, address1, address2, address3, pagers, tinno FROM {self.config.table_name_misel}"
-            logging.info(f"Executing query: {query}")
-            cursor.execute(query)
+            logging.debug("Executing query: %s", query)
+            cursor = self.execute("misel", query)
             columns = [column[0] for column in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
         except Exception as e:
             logging.error(f"❌ Failed fetching misel: {e}")
             return None
 
-    def fetch_acc_master(self) -> Optional[List[Dict[str, Any]]]:
+    def _key_filtered(self, query: str, column: str, keys: Optional[List[str]], chunk_size: int = 500):
+        """Yield (sql, params) for query, restricted to TRIM(column) IN keys in chunks when keys are given"""
+        if keys is None:
+            yield query, []
+            return
+        for i in range(0, len(keys), chunk_size):
+            chunk = list(keys[i:i + chunk_size])
+            placeholders = ", ".join("?" for _ in chunk)
+            yield f"{query} AND TRIM({column}) IN ({placeholders})", chunk
+
+    def _fetch_filters(self, table: str, since: Optional[date] = None, periods: Optional[List[str]] = None):
+        """
+        (sql, params) a fetch appends to its table's FROM/WHERE: the recent
+        detail window of aggregated ledger mode and the open-period filter
+        of partitioned runs. count_rows appends the same. Undated ledger rows
+        fall in no balance period, so the detail window always keeps them.
+        """
+        sql, params = "", []
+        if table == "acc_ledgers" and self.config.ledger_aggregation_enabled:
+            from datetime import timedelta
+            sql += ' AND (l."date" >= ? OR l."date" IS NULL)'
+            params.append((datetime.now() - timedelta(days=self.config.ledger_detail_days)).date())
+        if since is not None:
+            column = self.PUSHDOWN_SOURCES[table][1][self.PARTITION_FIELDS[table]]
+            period_sql, period_params = self._period_filter(column, since, periods)
+            sql += period_sql
+            params.extend(period_params)
+        return sql, params
+
+    def _period_filter(self, column: str, since: date, periods: Optional[List[str]]):
+        """(sql, params) keeping open periods only: column >= since or null, plus the given closed months"""
+        sql = f" AND ({column} >= ? OR {column} IS NULL"
+        params = [since]
+        if periods:
+            sql += f" OR DATEFORMAT({column}, '{LEDGER_PERIOD_FORMATS['month']}') IN ({', '.join('?' for _ in periods)})"
+            params.extend(periods)
+        return sql + ")", params
+
+    def fetch_period_signatures(self, table: str, before: date) -> Optional[Dict[str, List[str]]]:
+        """
+        {month: [row count, MD5 of the month's rows]} for the months before
+        `before`, computed in the database so sealed periods are checked
+        without fetching them
+        """
+        try:
+            from_where, sources, _ = self.PUSHDOWN_SOURCES[table]
+            column = sources[self.PARTITION_FIELDS[table]]
+            period = f"DATEFORMAT({column}, '{LEDGER_PERIOD_FORMATS['month']}')"
+            row_text = ", '|', ".join(sources[field] for field in sorted(sources))
+            query = f"""
+                SELECT {period} AS period, COUNT(*),
+                    HASH(LIST(STRING({row_text}), ',' ORDER BY STRING({row_text})), 'MD5')
+                {from_where}
+                AND {column} < ?
+                GROUP BY {period}
+            """
+            cursor = self.execute(f"period signatures {table}", query, [before])
+            return {str(row[0]): [str(v) for v in row[1:]] for row in cursor.fetchall()}
+        except Exception as e:
+            logging.warning(f"⚠️ Could not read {table} period signatures: {e}")
+            return None
+
+    def fetch_acc_master(self, codes: Optional[List[str]] = None,
+                         lookups: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[List[Dict[str, Any]]]:
         """
         Fetch acc_master records for DEBTO, SUNCR, CASH, BANK
         Now includes super_code field
+        Pass codes to fetch only those accounts (change-data-capture mode)
+        Pass lookups ({"departments": {id: name}, "areas": {code: name}}, keys
+        as str() of the column values) to resolve openingdepartment and area
+        from the reference cache instead of joining acc_departments/
+        acc_tt_servicemaster. Keys match only when equal as strings; if a key
+        would match only after trimming or case folding, where the database's
+        collation decides, the joins are run instead (lookup_key).
         """
         try:
-            cursor = self.connection.cursor()
             query = """
                 SELECT 
                     acc_master.code,
@@ -139,12 +870,46 @@ class DatabaseConnector:
                     ON acc_master.openingdepartment = acc_departments.department_id
                 LEFT JOIN acc_tt_servicemaster
                     ON acc_master.area = acc_tt_servicemaster.code
-                WHERE acc_master.super_code IN ('DEBTO', 'SUNCR', 'CASH', 'BANK');
+                WHERE acc_master.super_code IN ('DEBTO', 'SUNCR', 'CASH', 'BANK')
             """
-            logging.info(f"Executing query: {query}")
-            cursor.execute(query)
-            columns = [column[0] for column in cursor.description]
-            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            if lookups is not None:
+                query = """
+                    SELECT 
+                        acc_master.code,
+                        acc_master.name,
+                        acc_master.super_code,
+                        acc_master.opening_balance,
+                        acc_master.debit,
+                        acc_master.credit,
+                        acc_master.place,
+                        acc_master.phone2,
+                        acc_master.openingdepartment,
+                        acc_master.area
+                    FROM acc_master
+                    WHERE acc_master.super_code IN ('DEBTO', 'SUNCR', 'CASH', 'BANK')
+                """
+            logging.debug("Executing query: %s", query)
+            results = []
+            for sql, params in self._key_filtered(query, "acc_master.code", codes):
+                cursor = self.execute("acc_master", sql, params)
+                columns = [column[0] for column in cursor.description]
+                results.extend(dict(zip(columns, row)) for row in cursor.fetchall())
+
+            if lookups is not None:
+                # Same results as the LEFT JOINs, COALESCE(name, 'No Area') included
+                departments, areas = lookups["departments"], lookups["areas"]
+                near = {"departments": {lookup_key(k) for k in departments}, "areas": {lookup_key(k) for k in areas}}
+                for r in results:
+                    department, area = r['openingdepartment'], r['area']
+                    if ((department is not None and str(department) not in departments
+                         and lookup_key(department) in near["departments"])
+                            or (area is not None and str(area) not in areas and lookup_key(area) in near["areas"])):
+                        logging.info("acc_master keys differ from the reference keys only by padding or case, "
+                                     "resolving them with the joins")
+                        return self.fetch_acc_master(codes)
+                    r['openingdepartment'] = departments.get(str(department)) if department is not None else None
+                    name = areas.get(str(area)) if area is not None else None
+                    r['area'] = 'No Area' if name is None else name
             
             # Debug logging
             logging.info(f"📊 Fetched {len(results)} acc_master records")
@@ -167,10 +932,14 @@ class DatabaseConnector:
             logging.error(f"{traceback.format_exc()}")
             return None
 
-    def fetch_acc_ledgers(self) -> Optional[List[Dict[str, Any]]]:
+    def fetch_acc_ledgers(self, codes: Optional[List[str]] = None, since: Optional[date] = None,
+                          periods: Optional[List[str]] = None) -> Optional[List[Dict[str, Any]]]:
         """
         Fetch acc_ledgers records for accounts with super_code IN ('DEBTO', 'SUNCR', 'CASH', 'BANK')
         Now includes super_code field
+        Pass codes to fetch only those accounts (change-data-capture mode)
+        Pass since to fetch only open periods (entries from that date on, or
+        undated) plus the closed months listed in periods
         """
         try:
             cursor = self.connection.cursor()
@@ -207,11 +976,19 @@ class DatabaseConnector:
                 INNER JOIN acc_master m ON TRIM(l.code) = TRIM(m.code)
                 WHERE TRIM(m.super_code) IN ('DEBTO', 'SUNCR', 'CASH', 'BANK')
             """
+            # In aggregated mode only a recent window of detail rows is shipped;
+            # older history travels as per-period totals (fetch_acc_ledger_balances)
+            filter_sql, params = self._fetch_filters("acc_ledgers", since, periods)
+            query += filter_sql
+            if self.config.ledger_aggregation_enabled:
+                logging.info(f"Aggregated ledger mode: fetching detail rows since {params[0]} and undated rows")
 
             logging.info("Executing acc_ledgers query with super_code filter...")
-            cursor.execute(query)
-            columns = [col[0] for col in cursor.description]
-            result = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            result = []
+            for sql, key_params in self._key_filtered(query, "l.code", codes):
+                cursor = self.execute("acc_ledgers", sql, params + key_params)
+                columns = [col[0] for col in cursor.description]
+                result.extend(dict(zip(columns, row)) for row in cursor.fetchall())
             
             # Log statistics by super_code
             super_code_counts = {}
@@ -229,10 +1006,50 @@ class DatabaseConnector:
             logging.error(f"{traceback.format_exc()}")
             return None
 
-    def fetch_acc_invmast(self) -> Optional[List[Dict[str, Any]]]:
+    def _ledger_balances_source(self) -> tuple:
+        """(period expression, FROM ... GROUP BY) of the acc_ledgers aggregation"""
+        period_expr = f"DATEFORMAT(l.\"date\", '{LEDGER_PERIOD_FORMATS[self.config.ledger_aggregate_period]}')"
+        return period_expr, f"""FROM acc_ledgers l
+                INNER JOIN acc_master m ON TRIM(l.code) = TRIM(m.code)
+                WHERE TRIM(m.super_code) IN ('DEBTO', 'SUNCR', 'CASH', 'BANK')
+                GROUP BY TRIM(l.code), {period_expr}"""
+
+    def fetch_acc_ledger_balances(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Fetch per-code, per-period debit/credit totals computed by SQL Anywhere,
+        so long ledger histories never leave the database row by row
+        """
+        try:
+            period_expr, from_group = self._ledger_balances_source()
+            query = f"""
+                SELECT
+                    TRIM(l.code) AS code,
+                    {period_expr} AS period,
+                    MAX(TRIM(m.super_code)) AS super_code,
+                    SUM(COALESCE(l.debit, 0)) AS debit,
+                    SUM(COALESCE(l.credit, 0)) AS credit,
+                    COUNT(*) AS entries
+                {from_group}
+                ORDER BY 1, 2
+            """
+            logging.info(f"Executing acc_ledgers aggregation by {self.config.ledger_aggregate_period}...")
+            cursor = self.execute("acc_ledger_balances", query)
+            columns = [column[0] for column in cursor.description]
+            result = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            logging.info(f"✅ Aggregation returned {len(result)} code/period rows")
+            return result
+        except Exception as e:
+            logging.error(f"❌ Failed fetching acc_ledgers balances: {e}")
+            logging.error(f"{traceback.format_exc()}")
+            return None
+
+    def fetch_acc_invmast(self, codes: Optional[List[str]] = None, since: Optional[date] = None,
+                          periods: Optional[List[str]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Pass codes (customer ids) to fetch only those customers' invoices (change-data-capture mode)
+        Pass since/periods to fetch only open periods (see fetch_acc_ledgers)
+        """
         try:
-            cursor = self.connection.cursor()
-            
             # Try different query variations for acc_invmast
             queries_to_try = [
                 # Option 1: With DBA schema prefix
@@ -273,9 +1090,13 @@ class DatabaseConnector:
             for i, query in enumerate(queries_to_try, 1):
                 try:
                     logging.info(f"Trying acc_invmast query variation {i}...")
-                    cursor.execute(query)
-                    columns = [column[0] for column in cursor.description]
-                    result = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                    period_sql, period_params = self._fetch_filters("acc_invmast", since, periods)
+                    query += period_sql
+                    result = []
+                    for sql, params in self._key_filtered(query, "inv.customerid", codes):
+                        cursor = self.execute("acc_invmast", sql, period_params + params)
+                        columns = [column[0] for column in cursor.description]
+                        result.extend(dict(zip(columns, row)) for row in cursor.fetchall())
                     logging.info(f"✅ acc_invmast query variation {i} succeeded! Returned {len(result)} records")
                     return result
                 except Exception as query_e:
@@ -291,87 +1112,1306 @@ class DatabaseConnector:
 
     def fetch_cashandbankaccmaster(self) -> Optional[List[Dict[str, Any]]]:
         try:
-            cursor = self.connection.cursor()
             query = """
                 SELECT code, name, super_code, opening_balance, opening_date, debit, credit
                 FROM acc_master
                 WHERE super_code IN ('CASH', 'BANK')
             """
-            logging.info(f"Executing query: {query}")
-            cursor.execute(query)
+            logging.debug("Executing query: %s", query)
+            cursor = self.execute("cashandbankaccmaster", query)
             columns = [column[0] for column in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
         except Exception as e:
             logging.error(f"❌ Failed fetching cashandbankaccmaster: {e}")
             return None
 
+    def begin_snapshot(self) -> Optional[datetime]:
+        """
+        Start one read transaction at snapshot isolation so every fetch sees
+        the database as of the same instant. Returns the snapshot timestamp.
+        Requires the database option allow_snapshot_isolation = 'On'.
+        """
+        try:
+            self._saved_autocommit = self.connection.autocommit
+            self.connection.rollback()
+            self.connection.autocommit = False
+            cursor = self.connection.cursor()
+            cursor.execute("SET TEMPORARY OPTION isolation_level = 'snapshot'")
+            # The snapshot starts with the first row read in the transaction
+            cursor.execute("SELECT CURRENT TIMESTAMP FROM SYS.DUMMY")
+            snapshot_ts = cursor.fetchone()[0]
+            logging.info(f"📸 Snapshot read transaction started at {snapshot_ts}")
+            return snapshot_ts
+        except Exception as e:
+            logging.error(f"❌ Could not start snapshot transaction: {e}")
+            print("❌ Snapshot extraction failed. Enable it with: "
+                  "SET OPTION PUBLIC.allow_snapshot_isolation = 'On'")
+            self.end_snapshot()
+            return None
+
+    def end_snapshot(self):
+        try:
+            # Read-only transaction: nothing to commit
+            self.connection.rollback()
+            cursor = self.connection.cursor()
+            cursor.execute("SET TEMPORARY OPTION isolation_level = ")
+            self.connection.autocommit = self._saved_autocommit
+        except Exception as e:
+            logging.warning(f"Could not end snapshot transaction cleanly: {e}")
+
+    def probe(self, query: str, params=()) -> Optional[tuple]:
+        """Run a cheap change-indicator query (counts/maxima) and return its first row"""
+        try:
+            cursor = self.execute("probe", query, params)
+            row = cursor.fetchone()
+            return tuple(str(v) for v in row) if row else ()
+        except Exception as e:
+            logging.warning(f"Probe failed ({e}): {' '.join(query.split())}")
+            return None
+
+    def count_rows(self, table: str, codes: Optional[List[str]] = None, since: Optional[date] = None,
+                   periods: Optional[List[str]] = None) -> Optional[int]:
+        """
+        Rows the table's fetch returns for the same codes/since/periods:
+        COUNT(*) over its PUSHDOWN_SOURCES FROM/WHERE (the joins and filters
+        the classic queries use as well) plus _fetch_filters, and for
+        acc_ledger_balances the number of code/period groups. None for
+        tables without a source entry or when the count fails.
+        """
+        if table == "acc_ledger_balances":
+            row = self.probe(f"SELECT COUNT(*) FROM (SELECT 1 AS one {self._ledger_balances_source()[1]}) AS groups")
+            return int(row[0]) if row else None
+        source = self.PUSHDOWN_SOURCES.get(table)
+        if source is None:
+            return None
+        from_where = source[0].format(table_name_users=self.config.table_name_users,
+                                      table_name_misel=self.config.table_name_misel)
+        filter_sql, params = self._fetch_filters(table, since, periods)
+        total = 0
+        for sql, key_params in self._key_filtered(f"SELECT COUNT(*) {from_where}{filter_sql}", source[2], codes):
+            row = self.probe(sql, params + key_params)
+            if not row:
+                return None
+            total += int(row[0])
+        return total
+
+    def execute(self, name: str, sql: str, params=()):
+        """Run a statement through the connection's prepared-statement cache"""
+        if self.statements is None or self.statements.connection is not self.connection:
+            self.statements = StatementCache(self.connection)
+        return self.statements.execute(name, sql, params)
+
     def close(self):
+        if self.statements is not None:
+            self.statements.log_stats()
+            self.statements.close()
+            self.statements = None
         if self.connection:
-            self.connection.close()
+            try:
+                self.connection.close()
+            except Exception as e:
+                logging.warning(f"Error closing database connection: {e}")
+            self.connection = None
             logging.info("Database connection closed")
 
 
-class WebAPIClient:
-    # API Endpoints defined as class constants
-    ENDPOINT_USERS = "/upload-users/"
-    ENDPOINT_MISEL = "/upload-misel/"
-    ENDPOINT_ACC_MASTER = "/upload-acc-master/"
-    ENDPOINT_ACC_LEDGERS = "/upload-acc-ledgers/"
-    ENDPOINT_ACC_INVMAST = "/upload-acc-invmast/"
-    ENDPOINT_CASH_BANK = "/upload-cashandbankaccmaster/"
-    ENDPOINT_ACC_TT_SERVICE = "/upload-accttservicemaster/"
+class ChangeCapture:
+    """
+    Trigger-fed change data capture.
 
-    def __init__(self, config: DatabaseConfig):
-        self.config = config
-        self.session = self._create_session()
+    Triggers on the captured tables append (table_name, op, row_key) to the
+    sync_changes table, row_key being the account the changed row belongs
+    to. A sync drains the pending changes of a table up to a high-water
+    change_id, re-reads only the affected accounts and acknowledges (deletes)
+    the drained changes once they are uploaded. Works on any DB-API
+    connection with qmark parameters; "sqlite" reproduces the same trigger
+    and change-table contract locally.
+    """
+    CHANGE_TABLE = "sync_changes"
+    # Captured table -> column holding the account code a row belongs to
+    CAPTURED = {"acc_master": "code", "acc_ledgers": "code", "acc_invmast": "customerid"}
+    # Name of the key field in the uploaded (validated) rows
+    UPLOAD_KEY = {"acc_master": "code", "acc_ledgers": "code", "acc_invmast": "customerid"}
 
-    def _create_session(self) -> requests.Session:
-        session = requests.Session()
-        retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retry)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        session.headers.update({'Content-Type': 'application/json'})
-        return session
+    DDL = {
+        "sqlanywhere": {
+            "table": """
+                CREATE TABLE {change_table} (
+                    change_id BIGINT NOT NULL DEFAULT AUTOINCREMENT PRIMARY KEY,
+                    table_name VARCHAR(64) NOT NULL,
+                    op CHAR(1) NOT NULL,
+                    row_key VARCHAR(128) NULL,
+                    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT TIMESTAMP
+                )""",
+            "trigger": """
+                CREATE TRIGGER {trigger} AFTER {event} ON {table}
+                REFERENCING {refs}
+                FOR EACH ROW
+                BEGIN
+                    {inserts}
+                END""",
+            "old": "OLD AS o", "new": "NEW AS n", "old_row": "o", "new_row": "n",
+        },
+        "sqlite": {
+            "table": """
+                CREATE TABLE {change_table} (
+                    change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    table_name TEXT NOT NULL,
+                    op TEXT NOT NULL,
+                    row_key TEXT,
+                    changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )""",
+            "trigger": """
+                CREATE TRIGGER {trigger} AFTER {event} ON {table}
+                FOR EACH ROW
+                BEGIN
+                    {inserts}
+                END""",
+            "old": None, "new": None, "old_row": "OLD", "new_row": "NEW",
+        },
+    }
+    EVENTS = {"INSERT": ("I", ["new"]), "UPDATE": ("U", ["old", "new"]), "DELETE": ("D", ["old"])}
 
-    def upload_accttservicemaster(self, rows: List[Dict[str, Any]]) -> bool:
-        url = f"{self.config.api_base_url}{self.ENDPOINT_ACC_TT_SERVICE}?client_id={self.config.client_id}"
-        try:
-            res = self.session.post(url, json=rows, timeout=self.config.api_timeout)
-            if res.status_code in [200, 201]:
-                logging.info("✅ acc_tt_servicemaster uploaded successfully")
-                return True
-            else:
-                logging.error(f"❌ acc_tt_servicemaster upload failed: {res.status_code} – {res.text}")
-                return False
-        except Exception as e:
-            logging.error(f"❌ Exception in upload_accttservicemaster: {e}")
-            return False
+    def __init__(self, connection, dialect: str = "sqlanywhere", statements: Optional[StatementCache] = None):
+        if dialect not in self.DDL:
+            raise ValueError(f"Unknown CDC dialect: {dialect}")
+        self.connection = connection
+        self.statements = statements  # drain/acknowledge run every cycle in watch mode
+        self.dialect = dialect
 
-    def upload_users(self, users: List[Dict[str, Any]]) -> bool:
-        url = f"{self.config.api_base_url}{self.ENDPOINT_USERS}?client_id={self.config.client_id}"
-        try:
-            res = self.session.post(url, json=users, timeout=self.config.api_timeout)
-            if res.status_code in [200, 201]:
-                logging.info("✅ Users uploaded successfully")
-                return True
-            else:
-                logging.error(f"❌ Upload failed: {res.status_code} - {res.text}")
-                return False
-        except Exception as e:
-            logging.error(f"❌ Exception in upload_users: {e}")
-            return False
+    def install_statements(self) -> List[str]:
+        ddl = self.DDL[self.dialect]
+        statements = [
+            ddl["table"].format(change_table=self.CHANGE_TABLE),
+            f"CREATE INDEX ix_{self.CHANGE_TABLE}_table ON {self.CHANGE_TABLE} (table_name, change_id)",
+        ]
+        for table, column in self.CAPTURED.items():
+            for event, (op, images) in self.EVENTS.items():
+                # An UPDATE records both the old and the new key so a renamed
+                # account is re-synced under both codes
+                inserts = "\n                    ".join(
+                    f"INSERT INTO {self.CHANGE_TABLE} (table_name, op, row_key) "
+                    f"VALUES ('{table}', '{op}', TRIM({ddl[image + '_row']}.{column}));"
+                    for image in images
+                )
+                refs = " ".join(ddl[image] for image in images if ddl[image])
+                statements.append(ddl["trigger"].format(
+                    trigger=self._trigger_name(table, event), event=event, table=table,
+                    refs=refs, inserts=inserts))
+        return statements
 
-    def upload_misel(self, misel: List[Dict[str, Any]]) -> bool:
-        url = f"{self.config.api_base_url}{self.ENDPOINT_MISEL}?client_id={self.config.client_id}"
-        try:
-            res = self.session.post(url, json=misel, timeout=self.config.api_timeout)
-            if res.status_code in [200, 201]:
-                logging.info("✅ Misel uploaded successfully")
-                return True
-            else:
-                logging.error(f"❌ Upload failed: {res.status_code} - {res.text}")
-                return False
+    def uninstall_statements(self) -> List[str]:
+        statements = [f"DROP TRIGGER {self._trigger_name(table, event)}"
+                      for table in self.CAPTURED for event in self.EVENTS]
+        statements.append(f"DROP TABLE {self.CHANGE_TABLE}")
+        return statements
+
+    def _trigger_name(self, table: str, event: str) -> str:
+        return f"sync_cdc_{table}_{event[0].lower()}"
+
+    def _execute_all(self, statements: List[str]):
+        cursor = self.connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        self.connection.commit()
+
+    def install(self):
+        self._execute_all(self.install_statements())
+
+    def uninstall(self):
+        self._execute_all(self.uninstall_statements())
+
+    def drain(self, table: str) -> tuple:
+        """
+        Return (high_water_change_id, keys) for the pending changes of a table,
+        keys in first-change order. Changes arriving during the sync stay
+        above the high-water mark for the next run.
+        """
+        cursor = self._execute("cdc high water", f"SELECT MAX(change_id) FROM {self.CHANGE_TABLE} WHERE table_name = ?",
+                               [table])
+        high_water = cursor.fetchone()[0]
+        if high_water is None:
+            return None, []
+        cursor = self._execute("cdc changes", f"SELECT change_id, row_key FROM {self.CHANGE_TABLE} "
+                                              f"WHERE table_name = ? AND change_id <= ? ORDER BY change_id",
+                               [table, high_water])
+        keys = {}
+        for _, row_key in cursor.fetchall():
+            if row_key is not None:
+                keys.setdefault(str(row_key).strip(), None)
+        return high_water, list(keys)
+
+    def acknowledge(self, table: str, high_water: int):
+        self._execute("cdc acknowledge", f"DELETE FROM {self.CHANGE_TABLE} WHERE table_name = ? AND change_id <= ?",
+                      [table, high_water])
+        self.connection.commit()
+
+    def _execute(self, name: str, sql: str, params: list):
+        if self.statements is not None:
+            return self.statements.execute(name, sql, params)
+        cursor = self.connection.cursor()
+        execute_params(cursor, sql, params)
+        return cursor
+
+
+class ReferenceCache:
+    """
+    Local JSON copy of the lookup tables in DatabaseConnector.REFERENCE_TABLES.
+    Each table is stored with its version row (row count + content hash) and
+    only re-read when the version moves. The version last uploaded is kept
+    as well, so an unchanged table's upload can be skipped.
+    """
+    def __init__(self, path: str):
+        import threading
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._tables: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._tables = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"⚠️ Ignoring unreadable reference cache '{path}': {e}")
+
+    def rows(self, table: str, version: tuple) -> Optional[List[Dict[str, Any]]]:
+        """Cached rows of table if they are still at version"""
+        entry = self._tables.get(table)
+        if entry is not None and entry.get("version") == list(version):
+            return entry["rows"]
+        return None
+
+    def store(self, table: str, version: tuple, rows: List[Dict[str, Any]]):
+        with self._lock:
+            entry = self._tables.setdefault(table, {})
+            entry["version"] = list(version)
+            # Round-trip through JSON so cached and fresh rows look the same
+            entry["rows"] = json.loads(json.dumps(rows, default=str))
+            self._save()
+
+    def uploaded_version(self, table: str) -> Optional[tuple]:
+        version = self._tables.get(table, {}).get("uploaded_version")
+        return tuple(version) if version is not None else None
+
+    def mark_uploaded(self, table: str, version: tuple):
+        with self._lock:
+            self._tables.setdefault(table, {})["uploaded_version"] = list(version)
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._tables, f)
+        os.replace(tmp_path, self.path)
+
+
+class PeriodPartitions:
+    """
+    Local record of the closed periods (months before the open financial
+    years) of each partitioned table that were uploaded and sealed, with
+    the row count and checksum each had then. Sealed months are not
+    extracted again; every partition_revalidate_hours the signatures are
+    re-read in the database and months that changed are re-extracted.
+    acc_ledgers and acc_invmast are sealed from concurrent scheduler
+    threads, so updates and saves are serialized.
+    """
+    def __init__(self, path: str):
+        import threading
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._tables: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._tables = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"⚠️ Ignoring unreadable partition state '{path}': {e}")
+
+    @staticmethod
+    def closed_before(today: date, start_month: int, open_years: int) -> date:
+        """First day of the oldest open financial year"""
+        start_year = today.year if today.month >= start_month else today.year - 1
+        return date(start_year - (open_years - 1), start_month, 1)
+
+    def table(self, table: str) -> Optional[Dict[str, Any]]:
+        return self._tables.get(table)
+
+    def due(self, table: str, hours: float) -> bool:
+        entry = self._tables.get(table)
+        if entry is None:
+            return True
+        revalidated = datetime.fromisoformat(entry["revalidated_at"])
+        return (datetime.now() - revalidated).total_seconds() >= hours * 3600
+
+    def seal(self, table: str, boundary: date, signatures: Dict[str, List[str]]):
+        import tempfile
+
+        with self._lock:
+            self._tables[table] = {"boundary": boundary.isoformat(), "revalidated_at": datetime.now().isoformat(),
+                                   "sealed": signatures}
+            fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.",
+                                            dir=os.path.dirname(os.path.abspath(self.path)))
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._tables, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+
+class RunHistory:
+    """
+    Run reports of past syncs, one JSON line per run, read back as
+    per-table throughput for the --plan estimator. The file is cut to its
+    newer half once it passes max_bytes.
+    """
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def append(self, report: Dict[str, Any]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, default=str) + "\n")
+        if os.path.getsize(self.path) > self.max_bytes:
+            lines = self._lines()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in lines[len(lines) // 2:])
+            os.replace(tmp_path, self.path)
+
+    def _lines(self) -> List[str]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            return [line.rstrip("\n") for line in f if line.strip()]
+
+    def table_stats(self, runs: int = 20) -> Dict[str, Dict[str, float]]:
+        """{table: {"rows_per_second", "valid_ratio", "bytes_per_row", "runs"}} over the last runs that synced it"""
+        totals: Dict[str, Dict[str, float]] = {}
+        for line in reversed(self._lines()):
+            try:
+                tables = json.loads(line)["tables"]
+            except (ValueError, KeyError):
+                continue
+            for table, result in tables.items():
+                entry = totals.setdefault(table, {"runs": 0, "fetched": 0, "valid": 0, "seconds": 0.0, "bytes": 0})
+                if (entry["runs"] >= runs or result.get("status") != "success" or result.get("unchanged")
+                        or not result.get("fetched") or not result.get("seconds")):
+                    continue
+                entry["runs"] += 1
+                entry["fetched"] += result["fetched"]
+                entry["valid"] += result.get("valid", 0)
+                entry["seconds"] += result["seconds"]
+                entry["bytes"] += result.get("payload_bytes", 0)
+        return {table: {"rows_per_second": t["fetched"] / t["seconds"], "valid_ratio": t["valid"] / t["fetched"],
+                        "bytes_per_row": t["bytes"] / t["valid"] if t["bytes"] and t["valid"] else None,
+                        "runs": t["runs"]}
+                for table, t in totals.items() if t["runs"]}
+
+
+class OutboxReceipt:
+    """Stands in for an HTTP response when a request was queued in the outbox"""
+    # Queued data is durable, so callers treat it like an accepted upload
+    status_code = 200
+    text = "queued in outbox"
+
+
+class UploadOutbox:
+    """
+    Durable queue of upload requests in a local SQLite file.
+
+    Requests are delivered strictly in enqueue order per table, so a
+    force_clear followed by its append batches replays correctly after an
+    outage or a restart. Failed deliveries back off exponentially; after
+    failure_threshold consecutive failures the circuit opens and nothing is
+    sent for cooldown_seconds. Requests rejected with a non-retryable 4xx are
+    parked as 'dead' instead of blocking their table forever. Each request
+    keeps the Idempotency-Key it was first sent with, so a redelivery of a
+    batch the server applied before the response was lost is not applied
+    twice.
+    """
+    def __init__(self, path: str, send, base_delay: float = 5, max_delay: float = 300,
+                 failure_threshold: int = 5, cooldown_seconds: float = 60):
+        import sqlite3
+        import threading
+
+        self.path = path
+        self.send = send  # send(url, payload, timeout, idempotency_key) -> response
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._consecutive_failures = 0
+        self._circuit_open_until = 0.0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                timeout REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                idempotency_key TEXT
+            )""")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(outbox)")]
+        if "idempotency_key" not in columns:
+            # Outbox files written before keys were stored; their requests get one on first delivery
+            self._db.execute("ALTER TABLE outbox ADD COLUMN idempotency_key TEXT")
+        self._db.commit()
+
+    def enqueue(self, table: str, url: str, payload: Any, timeout: float, idempotency_key: Optional[str] = None):
+        import uuid
+
+        with self._lock:
+            self._db.execute("INSERT INTO outbox (table_name, url, payload, timeout, idempotency_key) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             (table or "", url, json.dumps(payload), timeout, idempotency_key or uuid.uuid4().hex))
+            self._db.commit()
+        logging.warning(f"📥 Queued {table} request in outbox ({len(payload) if isinstance(payload, list) else 1} records)")
+
+    def pending_count(self, table: Optional[str] = None) -> int:
+        with self._lock:
+            if table is None:
+                row = self._db.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()
+            else:
+                row = self._db.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending' AND table_name = ?",
+                                       (table,)).fetchone()
+        return row[0]
+
+    def has_pending(self, table: Optional[str]) -> bool:
+        return self.pending_count(table or "") > 0
+
+    @property
+    def circuit_open(self) -> bool:
+        import time
+        return time.time() < self._circuit_open_until
+
+    def deliver_next(self) -> bool:
+        """Try the oldest due request of any table; True if one was delivered"""
+        import time
+        import uuid
+
+        if self.circuit_open:
+            return False
+        with self._lock:
+            row = self._db.execute("""
+                SELECT id, table_name, url, payload, timeout, attempts, idempotency_key FROM outbox
+                WHERE id IN (SELECT MIN(id) FROM outbox WHERE status = 'pending' GROUP BY table_name)
+                  AND next_attempt_at <= ?
+                ORDER BY id LIMIT 1""", (time.time(),)).fetchone()
+            if row is not None and row[6] is None:
+                row = row[:6] + (uuid.uuid4().hex,)
+                self._db.execute("UPDATE outbox SET idempotency_key = ? WHERE id = ?", (row[6], row[0]))
+                self._db.commit()
+        if row is None:
+            return False
+
+        item_id, table, url, payload, timeout, attempts, idempotency_key = row
+        error, dead = None, False
+        try:
+            res = self.send(url, json.loads(payload), timeout, idempotency_key)
+            if res.status_code not in [200, 201]:
+                error = f"{res.status_code} - {res.text[:200]}"
+                dead = 400 <= res.status_code < 500 and res.status_code not in (408, 429)
+        except Exception as e:
+            error = str(e)
+
+        with self._lock:
+            if error is None:
+                self._db.execute("DELETE FROM outbox WHERE id = ?", (item_id,))
+                self._consecutive_failures = 0
+            elif dead:
+                self._db.execute("UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                                 (attempts + 1, error, item_id))
+            else:
+                delay = min(self.max_delay, self.base_delay * (2 ** attempts))
+                self._db.execute("UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                                 (attempts + 1, time.time() + delay, error, item_id))
+                self._consecutive_failures += 1
+                if self._consecutive_failures >= self.failure_threshold:
+                    self._circuit_open_until = time.time() + self.cooldown_seconds
+                    logging.warning(f"🔌 Outbox circuit open for {self.cooldown_seconds}s after "
+                                    f"{self._consecutive_failures} consecutive failures")
+            self._db.commit()
+
+        if error is None:
+            logging.info(f"📤 Outbox delivered {table} request #{item_id}")
+            return True
+        if dead:
+            logging.error(f"❌ Outbox gave up on {table} request #{item_id}: {error}")
+        else:
+            logging.warning(f"⚠️ Outbox delivery of {table} request #{item_id} failed (attempt {attempts + 1}): {error}")
+        return False
+
+    def drain(self, timeout: Optional[float] = None) -> int:
+        """Deliver until empty or timeout seconds have passed; returns the number still pending"""
+        import time
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending_count() and (deadline is None or time.monotonic() < deadline):
+            if not self.deliver_next():
+                time.sleep(0.5)
+        return self.pending_count()
+
+    def _drain_forever(self):
+        while not self._stop.is_set():
+            try:
+                delivered = self.deliver_next()
+            except Exception as e:
+                logging.error(f"❌ Outbox drainer error: {e}")
+                delivered = False
+            if not delivered:
+                self._stop.wait(1.0)
+
+    def start(self):
+        """Deliver queued requests on a background thread"""
+        import threading
+
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._drain_forever, name="outbox-drainer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self._db.close()
+
+
+class ExportSink(abc.ABC):
+    """
+    Destination for the validated rows of a table besides the web API.
+    One extraction feeds every configured sink; write_table must be safe
+    to call from several scheduler threads for different tables.
+    """
+    @abc.abstractmethod
+    def write_table(self, table: str, rows: List[Dict[str, Any]]) -> str:
+        """Write rows and return a description of where they went"""
+
+    def close(self):
+        pass
+
+
+class ArrowFileSink(ExportSink):
+    """
+    Writes each table to a Parquet or Arrow IPC file with pyarrow (optional
+    dependency). Columns are built directly from the validated rows without
+    a JSON round-trip, string columns are dictionary-encoded and rows are
+    written in row groups / record batches of row_group_size.
+    """
+    FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+    def __init__(self, directory: str, file_format: str = "parquet", row_group_size: int = 100000,
+                 compression: str = "zstd"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("pyarrow is required for Parquet/Arrow export (pip install pyarrow)")
+        if file_format not in self.FORMATS:
+            raise ValueError(f"Unknown export format: {file_format}")
+        self.directory = directory
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.compression = compression
+        os.makedirs(directory, exist_ok=True)
+
+    def _schema(self, rows: List[Dict[str, Any]]):
+        import pyarrow as pa
+
+        fields = []
+        for column in rows[0]:
+            sample = next((r[column] for r in rows if r.get(column) is not None), None)
+            if isinstance(sample, bool):
+                arrow_type = pa.bool_()
+            elif isinstance(sample, int):
+                arrow_type = pa.int64()
+            elif isinstance(sample, float):
+                arrow_type = pa.float64()
+            else:
+                # Codes, names, dates (already YYYY-MM-DD strings) repeat heavily
+                arrow_type = pa.dictionary(pa.int32(), pa.string())
+            fields.append(pa.field(column, arrow_type))
+        return pa.schema(fields)
+
+    def _record_batch(self, schema, chunk: List[Dict[str, Any]]):
+        import pyarrow as pa
+
+        arrays = []
+        for field in schema:
+            values = [row.get(field.name) for row in chunk]
+            if pa.types.is_dictionary(field.type):
+                values = [None if v is None else str(v) for v in values]
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            elif pa.types.is_floating(field.type):
+                arrays.append(pa.array([None if v is None else float(v) for v in values], type=field.type))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def write_table(self, table: str, rows: List[Dict[str, Any]]) -> str:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"{table}_{stamp}{self.FORMATS[self.file_format]}")
+        schema = self._schema(rows)
+        batches = (self._record_batch(schema, rows[i:i + self.row_group_size])
+                   for i in range(0, len(rows), self.row_group_size))
+        if self.file_format == "parquet":
+            with pq.ParquetWriter(path, schema, compression=self.compression, use_dictionary=True) as writer:
+                for batch in batches:
+                    writer.write_table(pa.Table.from_batches([batch]), row_group_size=self.row_group_size)
+        else:
+            # IPC files allow one dictionary per field, so unify across batches first
+            arrow_table = pa.Table.from_batches(list(batches), schema=schema).unify_dictionaries()
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            with pa.ipc.new_file(path, schema, options=options) as writer:
+                writer.write_table(arrow_table, max_chunksize=self.row_group_size)
+        logging.info(f"💾 Exported {len(rows)} {table} rows to {path}")
+        return path
+
+
+class StageProfiler:
+    """
+    Optional cProfile / tracemalloc capture around each stage (fetch,
+    validate, export, upload) of each table. Profiles of repeated stages
+    (retries, watch cycles) accumulate; finish() writes <table>.<stage>.prof
+    and <table>.<stage>.memory.txt into the output directory. When both are
+    disabled stage() hands back a shared no-op context manager.
+    """
+    def __init__(self, output_dir: Optional[str] = None, profile: bool = False,
+                 trace_memory: bool = False, top_n: int = 25):
+        self.output_dir = output_dir
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.top_n = top_n
+        self.enabled = bool(output_dir) and (profile or trace_memory)
+        self._profiles = {}
+        self._memory = {}
+
+    def stage(self, table: str, stage: str):
+        if not self.enabled:
+            return _NO_PROFILE
+        return self._capture(table, stage)
+
+    @contextlib.contextmanager
+    def _capture(self, table: str, stage: str):
+        import cProfile
+        import tracemalloc
+
+        key = (table, stage)
+        profiler = None
+        if self.profile:
+            profiler = self._profiles.setdefault(key, cProfile.Profile())
+        if self.trace_memory:
+            tracemalloc.start()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            if self.trace_memory:
+                # Only allocations made during the stage are traced, so the
+                # snapshot holds what the stage left alive (e.g. the row lists)
+                snapshot = tracemalloc.take_snapshot().filter_traces((
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                ))
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                stats = snapshot.statistics("lineno")
+                previous = self._memory.get(key)
+                if previous is None or peak >= previous[0]:
+                    self._memory[key] = (peak, sum(stat.size for stat in stats), stats[:self.top_n])
+
+    def finish(self) -> Optional[str]:
+        """Write the collected profiles and return the output directory"""
+        if not self.enabled or not (self._profiles or self._memory):
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        for (table, stage), profiler in self._profiles.items():
+            profiler.dump_stats(os.path.join(self.output_dir, f"{table}.{stage}.prof"))
+        for (table, stage), (peak, retained, top) in self._memory.items():
+            with open(os.path.join(self.output_dir, f"{table}.{stage}.memory.txt"), "w", encoding="utf-8") as f:
+                f.write(f"{table} / {stage}\n")
+                f.write(f"peak traced: {peak / 1024 / 1024:.1f} MiB, retained at end: {retained / 1024 / 1024:.1f} MiB\n")
+                f.write(f"top {len(top)} retained allocations by line:\n")
+                for stat in top:
+                    f.write(f"{stat}\n")
+        self._profiles.clear()
+        self._memory.clear()
+        return self.output_dir
+
+
+_NO_PROFILE = contextlib.nullcontext()
+
+
+class RetryPolicy:
+    """
+    How one API endpoint retries: which statuses are retryable, how many
+    attempts in total and the decorrelated-jitter backoff between them.
+    A Retry-After header from the server takes precedence over the backoff.
+    """
+    DEFAULTS = {"max_attempts": 4, "base_delay": 1.0, "max_delay": 30.0,
+                "statuses": [429, 500, 502, 503, 504]}
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                 statuses=(429, 500, 502, 503, 504)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = frozenset(statuses)
+
+    @classmethod
+    def from_settings(cls, *layers: Dict[str, Any]) -> "RetryPolicy":
+        options = dict(cls.DEFAULTS)
+        for layer in layers:
+            options.update({k: v for k, v in layer.items() if k in cls.DEFAULTS})
+        return cls(**options)
+
+    def backoff(self, previous: float) -> float:
+        """Next delay: uniform between base_delay and three times the previous one, capped"""
+        import random
+
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous * 3)))
+
+    @staticmethod
+    def retry_after(response) -> Optional[float]:
+        """Seconds requested by a Retry-After header (delta-seconds or HTTP date)"""
+        value = response.headers.get("Retry-After") if response is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            from email.utils import parsedate_to_datetime
+
+            when = parsedate_to_datetime(value)
+            return max(0.0, (when - datetime.now(when.tzinfo)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+
+class EndpointPool:
+    """
+    API base URLs serving the same backend. Each table is routed to one
+    endpoint (sticky, so its batches stay in order on one host) picked at
+    random weighted by 1/latency among the healthy ones; latencies come
+    from health checks and are updated from every request's duration. An
+    endpoint that is unreachable (connection error, timeout or one of
+    DOWN_STATUSES) is taken out for recheck_seconds and its tables move to
+    another one; it is health-checked again before it returns. Other error
+    statuses are about the request, not the endpoint, and only counted.
+    """
+    DOWN_STATUSES = (502, 503, 504)
+
+    def __init__(self, base_urls: List[str], check, recheck_seconds: float = 30):
+        import random
+        import threading
+
+        self.base_urls = list(base_urls)
+        self.check = check  # base_url -> latency in seconds, None when unreachable
+        self.recheck_seconds = recheck_seconds
+        self.latency: Dict[str, Optional[float]] = {url: None for url in self.base_urls}
+        self.down_until: Dict[str, float] = {}
+        self.routes: Dict[str, str] = {}
+        self.stats = {url: {"requests": 0, "failures": 0} for url in self.base_urls}
+        self._checking = threading.Lock()
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """
+        Health-check endpoints never measured or whose time out is over. One
+        thread checks at a time; the others wait only while no endpoint is
+        known to be healthy, otherwise they carry on with the current ones.
+        """
+        import time
+
+        with self._lock:
+            wait = not self._healthy()
+        if not self._checking.acquire(blocking=wait):
+            return
+        try:
+            now = time.monotonic()
+            with self._lock:
+                due = [url for url in self.base_urls
+                       if self.latency[url] is None and self.down_until.get(url, 0) <= now]
+            for url in due:
+                latency = self.check(url)
+                with self._lock:
+                    if latency is None:
+                        self.down_until[url] = time.monotonic() + self.recheck_seconds
+                        logging.warning(f"🩺 API endpoint {url} failed its health check")
+                    else:
+                        self.latency[url] = latency
+                        self.down_until.pop(url, None)
+        finally:
+            self._checking.release()
+
+    def _healthy(self) -> List[str]:
+        import time
+
+        now = time.monotonic()
+        return [url for url in self.base_urls if self.down_until.get(url, 0) <= now and self.latency[url] is not None]
+
+    def route(self, table: Optional[str] = None) -> str:
+        """The table's endpoint, choosing one (latency-weighted) if it has none or its endpoint is down"""
+        self._refresh()
+        with self._lock:
+            healthy = self._healthy()
+            current = self.routes.get(table)
+            if current in healthy:
+                return current
+            if not healthy:
+                # Everything is down: use the endpoint due back first and let the retry backoff wait
+                return min(self.base_urls, key=lambda url: self.down_until.get(url, 0))
+            url = self._random.choices(healthy, weights=[1 / max(self.latency[u], 0.001) for u in healthy])[0]
+            if table is not None:
+                if current is not None:
+                    logging.warning(f"🔀 {table} failing over from {current} to {url}")
+                self.routes[table] = url
+            return url
+
+    def release(self, table: str):
+        """Forget a table's endpoint so its next sync is balanced afresh"""
+        with self._lock:
+            self.routes.pop(table, None)
+
+    def record(self, url: str, seconds: float, failed: bool = False):
+        with self._lock:
+            self.stats[url]["requests"] += 1
+            self.stats[url]["failures"] += int(failed)
+            previous = self.latency[url]
+            self.latency[url] = seconds if previous is None else 0.7 * previous + 0.3 * seconds
+
+    def fail(self, url: str) -> bool:
+        """Take an endpoint out of rotation; True when another endpoint is healthy to fail over to"""
+        import time
+
+        with self._lock:
+            self.stats[url]["requests"] += 1
+            self.stats[url]["failures"] += 1
+            self.down_until[url] = time.monotonic() + self.recheck_seconds
+            self.latency[url] = None
+            return bool(self._healthy())
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {url: dict(self.stats[url], latency_ms=None if self.latency[url] is None
+                              else round(self.latency[url] * 1000, 1)) for url in self.base_urls}
+
+
+class WebAPIClient:
+    # API Endpoints defined as class constants
+    ENDPOINT_USERS = "/upload-users/"
+    ENDPOINT_MISEL = "/upload-misel/"
+    ENDPOINT_ACC_MASTER = "/upload-acc-master/"
+    ENDPOINT_ACC_LEDGERS = "/upload-acc-ledgers/"
+    ENDPOINT_ACC_INVMAST = "/upload-acc-invmast/"
+    ENDPOINT_CASH_BANK = "/upload-cashandbankaccmaster/"
+    ENDPOINT_ACC_TT_SERVICE = "/upload-accttservicemaster/"
+    ENDPOINT_ACC_LEDGER_BALANCES = "/upload-acc-ledger-balances/"
+    ENDPOINT_BULK_IMPORT = "/bulk-import/"
+    ENDPOINT_VERIFY_RANGES = "/verify-ranges/"
+    ENDPOINT_BUNDLE = "/upload-bundle/"
+    ENDPOINT_HEALTH = "/health/"
+
+    BULK_FORMATS = {"ndjson": ".ndjson.gz", "csv": ".csv.gz"}
+    BULK_CHUNK_ATTEMPTS = 5
+    # acc_master/acc_invmast go up in one request unless they exceed LARGE_DATASET_ROWS
+    LARGE_DATASET_ROWS = 1000
+    LARGE_DATASET_BATCH_SIZES = {"acc_master": 200, "acc_invmast": 500}
+
+    def __init__(self, config: DatabaseConfig):
+        self.config = config
+        self._session = None
+        # Extra query parameters sent with every upload (e.g. snapshot_ts)
+        self.metadata: Dict[str, str] = {}
+        # Tables whose rows were deduplicated locally and can be upserted
+        # instead of cleared and reloaded
+        self.upsert_tables = set()
+        # Tables uploaded as code tables + integer references: {table: columns}
+        self.dictionary_tables: Dict[str, List[str]] = {}
+        self.outbox: Optional[UploadOutbox] = None
+        if config.outbox_enabled:
+            self.outbox = UploadOutbox(config.outbox_path, self._send)
+        self.retry_policy = RetryPolicy.from_settings(config.retry)
+        self.endpoint_policies = {endpoint: RetryPolicy.from_settings(config.retry, options)
+                                  for endpoint, options in config.retry_endpoints.items()}
+        # Per-table retry metrics and deadlines, reset by start_table()
+        self.retry_stats: Dict[str, Dict[str, Any]] = {}
+        self._deadlines: Dict[str, float] = {}
+        # Load balancing and failover across api.base_urls (single endpoint: None)
+        self.endpoints: Optional[EndpointPool] = None
+        if len(config.api_base_urls) > 1:
+            self.endpoints = EndpointPool(config.api_base_urls, self._check_endpoint,
+                                          config.api_endpoint_recheck_seconds)
+
+    def _check_endpoint(self, base_url: str) -> Optional[float]:
+        """Seconds a health check of base_url took; any answer below 500 counts as up"""
+        import time
+
+        import requests
+
+        started = time.perf_counter()
+        try:
+            res = self.session.get(f"{base_url}{self.ENDPOINT_HEALTH}", timeout=min(5, self.config.api_timeout))
+        except requests.exceptions.RequestException:
+            return None
+        return time.perf_counter() - started if res.status_code < 500 else None
+
+    def _routed(self, url: str, base_url: Optional[str]) -> str:
+        """url (built on api.base_url) pointed at base_url instead"""
+        primary = self.config.api_base_url
+        if base_url is None or base_url == primary or not url.startswith(primary):
+            return url
+        return base_url + url[len(primary):]
+
+    def _url(self, endpoint: str, **params) -> str:
+        from urllib.parse import urlencode
+
+        query = {"client_id": self.config.client_id}
+        query.update(self.metadata)
+        query.update(params)
+        return f"{self.config.api_base_url}{endpoint}?{urlencode(query)}"
+
+    def _send(self, url: str, payload: Any, timeout: float, idempotency_key: Optional[str] = None):
+        """One POST without retries, for the outbox, under the key the request was first sent with"""
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        if self.endpoints is None:
+            return self.session.post(url, json=payload, timeout=timeout, headers=headers)
+        import time
+
+        import requests
+
+        base_url = self.endpoints.route()
+        started = time.perf_counter()
+        try:
+            res = self.session.post(self._routed(url, base_url), json=payload, timeout=timeout, headers=headers)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self.endpoints.fail(base_url)
+            raise
+        if res.status_code in EndpointPool.DOWN_STATUSES:
+            self.endpoints.fail(base_url)
+        else:
+            self.endpoints.record(base_url, time.perf_counter() - started,
+                                  failed=res.status_code == 429 or res.status_code >= 500)
+        return res
+
+    def start_table(self, table: str, deadline_seconds: Optional[float] = None):
+        """Reset a table's retry metrics and start its overall retry deadline"""
+        import time
+
+        self.retry_stats[table] = {"retries": 0, "retry_wait_seconds": 0.0, "retries_exhausted": 0}
+        if self.endpoints is not None:
+            self.endpoints.release(table)
+        if deadline_seconds:
+            self._deadlines[table] = time.monotonic() + deadline_seconds
+        else:
+            self._deadlines.pop(table, None)
+
+    def _policy_for(self, url: str) -> RetryPolicy:
+        from urllib.parse import urlsplit
+
+        path = urlsplit(url).path
+        for endpoint, policy in self.endpoint_policies.items():
+            if endpoint in path:
+                return policy
+        return self.retry_policy
+
+    def _request(self, method: str, url: str, timeout: float, table: Optional[str] = None, **kwargs):
+        """
+        Send one request under the endpoint's RetryPolicy. POSTs carry an
+        Idempotency-Key that stays the same across attempts, so the server
+        can drop a batch it already applied when only the response was lost.
+        Retries stop early when the next wait would overrun the table's
+        deadline; the last response is returned or the last error re-raised.
+        With several endpoints an attempt that found its endpoint unreachable
+        takes it out (EndpointPool.fail), and the retry, after the same
+        backoff, goes to another one.
+        """
+        import time
+        import uuid
+
+        import requests
+
+        policy = self._policy_for(url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if method == "POST":
+            headers.setdefault("Idempotency-Key", uuid.uuid4().hex)
+        deadline = self._deadlines.get(table)
+        stats = self.retry_stats.get(table)
+        delay = policy.base_delay
+        for attempt in range(1, policy.max_attempts + 1):
+            if deadline is not None:
+                timeout = max(1.0, min(timeout, deadline - time.monotonic()))
+            res, error = None, None
+            base_url = self.endpoints.route(table) if self.endpoints is not None else None
+            started = time.perf_counter()
+            try:
+                res = self.session.request(method, self._routed(url, base_url), timeout=timeout, headers=headers, **kwargs)
+                if res.status_code not in policy.statuses:
+                    if base_url is not None:
+                        self.endpoints.record(base_url, time.perf_counter() - started)
+                    return res
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            failover = False
+            if base_url is not None:
+                if error is not None or res.status_code in EndpointPool.DOWN_STATUSES:
+                    failover = self.endpoints.fail(base_url)
+                else:
+                    self.endpoints.record(base_url, time.perf_counter() - started, failed=True)
+            if attempt == policy.max_attempts:
+                break
+            delay = policy.backoff(delay)
+            wait = RetryPolicy.retry_after(res)
+            if wait is None:
+                wait = delay
+            if deadline is not None and time.monotonic() + wait > deadline:
+                logging.warning(f"⏰ {table} retry deadline reached, giving up after {attempt} attempts")
+                break
+            logging.warning(f"⚠️ {table or 'request'} got {error or res.status_code}"
+                            + (f" from {base_url}" if base_url is not None else "")
+                            + f", retry {attempt}/{policy.max_attempts - 1} in {wait:.1f}s"
+                            + (" on another endpoint" if failover else ""))
+            if stats is not None:
+                stats["retries"] += 1
+                stats["retry_wait_seconds"] = round(stats["retry_wait_seconds"] + wait, 3)
+            time.sleep(wait)
+        if stats is not None:
+            stats["retries_exhausted"] += 1
+        if error is not None:
+            raise error
+        return res
+
+    def _post(self, url: str, payload: Any, timeout: float, table: Optional[str] = None):
+        """
+        POST one request. With the outbox enabled, requests that fail with a
+        network error or a retryable status - and every later request of
+        the same table, to keep their order - are queued durably instead,
+        with the Idempotency-Key the failed attempts were sent with.
+        """
+        import uuid
+
+        columns = self.dictionary_tables.get(table)
+        if columns and isinstance(payload, list) and payload:
+            payload = dictionary_encode(payload, columns)
+            url = f"{url}&encoding=dictionary"
+        key = uuid.uuid4().hex
+        headers = {"Idempotency-Key": key}
+        if self.outbox is None:
+            return self._request("POST", url, timeout, table, json=payload, headers=headers)
+
+        if self.config.outbox_mode == "always" or self.outbox.has_pending(table):
+            self.outbox.enqueue(table, url, payload, timeout, key)
+            return OutboxReceipt()
+        import requests
+
+        try:
+            res = self._request("POST", url, timeout, table, json=payload, headers=headers)
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"⚠️ {table} request failed ({e}), queuing in outbox")
+            self.outbox.enqueue(table, url, payload, timeout, key)
+            return OutboxReceipt()
+        if res.status_code == 429 or res.status_code >= 500:
+            logging.warning(f"⚠️ {table} request got {res.status_code}, queuing in outbox")
+            self.outbox.enqueue(table, url, payload, timeout, key)
+            return OutboxReceipt()
+        return res
+
+    def _table_url(self, table: str, endpoint: str, **params) -> str:
+        if table in self.upsert_tables:
+            params["upsert"] = "true"
+        return self._url(endpoint, **params)
+
+    @property
+    def session(self) -> "requests.Session":
+        # Created on first upload so dry runs never import the HTTP stack
+        if self._session is None:
+            self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> "requests.Session":
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        # Retries are handled per endpoint by _request (RetryPolicy), not by urllib3
+        adapter = HTTPAdapter(max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({'Content-Type': 'application/json'})
+        return session
+
+    def upload_changes(self, table: str, endpoint: str, key_field: str, keys: List[str],
+                       rows: List[Dict[str, Any]], batch_size: int = 500) -> bool:
+        """
+        Upload captured changes: the server replaces all rows whose key_field
+        is in replace_keys with the rows sent (keys without rows were deleted)
+        """
+        rows_by_key = {}
+        for row in rows:
+            rows_by_key.setdefault(str(row.get(key_field) or '').strip(), []).append(row)
+
+        url = self._url(endpoint, cdc="true")
+        total_batches = (len(keys) + batch_size - 1) // batch_size
+        for i in range(0, len(keys), batch_size):
+            batch_keys = keys[i:i + batch_size]
+            batch_rows = [row for key in batch_keys for row in rows_by_key.get(key, [])]
+            batch_num = (i // batch_size) + 1
+            payload = {"key_field": key_field, "replace_keys": batch_keys, "rows": batch_rows}
+            try:
+                logging.info(f"📤 Uploading {table} changes batch {batch_num}/{total_batches} "
+                             f"({len(batch_keys)} keys, {len(batch_rows)} rows)")
+                res = self._post(url, payload, self.config.api_timeout, table=table)
+                if res.status_code not in [200, 201]:
+                    logging.error(f"❌ {table} changes batch {batch_num} failed: {res.status_code} - {res.text}")
+                    return False
+            except Exception as e:
+                logging.error(f"❌ Exception uploading {table} changes batch {batch_num}: {e}")
+                return False
+        logging.info(f"✅ {table} changes uploaded ({len(keys)} keys, {len(rows)} rows)")
+        return True
+
+    def verify_ranges(self, table: str, field: str, length: int, within: Optional[List[str]] = None,
+                      within_length: int = 0) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Server-side RangeHashes.level() over the rows it stores; None if the request failed"""
+        url = self._url(self.ENDPOINT_VERIFY_RANGES, table=table)
+        payload = {"field": field, "length": length, "within": within, "within_length": within_length}
+        try:
+            # A query, never deferred to the outbox
+            res = self._request("POST", url, self.config.api_timeout, table, json=payload)
+            if res.status_code != 200:
+                logging.error(f"❌ {table} range verification failed: {res.status_code} - {res.text}")
+                return None
+            return res.json()["ranges"]
+        except Exception as e:
+            logging.error(f"❌ Exception verifying {table} ranges: {e}")
+            return None
+
+    def reconcile(self, table: str, endpoint: str, field: str, lengths: tuple,
+                  rows: List[Dict[str, Any]], batch_size: int = 500) -> bool:
+        """
+        Compare range hashes with the server level by level (year, then
+        month...), descending only into ranges that differ, and re-upload
+        the rows of the differing ranges at the finest level
+        """
+        local = RangeHashes(rows, field)
+        within, within_length = None, 0
+        for length in lengths:
+            remote = self.verify_ranges(table, field, length, within, within_length)
+            if remote is None:
+                return False
+            mine = local.level(length, within, within_length)
+            differing = sorted(prefix for prefix in set(mine) | set(remote) if mine.get(prefix) != remote.get(prefix))
+            logging.info(f"🔎 {table}: {len(differing)} of {len(set(mine) | set(remote))} ranges "
+                         f"differ at {field}[:{length}]")
+            if not differing:
+                logging.info(f"✅ {table} is in sync with the server")
+                return True
+            within, within_length = differing, length
+        return self.upload_ranges(table, endpoint, field, within_length, within,
+                                  local.rows_in(within, within_length), batch_size)
+
+    def upload_ranges(self, table: str, endpoint: str, field: str, length: int, prefixes: List[str],
+                      rows_by_range: Dict[str, List[Dict[str, Any]]], batch_size: int = 500) -> bool:
+        """
+        Replace whole ranges on the server: it deletes the rows whose
+        field[:length] is in replace_ranges, then inserts the rows sent. A
+        range larger than a batch is cleared by its first batch only.
+        """
+        batches = []
+        ranges, chunk = [], []
+        for prefix in prefixes:
+            ranges.append(prefix)
+            pending = rows_by_range.get(prefix, [])
+            while len(chunk) + len(pending) > batch_size:
+                take = batch_size - len(chunk)
+                chunk.extend(pending[:take])
+                pending = pending[take:]
+                batches.append((ranges, chunk))
+                ranges, chunk = [], []
+            chunk.extend(pending)
+        if ranges or chunk:
+            batches.append((ranges, chunk))
+
+        url = self._url(endpoint, reconcile="true")
+        total_rows = sum(len(chunk) for _, chunk in batches)
+        for batch_num, (ranges, chunk) in enumerate(batches, 1):
+            payload = {"range_field": field, "range_length": length, "replace_ranges": ranges, "rows": chunk}
+            try:
+                logging.info(f"📤 Re-uploading {table} ranges batch {batch_num}/{len(batches)} "
+                             f"({len(ranges)} ranges, {len(chunk)} rows)")
+                res = self._post(url, payload, self.config.api_timeout, table=table)
+                if res.status_code not in [200, 201]:
+                    logging.error(f"❌ {table} ranges batch {batch_num} failed: {res.status_code} - {res.text}")
+                    return False
+            except Exception as e:
+                logging.error(f"❌ Exception re-uploading {table} ranges batch {batch_num}: {e}")
+                return False
+        logging.info(f"✅ {table} reconciled ({len(prefixes)} ranges, {total_rows} rows re-uploaded)")
+        return True
+
+    def upload_accttservicemaster(self, rows: List[Dict[str, Any]]) -> bool:
+        url = self._table_url('acc_tt_servicemaster', self.ENDPOINT_ACC_TT_SERVICE)
+        try:
+            res = self._post(url, rows, self.config.api_timeout, table='acc_tt_servicemaster')
+            if res.status_code in [200, 201]:
+                logging.info("✅ acc_tt_servicemaster uploaded successfully")
+                return True
+            else:
+                logging.error(f"❌ acc_tt_servicemaster upload failed: {res.status_code} – {res.text}")
+                return False
+        except Exception as e:
+            logging.error(f"❌ Exception in upload_accttservicemaster: {e}")
+            return False
+
+    def upload_users(self, users: List[Dict[str, Any]]) -> bool:
+        url = self._table_url('users', self.ENDPOINT_USERS)
+        try:
+            res = self._post(url, users, self.config.api_timeout, table='users')
+            if res.status_code in [200, 201]:
+                logging.info("✅ Users uploaded successfully")
+                return True
+            else:
+                logging.error(f"❌ Upload failed: {res.status_code} - {res.text}")
+                return False
+        except Exception as e:
+            logging.error(f"❌ Exception in upload_users: {e}")
+            return False
+
+    def upload_misel(self, misel: List[Dict[str, Any]]) -> bool:
+        url = self._table_url('misel', self.ENDPOINT_MISEL)
+        try:
+            res = self._post(url, misel, self.config.api_timeout, table='misel')
+            if res.status_code in [200, 201]:
+                logging.info("✅ Misel uploaded successfully")
+                return True
+            else:
+                logging.error(f"❌ Upload failed: {res.status_code} - {res.text}")
+                return False
         except Exception as e:
             logging.error(f"❌ Exception in upload_misel: {e}")
             return False
@@ -383,24 +2423,30 @@ class WebAPIClient:
             return True
         
         # Use batching for large datasets (> 1000 records)
-        if len(acc_master) > 1000:
+        if len(acc_master) > self.LARGE_DATASET_ROWS:
             logging.info(f"📦 Large dataset detected ({len(acc_master)} records). Using batch upload...")
-            return self._upload_in_batches_with_clear('acc_master', acc_master, batch_size=200)
+            return self._upload_in_batches_with_clear('acc_master', acc_master,
+                                                      batch_size=self.LARGE_DATASET_BATCH_SIZES['acc_master'])
         
         # For smaller datasets, use single upload
-        url = f"{self.config.api_base_url}{self.ENDPOINT_ACC_MASTER}?client_id={self.config.client_id}&force_clear=true"
+        upsert = 'acc_master' in self.upsert_tables
+        if upsert:
+            url = self._table_url('acc_master', self.ENDPOINT_ACC_MASTER)
+        else:
+            url = self._url(self.ENDPOINT_ACC_MASTER, force_clear="true")
         try:
-            # Clear existing data first
-            logging.info("🧹 Clearing existing acc_master data...")
-            clear_res = self.session.post(url, json=[], timeout=60)
-            
-            if clear_res.status_code not in [200, 201]:
-                logging.error(f"❌ Failed to clear existing acc_master data: {clear_res.status_code} - {clear_res.text}")
-                return False
+            if not upsert:
+                # Clear existing data first
+                logging.info("🧹 Clearing existing acc_master data...")
+                clear_res = self._post(url, [], 60, table='acc_master')
+                
+                if clear_res.status_code not in [200, 201]:
+                    logging.error(f"❌ Failed to clear existing acc_master data: {clear_res.status_code} - {clear_res.text}")
+                    return False
             
             # Upload new data with extended timeout
             logging.info(f"📤 Uploading {len(acc_master)} acc_master records...")
-            res = self.session.post(url, json=acc_master, timeout=120)
+            res = self._post(url, acc_master, 120, table='acc_master')
             
             if res.status_code in [200, 201]:
                 logging.info("✅ Acc_Master uploaded successfully")
@@ -427,19 +2473,20 @@ class WebAPIClient:
         
         endpoint = endpoint_map.get(table_name, self.ENDPOINT_ACC_MASTER)
         total_records = len(data)
-        url = f"{self.config.api_base_url}{endpoint}?client_id={self.config.client_id}"
+        url = self._table_url(table_name, endpoint)
         
-        # Clear existing data first
-        try:
-            logging.info(f"🧹 Clearing existing {table_name} data...")
-            clear_url = f"{url}&force_clear=true"
-            res = self.session.post(clear_url, json=[], timeout=60)
-            if res.status_code not in [200, 201]:
-                logging.error(f"❌ Failed to clear existing data: {res.status_code} - {res.text}")
+        # Clear existing data first (not needed when the server upserts deduplicated rows)
+        if table_name not in self.upsert_tables:
+            try:
+                logging.info(f"🧹 Clearing existing {table_name} data...")
+                clear_url = f"{url}&force_clear=true"
+                res = self._post(clear_url, [], 60, table=table_name)
+                if res.status_code not in [200, 201]:
+                    logging.error(f"❌ Failed to clear existing data: {res.status_code} - {res.text}")
+                    return False
+            except Exception as e:
+                logging.error(f"❌ Exception clearing data: {e}")
                 return False
-        except Exception as e:
-            logging.error(f"❌ Exception clearing data: {e}")
-            return False
         
         # Process in batches
         success_count = 0
@@ -461,7 +2508,7 @@ class WebAPIClient:
                 # Use append=true for subsequent batches
                 batch_url = f"{url}&append=true" if i > 0 else url
                 
-                res = self.session.post(batch_url, json=batch, timeout=timeout)
+                res = self._post(batch_url, batch, timeout, table=table_name)
                 
                 if res.status_code in [200, 201]:
                     success_count += len(batch)
@@ -488,18 +2535,19 @@ class WebAPIClient:
         # Map endpoint keys to actual endpoints
         endpoint_map = {
             'acc_ledgers': self.ENDPOINT_ACC_LEDGERS,
-            'acc_invmast': self.ENDPOINT_ACC_INVMAST
+            'acc_invmast': self.ENDPOINT_ACC_INVMAST,
+            'acc_ledger_balances': self.ENDPOINT_ACC_LEDGER_BALANCES
         }
         
         endpoint = endpoint_map.get(endpoint_key, f"/upload-{endpoint_key}/")
         total_records = len(data)
-        url = f"{self.config.api_base_url}{endpoint}?client_id={self.config.client_id}"
+        url = self._table_url(endpoint_key, endpoint)
         
         # For large datasets, clear existing data first with empty batch
-        if total_records > batch_size:
+        if total_records > batch_size and endpoint_key not in self.upsert_tables:
             try:
                 logging.info(f"🧹 Clearing existing {endpoint_key} data...")
-                res = self.session.post(url, json=[], timeout=60)
+                res = self._post(url, [], 60, table=endpoint_key)
                 if res.status_code not in [200, 201]:
                     logging.error(f"❌ Failed to clear existing data: {res.status_code} - {res.text}")
             except Exception as e:
@@ -522,7 +2570,7 @@ class WebAPIClient:
                 if total_records > batch_size and i > 0:
                     batch_url = f"{url}&append=true"
                 
-                res = self.session.post(batch_url, json=batch, timeout=timeout)
+                res = self._post(batch_url, batch, timeout, table=endpoint_key)
                 
                 if res.status_code in [200, 201]:
                     success_count += len(batch)
@@ -538,83 +2586,938 @@ class WebAPIClient:
         logging.info(f"✅ {endpoint_key.title()} uploaded successfully ({success_count}/{total_records} records)")
         return True
 
-    def upload_acc_ledgers(self, acc_ledgers: List[Dict[str, Any]]) -> bool:
-        return self._upload_in_batches('acc_ledgers', acc_ledgers, self.config.large_table_batch_size)
+    def planned_requests(self, table: str, rows: int, batch_size: Optional[int] = None) -> int:
+        """Upload requests the table's upload method will send for this many rows (force_clear included)"""
+        import math
+
+        clear = 0 if table in self.upsert_tables else 1
+        if batch_size is not None:
+            # _upload_in_batches only clears when the rows take more than one batch
+            batches = max(1, math.ceil(rows / batch_size))
+            return batches + (clear if batches > 1 else 0)
+        if rows > self.LARGE_DATASET_ROWS and table in self.LARGE_DATASET_BATCH_SIZES:
+            # _upload_in_batches_with_clear always clears first
+            return clear + math.ceil(rows / self.LARGE_DATASET_BATCH_SIZES[table])
+        return 1 + (clear if table in ("acc_master", "cashandbankaccmaster") else 0)
+
+    def upload_acc_ledgers(self, acc_ledgers: List[Dict[str, Any]], batch_size: int = None) -> bool:
+        return self._upload_in_batches('acc_ledgers', acc_ledgers, batch_size or self.config.large_table_batch_size)
+
+    def upload_acc_ledger_balances(self, balances: List[Dict[str, Any]], batch_size: int = None) -> bool:
+        return self._upload_in_batches('acc_ledger_balances', balances, batch_size or self.config.batch_size)
+
+    def upload_acc_invmast(self, acc_invmast: List[Dict[str, Any]]) -> bool:
+        """Upload acc_invmast with batching for large datasets"""
+        if not acc_invmast:
+            logging.warning("No acc_invmast data to upload")
+            return True
+        
+        # Use batching for datasets > 1000 records
+        if len(acc_invmast) > self.LARGE_DATASET_ROWS:
+            logging.info(f"📦 Large dataset detected ({len(acc_invmast)} records). Using batch upload...")
+            return self._upload_in_batches_with_clear('acc_invmast', acc_invmast,
+                                                      batch_size=self.LARGE_DATASET_BATCH_SIZES['acc_invmast'])
+        
+        # For smaller datasets, use single upload with extended timeout
+        url = self._table_url('acc_invmast', self.ENDPOINT_ACC_INVMAST)
+        try:
+            res = self._post(url, acc_invmast, 120, table='acc_invmast')
+            if res.status_code in [200, 201]:
+                logging.info("✅ AccInvmast uploaded successfully")
+                return True
+            else:
+                logging.error(f"❌ Upload failed: {res.status_code} - {res.text}")
+                return False
+        except Exception as e:
+            logging.error(f"❌ Exception in upload_acc_invmast: {e}")
+            return False
+
+    def upload_cashandbankaccmaster(self, cashandbankaccmaster: List[Dict[str, Any]]) -> bool:
+        url = self._table_url('cashandbankaccmaster', self.ENDPOINT_CASH_BANK)
+        try:
+            if 'cashandbankaccmaster' not in self.upsert_tables:
+                # Clear existing data first to avoid duplicate key errors
+                logging.info("🧹 Clearing existing cashandbankaccmaster data...")
+                clear_url = f"{url}&force_clear=true"
+                clear_res = self._post(clear_url, [], 60, table='cashandbankaccmaster')
+                
+                if clear_res.status_code not in [200, 201]:
+                    logging.error(f"❌ Failed to clear existing data: {clear_res.status_code} - {clear_res.text}")
+                    # Continue anyway, the view might handle it
+            
+            # Upload new data
+            res = self._post(url, cashandbankaccmaster, self.config.api_timeout, table='cashandbankaccmaster')
+            if res.status_code in [200, 201]:
+                logging.info("✅ CashAndBankAccMaster uploaded successfully")
+                return True
+            else:
+                logging.error(f"❌ Upload failed: {res.status_code} - {res.text}")
+                return False
+        except Exception as e:
+            logging.error(f"❌ Exception in upload_cashandbankaccmaster: {e}")
+            return False
+
+    def write_bulk_file(self, table: str, rows: List[Dict[str, Any]], file_format: str) -> str:
+        """Stream rows into a gzip-compressed NDJSON or CSV file and return its path"""
+        import csv
+        import gzip
+
+        os.makedirs(self.config.bulk_dir, exist_ok=True)
+        path = os.path.join(self.config.bulk_dir, f"{table}{self.BULK_FORMATS[file_format]}")
+        # mtime=0 keeps the bytes (and so the checksum) stable for identical data
+        with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz, \
+                io.TextIOWrapper(gz, encoding="utf-8", newline="") as f:
+            if file_format == "csv":
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]), extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str).encode
+                for row in rows:
+                    f.write(dumps(row))
+                    f.write("\n")
+        return path
+
+    @staticmethod
+    def _file_sha256(path: str) -> str:
+        import hashlib
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _bulk_session_url(self, upload_id: str, action: str = "") -> str:
+        return self._url(f"{self.ENDPOINT_BULK_IMPORT}{upload_id}/{action}")
+
+    @staticmethod
+    def _json_body(res) -> Dict[str, Any]:
+        """Response body as a dict; {} when it is not a JSON object (e.g. a proxy's HTML error page)"""
+        try:
+            body = res.json()
+        except ValueError:
+            return {}
+        return body if isinstance(body, dict) else {}
+
+    def _bulk_offset(self, upload_id: str) -> Optional[int]:
+        """Bytes the server already holds for an upload session, None if it is unknown"""
+        import requests
+
+        try:
+            res = self._request("GET", self._bulk_session_url(upload_id), self.config.api_timeout)
+        except requests.exceptions.RequestException:
+            return None
+        body = self._json_body(res)
+        if res.status_code != 200 or "offset" not in body:
+            return None
+        return int(body["offset"])
+
+    def upload_bundle(self, tables: Dict[str, List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Upload several small tables in one gzip-compressed request:
+        {"tables": [{"table", "mode": "replace"|"upsert", "rows"}]}. The server
+        applies each table separately and answers {"results": {table:
+        {"status": "ok"|"error", ...}}}. Returns {table: True/False}, or None
+        when the request as a whole failed (e.g. no bundle endpoint) so the
+        caller can fall back to one upload per table.
+        """
+        import gzip
+
+        envelope = {"tables": [{"table": table, "mode": "upsert" if table in self.upsert_tables else "replace",
+                                "rows": rows} for table, rows in tables.items()]}
+        body = gzip.compress(json.dumps(envelope, default=str).encode("utf-8"))
+        url = self._url(self.ENDPOINT_BUNDLE)
+        try:
+            logging.info(f"📤 Uploading bundle of {len(tables)} tables "
+                         f"({sum(len(rows) for rows in tables.values())} rows, {len(body)} bytes compressed)")
+            res = self._request("POST", url, self.config.api_timeout, "bundle", data=body,
+                                headers={"Content-Encoding": "gzip"})
+            if res.status_code not in [200, 201]:
+                logging.warning(f"⚠️ Bundle upload failed: {res.status_code} - {res.text}")
+                return None
+            results = res.json()["results"]
+        except Exception as e:
+            logging.warning(f"⚠️ Exception in upload_bundle: {e}")
+            return None
+        outcome = {}
+        for table in tables:
+            result = results.get(table) or {"status": "error", "error": "missing from response"}
+            outcome[table] = result.get("status") == "ok"
+            if outcome[table]:
+                logging.info(f"✅ {table} uploaded in bundle")
+            else:
+                logging.error(f"❌ {table} bundle upload failed: {result.get('error')}")
+        return outcome
+
+    def upload_bulk(self, table: str, rows: List[Dict[str, Any]]) -> bool:
+        """
+        Bulk mode for very large tables: write all rows to one compressed file
+        and send it to the bulk-import endpoint in resumable chunks.
+
+        Protocol: POST /bulk-import/ creates a session for the file (its
+        size and sha256) and returns an upload_id; PUT /bulk-import/<id>/
+        with a Content-Range header appends a chunk; GET /bulk-import/<id>/
+        reports the committed offset so a failed chunk (or a later run with
+        identical data) resumes where the server stopped; POST
+        /bulk-import/<id>/complete/ lets the server load the file.
+        """
+        if not rows:
+            return True
+        file_format = self.config.bulk_format
+        try:
+            path = self.write_bulk_file(table, rows, file_format)
+            size = os.path.getsize(path)
+            sha256 = self._file_sha256(path)
+            logging.info(f"📦 {table}: {len(rows)} rows written to {path} ({size / 1024 / 1024:.1f} MiB)")
+
+            state_path = f"{path}.session.json"
+            upload_id, offset = None, 0
+            if os.path.exists(state_path):
+                with open(state_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                if state.get("sha256") == sha256:
+                    upload_id = state["upload_id"]
+                    offset = self._bulk_offset(upload_id)
+                    if offset is None:
+                        upload_id, offset = None, 0
+                    else:
+                        logging.info(f"⏩ Resuming {table} bulk upload at byte {offset}/{size}")
+            if upload_id is None:
+                mode = "upsert" if table in self.upsert_tables else "replace"
+                res = self._request("POST", self._url(self.ENDPOINT_BULK_IMPORT, table=table),
+                                    self.config.api_timeout, table, json={
+                                        "table": table, "format": file_format, "compression": "gzip",
+                                        "size": size, "sha256": sha256, "rows": len(rows), "mode": mode,
+                                    })
+                if res.status_code not in [200, 201]:
+                    logging.error(f"❌ Bulk session for {table} failed: {res.status_code} - {res.text}")
+                    return False
+                upload_id = res.json()["upload_id"]
+                with open(state_path, "w", encoding="utf-8") as f:
+                    json.dump({"upload_id": upload_id, "sha256": sha256}, f)
+
+            if not self._send_bulk_chunks(table, path, upload_id, offset, size):
+                return False
+
+            res = self._request("POST", self._bulk_session_url(upload_id, "complete/"),
+                                max(self.config.api_timeout, 600), table, json={"sha256": sha256})
+            if res.status_code not in [200, 201]:
+                logging.error(f"❌ Bulk import of {table} failed: {res.status_code} - {res.text}")
+                return False
+            os.remove(state_path)
+            logging.info(f"✅ {table} bulk-imported ({len(rows)} records)")
+            return True
+        except Exception as e:
+            logging.error(f"❌ Exception in bulk upload of {table}: {e}")
+            return False
+
+    def _send_bulk_chunks(self, table: str, path: str, upload_id: str, offset: int, size: int) -> bool:
+        import time
+
+        import requests
+
+        chunk_size = self.config.bulk_chunk_bytes
+        url = self._bulk_session_url(upload_id)
+        failures = 0
+        with open(path, "rb") as f:
+            while offset < size:
+                f.seek(offset)
+                chunk = f.read(chunk_size)
+                end = offset + len(chunk) - 1
+                headers = {"Content-Type": "application/octet-stream",
+                           "Content-Range": f"bytes {offset}-{end}/{size}"}
+                try:
+                    base_url = self.endpoints.route(table) if self.endpoints is not None else None
+                    res = self.session.put(self._routed(url, base_url), data=chunk, headers=headers,
+                                           timeout=self.config.api_timeout)
+                    body = self._json_body(res)
+                    if res.status_code in [200, 201]:
+                        offset = int(body.get("offset", end + 1))
+                        failures = 0
+                        logging.info(f"📤 {table} bulk upload {offset}/{size} bytes")
+                        continue
+                    if res.status_code == 409 and "offset" in body:
+                        # An earlier attempt of this chunk landed after all
+                        offset = int(body["offset"])
+                        continue
+                    error = f"{res.status_code} - {res.text}"
+                    if base_url is not None and res.status_code in EndpointPool.DOWN_STATUSES:
+                        self.endpoints.fail(base_url)
+                except requests.exceptions.RequestException as e:
+                    error = str(e)
+                    if base_url is not None and isinstance(e, (requests.exceptions.ConnectionError,
+                                                               requests.exceptions.Timeout)):
+                        self.endpoints.fail(base_url)
+                failures += 1
+                if failures >= self.BULK_CHUNK_ATTEMPTS:
+                    logging.error(f"❌ {table} bulk chunk at byte {offset} failed {failures} times: {error}")
+                    return False
+                logging.warning(f"⚠️ {table} bulk chunk at byte {offset} failed ({error}), resuming")
+                time.sleep(min(30, 2 ** failures))
+                # The chunk may have landed even though the response was lost
+                server_offset = self._bulk_offset(upload_id)
+                if server_offset is not None:
+                    offset = server_offset
+        return True
+
+
+def lookup_key(value) -> str:
+    """
+    Key under which SQL Anywhere may consider two join values equal
+    depending on collation, blank padding or conversion to a number:
+    trimmed and case folded, numbers by value ('01' and 1 compare equal
+    against a numeric column)
+    """
+    text = str(value).strip()
+    try:
+        return repr(float(text))
+    except ValueError:
+        return text.casefold()
+
+
+def parse_ledger_date(value) -> Optional[str]:
+    """entry_date -> 'YYYY-MM-DD' (same rules as SyncTool.validate_acc_ledgers_data)"""
+    if not value:
+        return None
+    try:
+        if hasattr(value, 'strftime'):
+            return value.strftime('%Y-%m-%d')
+        if isinstance(value, str):
+            # Fast path for the common, already normalized form
+            if len(value) == 10 and value[4] == value[7] == '-' and value[:4].isdigit():
+                try:
+                    return date.fromisoformat(value).isoformat()
+                except ValueError:
+                    pass
+            for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d'):
+                try:
+                    return datetime.strptime(value, fmt).strftime('%Y-%m-%d')
+                except ValueError:
+                    continue
+            return None
+        return str(value)
+    except Exception as date_e:
+        ROW_WARNINGS.warn("date", "Could not parse date %s: %s", value, date_e)
+        return None
+
+
+def parse_voucher_no(value) -> Optional[int]:
+    """voucher_no -> int (same rules as SyncTool.validate_acc_ledgers_data)"""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return int(value)
+        if isinstance(value, str) and value.strip():
+            return int(float(value.strip()))
+        return None
+    except (ValueError, TypeError) as voucher_e:
+        ROW_WARNINGS.warn("voucher_no", "Could not parse voucher_no %s: %s", value, voucher_e)
+        return None
+
+
+def format_any_date(value) -> Optional[str]:
+    """invdate -> 'YYYY-MM-DD' for date objects, str() for anything else"""
+    if not value:
+        return None
+    try:
+        return value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)
+    except Exception:
+        return None
+
+
+def clean_area(value) -> Optional[str]:
+    return str(value).strip() if value and value != 'No Area' else None
+
+
+# Declarative column specs for the generated validators. Each column is
+# (output field, source field, kind[, argument]); kinds mirror the idioms of
+# the hand-written validate_*_data methods:
+#   raw           row.get(src, arg)             str_strip     str(v).strip()
+#   str_strip_or  str(v).strip() if v else arg  strip_or_none v.strip() if v else None
+#   str_or_none   str(v) if v else None         int           int(v)
+#   float_or_none float(v) if v is not None     float_truthy  float(v) if v else None
+#   float_safe    float(v), None on bad input   date          v.strftime('%Y-%m-%d') if v
+#   call          arg(v) with a module helper   const         context[arg]
+# "numeric" lists required source fields whose database column is not a
+# character type; pushdown tests those against 0 instead of ''.
+VALIDATOR_SCHEMAS = {
+    "users": {
+        "required": ["id", "pass"],
+        "numeric": ["id"],
+        "columns": [
+            ("id", "id", "str_strip"),
+            ("pass", "pass", "str_strip"),
+            ("role", "role", "strip_or_none"),
+            ("accountcode", "accountcode", "strip_or_none"),
+        ],
+    },
+    "misel": {
+        "required": ["firm_name"],
+        "columns": [("firm_name", "firm_name", "raw", None)] + [
+            (f, f, "raw", '') for f in ("address", "phones", "mobile", "address1", "address2",
+                                        "address3", "pagers", "tinno")
+        ],
+    },
+    "acc_master": {
+        "required": ["code"],
+        "columns": [
+            ("code", "code", "str_strip"),
+            ("name", "name", "str_strip_or", ''),
+            ("super_code", "super_code", "str_strip_or", None),
+            ("opening_balance", "opening_balance", "float_or_none"),
+            ("debit", "debit", "float_or_none"),
+            ("credit", "credit", "float_or_none"),
+            ("place", "place", "str_strip_or", ''),
+            ("phone2", "phone2", "str_strip_or", ''),
+            ("openingdepartment", "openingdepartment", "str_strip_or", ''),
+            ("area", "area", "call", "clean_area"),
+        ],
+    },
+    "acc_ledgers": {
+        "required": ["code"],
+        "columns": [
+            ("code", "code", "str_strip"),
+            ("particulars", "particulars", "raw", ''),
+            ("debit", "debit", "float_safe"),
+            ("credit", "credit", "float_safe"),
+            ("entry_mode", "entry_mode", "raw", ''),
+            ("entry_date", "entry_date", "call", "parse_ledger_date"),
+            ("voucher_no", "voucher_no", "call", "parse_voucher_no"),
+            ("narration", "narration", "raw", ''),
+            ("super_code", "super_code", "str_strip_or", None),
+        ],
+    },
+    "acc_invmast": {
+        "required": [],
+        "columns": [
+            ("modeofpayment", "modeofpayment", "raw", ''),
+            ("customerid", "customerid", "raw", ''),
+            ("invdate", "invdate", "call", "format_any_date"),
+            ("nettotal", "nettotal", "float_safe"),
+            ("paid", "paid", "float_safe"),
+            ("bill_ref", "bill_ref", "raw", ''),
+        ],
+    },
+    "cashandbankaccmaster": {
+        "required": ["code"],
+        "columns": [
+            ("code", "code", "str_strip"),
+            ("name", "name", "raw", ''),
+            ("super_code", "super_code", "raw", ''),
+            ("opening_balance", "opening_balance", "float_truthy"),
+            ("opening_date", "opening_date", "date"),
+            ("debit", "debit", "float_truthy"),
+            ("credit", "credit", "float_truthy"),
+            ("client_id", None, "const", "client_id"),
+        ],
+    },
+    "acc_tt_servicemaster": {
+        "required": [],
+        # A row whose slno is not an integer is dropped, like the hand-written loop
+        "skip_row_on": "(ValueError, TypeError)",
+        "columns": [
+            ("slno", "slno", "int"),
+            ("type", "type", "str_or_none"),
+            ("code", "code", "str_or_none"),
+            ("name", "name", "str_or_none"),
+        ],
+    },
+}
+
+VALIDATOR_HELPERS = {
+    "parse_ledger_date": parse_ledger_date,
+    "parse_voucher_no": parse_voucher_no,
+    "format_any_date": format_any_date,
+    "clean_area": clean_area,
+}
+
+
+def generate_validator_source(table: str, schema: Dict[str, Any]) -> str:
+    """
+    Generate the source of one specialized validator: a single loop that
+    reads every source field once into a local and builds the output dict
+    literal directly, with no per-row closures or repeated row.get calls.
+    """
+    variables = {}
+    lines = [f"def validate_{table}(rows):",
+             "    out = []",
+             "    append = out.append",
+             "    for row in rows:"]
+    body = []
+
+    def var(src, default=None):
+        key = (src, default)
+        if key not in variables:
+            variables[key] = f"v{len(variables)}"
+            args = repr(src) if default is None else f"{src!r}, {default!r}"
+            body.append(f"{variables[key]} = row.get({args})")
+        return variables[key]
 
-    def upload_acc_invmast(self, acc_invmast: List[Dict[str, Any]]) -> bool:
-        """Upload acc_invmast with batching for large datasets"""
-        if not acc_invmast:
-            logging.warning("No acc_invmast data to upload")
-            return True
-        
-        # Use batching for datasets > 1000 records
-        if len(acc_invmast) > 1000:
-            logging.info(f"📦 Large dataset detected ({len(acc_invmast)} records). Using batch upload...")
-            return self._upload_in_batches_with_clear('acc_invmast', acc_invmast, batch_size=500)
-        
-        # For smaller datasets, use single upload with extended timeout
-        url = f"{self.config.api_base_url}{self.ENDPOINT_ACC_INVMAST}?client_id={self.config.client_id}"
-        try:
-            res = self.session.post(url, json=acc_invmast, timeout=120)
-            if res.status_code in [200, 201]:
-                logging.info("✅ AccInvmast uploaded successfully")
-                return True
-            else:
-                logging.error(f"❌ Upload failed: {res.status_code} - {res.text}")
-                return False
-        except Exception as e:
-            logging.error(f"❌ Exception in upload_acc_invmast: {e}")
-            return False
+    for src in schema.get("required", []):
+        body.append(f"if not {var(src)}:")
+        body.append("    continue")
 
-    def upload_cashandbankaccmaster(self, cashandbankaccmaster: List[Dict[str, Any]]) -> bool:
-        url = f"{self.config.api_base_url}{self.ENDPOINT_CASH_BANK}?client_id={self.config.client_id}"
-        try:
-            # Clear existing data first to avoid duplicate key errors
-            logging.info("🧹 Clearing existing cashandbankaccmaster data...")
-            clear_url = f"{url}&force_clear=true"
-            clear_res = self.session.post(clear_url, json=[], timeout=60)
-            
-            if clear_res.status_code not in [200, 201]:
-                logging.error(f"❌ Failed to clear existing data: {clear_res.status_code} - {clear_res.text}")
-                # Continue anyway, the view might handle it
-            
-            # Upload new data
-            res = self.session.post(url, json=cashandbankaccmaster, timeout=self.config.api_timeout)
-            if res.status_code in [200, 201]:
-                logging.info("✅ CashAndBankAccMaster uploaded successfully")
-                return True
+    fields = []
+    for column in schema["columns"]:
+        out_name, src, kind = column[:3]
+        arg = column[3] if len(column) > 3 else None
+        if kind == "raw":
+            # A required field was already read (and found truthy) by the skip check
+            expr = var(src) if src in schema.get("required", []) else var(src, arg)
+        elif kind == "const":
+            expr = f"context[{arg!r}]"
+        elif kind == "int":
+            expr = f"int(row[{src!r}])"
+        else:
+            v = var(src)
+            if kind == "str_strip":
+                expr = f"str({v}).strip()"
+            elif kind == "str_strip_or":
+                expr = f"str({v}).strip() if {v} else {arg!r}"
+            elif kind == "strip_or_none":
+                expr = f"{v}.strip() if {v} else None"
+            elif kind == "str_or_none":
+                expr = f"str({v}) if {v} else None"
+            elif kind == "float_or_none":
+                expr = f"float({v}) if {v} is not None else None"
+            elif kind == "float_truthy":
+                expr = f"float({v}) if {v} else None"
+            elif kind == "date":
+                expr = f"{v}.strftime('%Y-%m-%d') if {v} else None"
+            elif kind == "call":
+                expr = f"{arg}({v})"
+            elif kind == "float_safe":
+                expr = f"f_{out_name}"
+                body.extend([
+                    "try:",
+                    f"    f_{out_name} = float({v}) if {v} is not None else None",
+                    "except (ValueError, TypeError):",
+                    f"    f_{out_name} = None",
+                ])
             else:
-                logging.error(f"❌ Upload failed: {res.status_code} - {res.text}")
-                return False
-        except Exception as e:
-            logging.error(f"❌ Exception in upload_cashandbankaccmaster: {e}")
-            return False
+                raise ValueError(f"Unknown column kind {kind!r} in {table}")
+        fields.append(f"{out_name!r}: {expr}")
+
+    body.append("append({" + ", ".join(fields) + "})")
+
+    skip_on = schema.get("skip_row_on")
+    indent = "            " if skip_on else "        "
+    if skip_on:
+        lines.append("        try:")
+    lines.extend(indent + line for line in body)
+    if skip_on:
+        lines.append(f"        except {skip_on}:")
+        lines.append("            continue")
+    lines.append("    return out")
+    return "\n".join(lines) + "\n"
+
+
+def compile_validator(table: str, schema: Dict[str, Any], context: Optional[Dict[str, Any]] = None):
+    """Compile the generated validator for table; context supplies 'const' columns"""
+    source = generate_validator_source(table, schema)
+    namespace = dict(VALIDATOR_HELPERS)
+    namespace["context"] = dict(context or {})
+    exec(compile(source, f"<validator {table}>", "exec"), namespace)
+    return namespace[f"validate_{table}"]
+
+
+def _sql_literal(value) -> str:
+    if value is None:
+        return "NULL"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# SQL Anywhere equivalents of the 'call' helpers for pushdown mode
+PUSHDOWN_HELPERS = {
+    "parse_ledger_date": "DATEFORMAT({e}, 'YYYY-MM-DD')",
+    "format_any_date": "DATEFORMAT({e}, 'YYYY-MM-DD')",
+    "parse_voucher_no": "CASE WHEN ISNUMERIC({e}) = 1 THEN CAST(TRUNCNUM(CAST({e} AS DOUBLE), 0) AS BIGINT) END",
+    "clean_area": "CASE WHEN {e} IS NULL OR TRIM({e}) IN ('', 'No Area') THEN NULL ELSE TRIM({e}) END",
+}
+
+
+def generate_pushdown_select(schema: Dict[str, Any], sources: Dict[str, str]):
+    """
+    SELECT list and WHERE filters doing in SQL what the generated validator
+    does per row in Python; sources maps source fields to SQL expressions
+    (default: the field name). 'const' columns are left to the pass-through.
+    Required fields are dropped when NULL or falsy: blank for character
+    columns, 0 for those listed under "numeric" (comparing a number with ''
+    is a conversion error in SQL Anywhere).
+
+    Character values are tested for emptiness as TRIM(e) = ''. SQL Anywhere
+    ignores trailing blanks when comparing, so ' ' = '' there anyway;
+    trimming first says so and gives the same result on any engine.
+    Blank-only values are therefore empty in pushdown mode, where the
+    Python validators keep them as ''.
+    """
+    filters = []
+    for src in schema.get("required", []):
+        e = sources.get(src, src)
+        if src in schema.get("numeric", []):
+            filters.append(f"{e} IS NOT NULL AND {e} <> 0")
+        else:
+            filters.append(f"{e} IS NOT NULL AND TRIM({e}) <> ''")
+    select = []
+    for column in schema["columns"]:
+        out_name, src, kind = column[:3]
+        arg = column[3] if len(column) > 3 else None
+        if kind == "const":
+            continue
+        e = sources.get(src, src)
+        if kind == "raw":
+            expr = e
+        elif kind == "str_strip":
+            expr = f"TRIM({e})"
+        elif kind in ("str_strip_or", "strip_or_none"):
+            expr = f"CASE WHEN {e} IS NULL OR TRIM({e}) = '' THEN {_sql_literal(arg)} ELSE TRIM({e}) END"
+        elif kind == "str_or_none":
+            expr = f"CASE WHEN {e} IS NULL OR TRIM({e}) = '' THEN NULL ELSE CAST({e} AS LONG VARCHAR) END"
+        elif kind == "int":
+            expr = f"CAST({e} AS INTEGER)"
+            filters.append(f"{e} IS NOT NULL")
+        elif kind == "float_or_none":
+            expr = f"CAST({e} AS DOUBLE)"
+        elif kind == "float_safe":
+            expr = f"CASE WHEN ISNUMERIC({e}) = 1 THEN CAST({e} AS DOUBLE) END"
+        elif kind == "float_truthy":
+            expr = f"CASE WHEN {e} <> 0 THEN CAST({e} AS DOUBLE) END"
+        elif kind == "date":
+            expr = f"DATEFORMAT({e}, 'YYYY-MM-DD')"
+        elif kind == "call":
+            expr = PUSHDOWN_HELPERS[arg].format(e=e)
+        else:
+            raise ValueError(f"Unknown column kind {kind!r}")
+        select.append(f'{expr} AS "{out_name}"')
+    return ", ".join(select), filters
+
+
+def compile_pushdown_validator(table: str, schema: Dict[str, Any], context: Optional[Dict[str, Any]] = None):
+    """Pass-through validator for pushdown rows: only adds the 'const' columns"""
+    constants = {column[0]: (context or {})[column[3]] for column in schema["columns"] if column[2] == "const"}
+    if not constants:
+        return list
+    return lambda rows: [{**row, **constants} for row in rows]
+
+
+# Validators of a validation worker process, built once by its initializer
+_WORKER_VALIDATORS: Dict[str, Any] = {}
+
+
+def _init_validation_worker(context: Dict[str, Any], log_queue, level: int):
+    """
+    Set up a spawned worker: its log records go to log_queue, which the
+    parent's listener drains, and its row warnings start from zero so each
+    chunk reports only its own counts. Any root handlers are dropped first,
+    as a worker must never write to the parent's outputs directly.
+    """
+    from logging.handlers import QueueHandler
+
+    ROW_WARNINGS.reset()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+    for table, schema in VALIDATOR_SCHEMAS.items():
+        _WORKER_VALIDATORS[table] = compile_validator(table, schema, context)
+
+
+def _validate_chunk(table: str, columns: tuple, chunk: List[tuple]):
+    """Worker side: rebuild the raw rows, validate them and return (columns, value tuples, warning counts)"""
+    valid = _WORKER_VALIDATORS[table]([dict(zip(columns, values)) for values in chunk])
+    warnings = ROW_WARNINGS.take_counts()
+    if not valid:
+        return (), [], warnings
+    out_columns = tuple(valid[0])
+    return out_columns, [tuple(row.values()) for row in valid], warnings
+
+
+class _ForwardToLogging(logging.Handler):
+    """Hands records from worker processes to the parent's loggers"""
+    def emit(self, record: logging.LogRecord):
+        logging.getLogger(record.name).handle(record)
+
+
+class ValidationPool:
+    """
+    Process pool whose workers hold compiled validators for every
+    VALIDATOR_SCHEMAS table. Workers log into a multiprocessing queue that a
+    listener drains into the parent's logging until shutdown().
+
+    Workers are spawned, never forked: the pool starts from scheduler
+    threads, and a fork there copies whatever locks other threads hold at
+    that moment (ROW_WARNINGS, logging handlers) into a child that can
+    never release them.
+    """
+    def __init__(self, workers: int, context: Dict[str, Any]):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from logging.handlers import QueueListener
+
+        spawn = multiprocessing.get_context("spawn")
+        self._log_queue = spawn.Queue()
+        self._listener = QueueListener(self._log_queue, _ForwardToLogging())
+        self._listener.start()
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=spawn,
+                                             initializer=_init_validation_worker,
+                                             initargs=(context, self._log_queue, logging.getLogger().level))
+
+    def map(self, fn, *iterables):
+        return self._executor.map(fn, *iterables)
+
+    def shutdown(self):
+        self._executor.shutdown()
+        # Workers have exited and flushed their queue feeders: drain what is left
+        self._listener.stop()
+        self._log_queue.close()
+
+
+def create_validation_pool(workers: int, context: Dict[str, Any]) -> ValidationPool:
+    """Process pool whose workers hold compiled validators for every VALIDATOR_SCHEMAS table"""
+    return ValidationPool(workers, context)
+
+
+def validate_in_pool(pool, table: str, rows: List[Dict[str, Any]], chunk_rows: int) -> List[Dict[str, Any]]:
+    """
+    Validate rows with the generated validator on a process pool. Rows are
+    shipped as value tuples (column names once per chunk) and come back the
+    same way; pool.map keeps chunk order, so the output order is exactly
+    that of a single-process run.
+    """
+    from itertools import repeat
+
+    columns = tuple(rows[0])
+    chunks = ([tuple(row.values()) for row in rows[i:i + chunk_rows]] for i in range(0, len(rows), chunk_rows))
+    valid = []
+    for out_columns, values, warnings in pool.map(_validate_chunk, repeat(table), repeat(columns), chunks):
+        valid.extend(dict(zip(out_columns, v)) for v in values)
+        ROW_WARNINGS.merge(warnings)
+    return valid
+
+
+class TableSpec:
+    """
+    Declarative description of one table sync.
+    fetch/validate/upload name methods on DatabaseConnector, SyncTool and
+    WebAPIClient respectively; depends_on lists tables that must upload first.
+    """
+    def __init__(self, name: str, fetch: str, validate: str, upload: str, endpoint: str,
+                 batch_size: Optional[str] = None, depends_on: tuple = (), critical: bool = False,
+                 retries: int = 0, summarize: Optional[str] = None, enabled_if: Optional[str] = None,
+                 natural_key: tuple = (), probe: Optional[str] = None, ranges: Optional[tuple] = None):
+        self.name = name
+        self.fetch = fetch
+        self.validate = validate
+        self.upload = upload
+        self.endpoint = endpoint
+        self.batch_size = batch_size  # DatabaseConfig setting name, None = upload method's own policy
+        self.depends_on = tuple(depends_on)
+        self.critical = critical  # A failure stops the whole run
+        self.retries = retries
+        self.summarize = summarize
+        self.enabled_if = enabled_if  # DatabaseConfig property; the table only syncs by default when it is true
+        self.natural_key = tuple(natural_key)  # Columns identifying a row; enables dedup and upserts
+        self.probe = probe  # Cheap change-indicator query used by watch mode
+        self.ranges = ranges  # (field, prefix lengths) reconcile mode hashes and drills down by
+
+
+# Order matters only for display and tie-breaking; execution order comes from depends_on
+TABLE_REGISTRY = [
+    TableSpec("users", fetch="fetch_users", validate="validate_user_data",
+              upload="upload_users", endpoint=WebAPIClient.ENDPOINT_USERS, natural_key=("id",),
+              probe="SELECT COUNT(*) FROM {table_name_users}"),
+    TableSpec("misel", fetch="fetch_misel", validate="validate_misel_data",
+              upload="upload_misel", endpoint=WebAPIClient.ENDPOINT_MISEL, natural_key=("firm_name",),
+              probe="SELECT COUNT(*) FROM {table_name_misel}"),
+    TableSpec("acc_master", fetch="fetch_acc_master", validate="validate_acc_master_data",
+              upload="upload_acc_master", endpoint=WebAPIClient.ENDPOINT_ACC_MASTER,
+              critical=True, summarize="summarize_acc_master", natural_key=("code",), ranges=("code", (1, 2, 3)),
+              probe="SELECT COUNT(*), MAX(code), SUM(debit), SUM(credit) FROM acc_master "
+                    "WHERE super_code IN ('DEBTO', 'SUNCR', 'CASH', 'BANK')"),
+    TableSpec("acc_ledgers", fetch="fetch_acc_ledgers", validate="validate_acc_ledgers_data",
+              upload="upload_acc_ledgers", endpoint=WebAPIClient.ENDPOINT_ACC_LEDGERS,
+              batch_size="large_table_batch_size", depends_on=("acc_master",),
+              summarize="summarize_acc_ledgers", ranges=("entry_date", (4, 7, 10)),
+              probe='SELECT COUNT(*), MAX(voucher_no), MAX("date") FROM acc_ledgers'),
+    TableSpec("acc_ledger_balances", fetch="fetch_acc_ledger_balances",
+              validate="validate_acc_ledger_balances_data", upload="upload_acc_ledger_balances",
+              endpoint=WebAPIClient.ENDPOINT_ACC_LEDGER_BALANCES, batch_size="batch_size",
+              depends_on=("acc_master",), enabled_if="ledger_aggregation_enabled", natural_key=("code", "period"),
+              probe='SELECT COUNT(*), MAX(voucher_no), MAX("date"), SUM(debit), SUM(credit) FROM acc_ledgers'),
+    TableSpec("acc_invmast", fetch="fetch_acc_invmast", validate="validate_acc_invmast_data",
+              upload="upload_acc_invmast", endpoint=WebAPIClient.ENDPOINT_ACC_INVMAST,
+              depends_on=("acc_master",), natural_key=("customerid", "bill_ref", "invdate"), ranges=("invdate", (4, 7, 10)),
+              probe="SELECT COUNT(*), MAX(invdate), SUM(paid) FROM acc_invmast"),
+    TableSpec("cashandbankaccmaster", fetch="fetch_cashandbankaccmaster",
+              validate="validate_cashandbankaccmaster_data", upload="upload_cashandbankaccmaster",
+              endpoint=WebAPIClient.ENDPOINT_CASH_BANK, natural_key=("code",),
+              probe="SELECT COUNT(*), SUM(debit), SUM(credit) FROM acc_master WHERE super_code IN ('CASH', 'BANK')"),
+    TableSpec("acc_tt_servicemaster", fetch="fetch_accttservicemaster",
+              validate="validate_accttservicemaster_data", upload="upload_accttservicemaster",
+              endpoint=WebAPIClient.ENDPOINT_ACC_TT_SERVICE, natural_key=("type", "code"),
+              probe="SELECT COUNT(*), MAX(slno) FROM dba.acc_tt_servicemaster"),
+]
+
+
+class TableScheduler:
+    """
+    Runs table syncs as a DAG: every table whose dependencies have succeeded
+    is started immediately, up to max_workers at a time. Dependencies that are
+    not part of the selected subset are treated as already satisfied.
+    """
+    def __init__(self, specs: List[TableSpec], run_node, max_workers: int = 4):
+        self.specs = {spec.name: spec for spec in specs}
+        self.run_node = run_node
+        self.max_workers = max(1, max_workers)
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self.specs[name].depends_on:
+                if dep in self.specs:
+                    visit(dep, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.specs:
+            visit(name, [])
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+        self._check_acyclic()
+        results = {}
+        pending = list(self.specs)
+        running = {}
+        aborted = False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sync") as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = [d for d in self.specs[name].depends_on if d in self.specs]
+                    if aborted or any(results.get(d, {}).get("status") in ("failed", "skipped") for d in deps):
+                        reason = "run aborted" if aborted else "dependency failed"
+                        logging.warning(f"⏭️ Skipping {name}: {reason}")
+                        results[name] = {"status": "skipped", "error": reason}
+                        pending.remove(name)
+                    elif all(results.get(d, {}).get("status") in ("success", "empty") for d in deps):
+                        running[pool.submit(self.run_node, self.specs[name])] = name
+                        pending.remove(name)
+
+                if not running:
+                    continue
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logging.error(f"❌ Unexpected error syncing {name}: {e}")
+                        logging.error(f"{traceback.format_exc()}")
+                        results[name] = {"status": "failed", "error": str(e)}
+                    if results[name]["status"] == "failed" and self.specs[name].critical:
+                        print(f"❌ CRITICAL: {name} sync failed! Stopping sync.")
+                        aborted = True
+
+        return results
 
 
 class SyncTool:
-    def __init__(self):
+    def __init__(self, config_file: str = "config.json", dry_run: bool = False,
+                 settings_overrides: Optional[Dict[str, Any]] = None):
+        self.config_file = config_file
+        self.dry_run = dry_run
+        # Command-line switches that override entries of the "settings" section
+        self.settings_overrides = settings_overrides or {}
         self.config = None
         self.db_connector = None
         self.api_client = None
+        self.run_report = {}
+        self._db_lock = None
+        self._pool_lock = None
+        self.change_capture = None
+        self._pending_acks = []
+        # Bundled small tables: validated rows and post-upload actions, sent after the scheduler run
+        self._bundle: Dict[str, Dict[str, Any]] = {}
+        self._bundle_tables = set()
+        self.sinks: List[ExportSink] = []
+        self._compiled_validators = {}
+        self.profiler = StageProfiler()
+        self.reference_cache: Optional[ReferenceCache] = None
+        self.partitions: Optional[PeriodPartitions] = None
+        self._validation_pool = None
         self._setup_logging()
 
     def _setup_logging(self):
         level = logging.INFO
-        if self.config and self.config.log_level:
-            level = getattr(logging, self.config.log_level.upper(), logging.INFO)
-        logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - %(message)s', handlers=[logging.StreamHandler(sys.stdout)])
+        log_file = None
+        if self.config:
+            if self.config.log_level:
+                level = getattr(logging, self.config.log_level.upper(), logging.INFO)
+            if self.config.log_file:
+                log_file = os.path.join(self.config.log_dir, self.config.log_file)
+            ROW_WARNINGS.samples = self.config.log_row_warning_samples
+            configure_logging(level, log_file, self.config.log_max_bytes, self.config.log_backup_count)
+            return
+        configure_logging(level)
         logging.info("=== SQL Anywhere Sync Tool Started ===")
 
     def initialize(self) -> bool:
         try:
-            self.config = DatabaseConfig()
+            self.config = DatabaseConfig(self.config_file)
+            self.config.config.setdefault("settings", {}).update(self.settings_overrides)
+            problems = self.config.identifier_problems()
+            if problems:
+                raise ValueError("; ".join(problems))
+            # Now that the config is known: level and rotating log file
+            self._setup_logging()
             self.db_connector = DatabaseConnector(self.config)
             self.api_client = WebAPIClient(self.config)
+            self.sinks = []
+            if self.config.reference_cache:
+                self.reference_cache = ReferenceCache(self.config.reference_cache_path)
+            if self.config.period_partitions:
+                self.partitions = PeriodPartitions(self.config.partitions_path)
+            if self.config.export_format:
+                self.sinks.append(ArrowFileSink(self.config.export_dir, self.config.export_format,
+                                                self.config.export_row_group_size, self.config.export_compression))
+            if self.config.profile or self.config.trace_memory:
+                stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.profiler = StageProfiler(os.path.join(self.config.log_dir, f"profile_{stamp}"),
+                                              self.config.profile, self.config.trace_memory, self.config.profile_top_n)
             return True
         except Exception as e:
             logging.error(f"Initialization failed: {e}")
             return False
 
+    def check_config(self) -> bool:
+        """Load and validate the configuration without touching the database or API"""
+        self.config = DatabaseConfig(self.config_file)
+        self.config.config.setdefault("settings", {}).update(self.settings_overrides)
+        problems = self.config.validate()
+        if problems:
+            for problem in problems:
+                print(f"❌ {problem}")
+            return False
+        print(f"✅ Configuration '{self.config_file}' is valid")
+        return True
+
+    def _upload(self, upload_fn, rows: List[Dict[str, Any]], label: str) -> bool:
+        if self.dry_run:
+            print(f"🧪 Dry run: skipping upload of {len(rows)} {label} records")
+            return True
+        return upload_fn(rows)
+
     def validate_accttservicemaster_data(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         valid = []
         for r in rows:
@@ -736,7 +3639,7 @@ class SyncTool:
                     else:
                         entry_date = str(l['entry_date'])
                 except Exception as date_e:
-                    logging.warning(f"Could not parse date {l['entry_date']}: {date_e}")
+                    ROW_WARNINGS.warn("date", "Could not parse date %s: %s", l['entry_date'], date_e)
                     entry_date = None
             
             voucher_no = None
@@ -747,7 +3650,7 @@ class SyncTool:
                     elif isinstance(l['voucher_no'], str) and l['voucher_no'].strip():
                         voucher_no = int(float(l['voucher_no'].strip()))
                 except (ValueError, TypeError) as voucher_e:
-                    logging.warning(f"Could not parse voucher_no {l['voucher_no']}: {voucher_e}")
+                    ROW_WARNINGS.warn("voucher_no", "Could not parse voucher_no %s: %s", l['voucher_no'], voucher_e)
                     voucher_no = None
             
             debit = None
@@ -789,6 +3692,36 @@ class SyncTool:
         
         return valid
 
+    def validate_acc_ledger_balances_data(self, balances: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Validate aggregated ledger rows and add the running balance
+        (cumulative debit - credit) per code in period order
+        """
+        valid = []
+        balance_by_code = {}
+        for b in sorted(balances, key=lambda r: (str(r.get('code') or '').strip(), str(r.get('period') or ''))):
+            code = str(b.get('code') or '').strip()
+            if not code or not b.get('period'):
+                continue
+            try:
+                debit = float(b['debit']) if b.get('debit') is not None else 0.0
+                credit = float(b['credit']) if b.get('credit') is not None else 0.0
+            except (ValueError, TypeError):
+                continue
+            balance = balance_by_code.get(code, 0.0) + debit - credit
+            balance_by_code[code] = balance
+            valid.append({
+                'code': code,
+                'period': str(b['period']),
+                'period_type': self.config.ledger_aggregate_period,
+                'super_code': str(b['super_code']).strip() if b.get('super_code') else None,
+                'debit': round(debit, 2),
+                'credit': round(credit, 2),
+                'balance': round(balance, 2),
+                'entries': int(b.get('entries') or 0)
+            })
+        return valid
+
     def validate_acc_invmast_data(self, acc_invmast: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         valid = []
         for i, inv in enumerate(acc_invmast):
@@ -843,143 +3776,889 @@ class SyncTool:
             })
         return valid
 
-    def run(self) -> bool:
-        print("🔄 Starting SQL Anywhere to Web API sync...")
-        if not self.initialize():
-            return False
-        if not self.db_connector.connect():
-            return False
+    def summarize_acc_master(self, valid_acc_master: List[Dict[str, Any]]):
+        super_code_counts = {}
+        for r in valid_acc_master:
+            sc = r.get('super_code', 'None')
+            super_code_counts[sc] = super_code_counts.get(sc, 0) + 1
 
-        # Sync Users
-        users = self.db_connector.fetch_users()
-        if users:
-            print(f"📊 Found {len(users)} users")
-            valid_users = self.validate_user_data(users)
-            if valid_users:
-                self.api_client.upload_users(valid_users)
-            else:
-                print("❌ No valid user data")
-
-        # Sync Misel
-        misel = self.db_connector.fetch_misel()
-        if misel:
-            print(f"📊 Found {len(misel)} misel entries")
-            valid_misel = self.validate_misel_data(misel)
-            if valid_misel:
-                self.api_client.upload_misel(valid_misel)
-            else:
-                print("❌ No valid misel data")
-
-        # Sync AccMaster (with super_code field)
-        acc_master = self.db_connector.fetch_acc_master()
-        if acc_master:
-            print(f"📊 Found {len(acc_master)} acc_master entries")
-            valid_acc_master = self.validate_acc_master_data(acc_master)
-            if valid_acc_master:
-                # Log statistics
-                super_code_counts = {}
-                for r in valid_acc_master:
-                    sc = r.get('super_code', 'None')
-                    super_code_counts[sc] = super_code_counts.get(sc, 0) + 1
-                
-                print(f"📈 Records by super_code: {super_code_counts}")
-                
-                area_records = [r for r in valid_acc_master if r.get('area')]
-                print(f"📊 Records with area data: {len(area_records)}/{len(valid_acc_master)}")
-                
-                if area_records:
-                    sample_areas = [r['area'] for r in area_records[:5]]
-                    print(f"🔍 Sample area values: {sample_areas}")
-                
-                # CRITICAL: Stop if acc_master upload fails
-                if not self.api_client.upload_acc_master(valid_acc_master):
-                    print("❌ CRITICAL: acc_master upload failed! Stopping sync.")
-                    self.db_connector.close()
-                    return False
-            else:
-                print("❌ No valid acc_master data")
+        print(f"📈 Records by super_code: {super_code_counts}")
 
-        # Sync AccLedgers (with super_code field)
-        acc_ledgers = self.db_connector.fetch_acc_ledgers()
-        if acc_ledgers is not None:
-            if acc_ledgers:
-                print(f"📊 Found {len(acc_ledgers)} acc_ledgers entries")
-                
-                # Log statistics by super_code
-                super_code_counts = {}
-                for r in acc_ledgers:
-                    sc = r.get('super_code', 'None')
-                    super_code_counts[sc] = super_code_counts.get(sc, 0) + 1
-                print(f"📈 Ledgers by super_code: {super_code_counts}")
-                
-                valid_acc_ledgers = self.validate_acc_ledgers_data(acc_ledgers)
-                if valid_acc_ledgers:
-                    self.api_client.upload_acc_ledgers(valid_acc_ledgers)
-                else:
-                    print("❌ No valid acc_ledgers data")
-            else:
-                print("📊 Found 0 acc_ledgers entries")
+        area_records = [r for r in valid_acc_master if r.get('area')]
+        print(f"📊 Records with area data: {len(area_records)}/{len(valid_acc_master)}")
+
+        if area_records:
+            sample_areas = [r['area'] for r in area_records[:5]]
+            print(f"🔍 Sample area values: {sample_areas}")
+
+    def summarize_acc_ledgers(self, valid_acc_ledgers: List[Dict[str, Any]]):
+        super_code_counts = {}
+        for r in valid_acc_ledgers:
+            sc = r.get('super_code', 'None')
+            super_code_counts[sc] = super_code_counts.get(sc, 0) + 1
+        print(f"📈 Ledgers by super_code: {super_code_counts}")
+
+    def select_tables(self, names: Optional[List[str]] = None) -> List[TableSpec]:
+        """Return registry entries for the requested tables (all when names is empty)"""
+        if not names:
+            return [spec for spec in TABLE_REGISTRY
+                    if spec.enabled_if is None or getattr(self.config, spec.enabled_if)]
+        known = {spec.name for spec in TABLE_REGISTRY}
+        unknown = [n for n in names if n not in known]
+        if unknown:
+            raise ValueError(f"Unknown table(s): {', '.join(unknown)}. Known tables: {', '.join(sorted(known))}")
+        return [spec for spec in TABLE_REGISTRY if spec.name in names]
+
+    def _fetch(self, spec: TableSpec, **kwargs) -> Optional[List[Dict[str, Any]]]:
+        # The ODBC connection is shared, so fetches are serialized while
+        # validation and uploads of other tables carry on in parallel
+        with self._db_lock:
+            if self._pushdown(spec):
+                return self.db_connector.fetch_pushdown(spec.name, **kwargs)
+            return getattr(self.db_connector, spec.fetch)(**kwargs, **self._reference_kwargs(spec))
+
+    def _pushdown(self, spec: TableSpec) -> bool:
+        return self.config.pushdown and spec.name in DatabaseConnector.PUSHDOWN_SOURCES
+
+    def _reference_version(self, table: str) -> Optional[tuple]:
+        return self.db_connector.probe(DatabaseConnector.REFERENCE_TABLES[table][1])
+
+    def _reference_rows(self, table: str) -> Optional[List[Dict[str, Any]]]:
+        """Lookup table rows from the reference cache, re-read when its version moved (call under _db_lock)"""
+        version = self._reference_version(table)
+        if version is not None:
+            rows = self.reference_cache.rows(table, version)
+            if rows is not None:
+                return rows
+        rows = self.db_connector.fetch_reference(table)
+        if rows is not None and version is not None:
+            logging.info(f"🗂️ Reference cache: reloaded {table} ({len(rows)} rows)")
+            self.reference_cache.store(table, version, rows)
+        return rows
+
+    def _reference_kwargs(self, spec: TableSpec) -> Dict[str, Any]:
+        """Cached reference data for fetches that can use it instead of re-reading or joining"""
+        if self.reference_cache is None:
+            return {}
+        if spec.name == "acc_tt_servicemaster":
+            return {"cached_rows": self._reference_rows("acc_tt_servicemaster")}
+        if spec.name == "acc_master" and self.config.resolve_references:
+            departments = self._reference_rows("acc_departments")
+            areas = self._reference_rows("acc_tt_servicemaster")
+            if departments is None or areas is None:
+                return {}  # fall back to the joins
+            lookups = {"departments": {}, "areas": {}}
+            for name, rows, key, value in (("departments", departments, "department_id", "department"),
+                                           ("areas", areas, "code", "name")):
+                keys = [r[key] for r in rows if r.get(key) is not None]
+                if len({lookup_key(k) for k in keys}) < len(keys):
+                    # Keys repeated (or only told apart by padding/case): the
+                    # join may multiply rows, leave it to the database
+                    logging.info(f"Reference {name} keys are not unique, resolving acc_master with the joins")
+                    return {}
+                lookups[name] = {str(r[key]): r.get(value) for r in rows if r.get(key) is not None}
+            return {"lookups": lookups}
+        return {}
+
+    def sync_table(self, spec: TableSpec) -> Dict[str, Any]:
+        """Fetch, validate and upload one table, retrying the whole node on failure"""
+        import time
+
+        overrides = self.config.table_settings(spec.name)
+        attempts = 1 + int(overrides.get("retries", spec.retries))
+        self.api_client.start_table(spec.name, overrides.get("deadline_seconds", self.config.retry.get("deadline_seconds")))
+        result = {"status": "failed", "error": None}
+        for attempt in range(1, attempts + 1):
+            if attempt > 1:
+                delay = min(60, 2 ** (attempt - 1))
+                logging.info(f"🔁 Retrying {spec.name} (attempt {attempt}/{attempts}) in {delay}s...")
+                time.sleep(delay)
+            started = time.perf_counter()
+            result = self._sync_table_once(spec, overrides)
+            result["seconds"] = round(time.perf_counter() - started, 3)
+            result["attempts"] = attempt
+            if result["status"] != "failed":
+                break
+        stats = self.api_client.retry_stats.get(spec.name)
+        if stats and stats["retries"]:
+            result.update(stats)
+        return result
+
+    def _sync_table_once(self, spec: TableSpec, overrides: Dict[str, Any]) -> Dict[str, Any]:
+        if self.change_capture and spec.name in ChangeCapture.CAPTURED:
+            return self._sync_changes_once(spec, overrides)
+        reference_version = None
+        if self.reference_cache is not None and spec.name in DatabaseConnector.REFERENCE_TABLES:
+            with self._db_lock:
+                reference_version = self._reference_version(spec.name)
+            if (reference_version is not None and not self.sinks and not self.config.export_only
+                    and reference_version == self.reference_cache.uploaded_version(spec.name)):
+                print(f"⏭️ {spec.name} unchanged since the last upload, skipping")
+                return {"status": "success", "fetched": 0, "valid": 0, "unchanged": True}
+
+        profiler = self.profiler
+        intern_columns = self.config.intern_columns.get(spec.name)
+        interner = ColumnInterner() if intern_columns else None
+        plan = None
+        if self._partitioned(spec):
+            with self._db_lock:
+                plan = self._partition_plan(spec, overrides)
+        with profiler.stage(spec.name, "fetch"):
+            rows = self._fetch(spec, **(plan["fetch"] if plan else {}))
+            if rows and interner is not None:
+                interner.intern(rows, intern_columns)
+        if rows is None:
+            print(f"❌ Failed to fetch {spec.name} data")
+            return {"status": "failed", "error": "fetch failed"}
+        if not rows:
+            print(f"📊 Found 0 {spec.name} entries")
+            return {"status": "empty", "fetched": 0, "valid": 0}
+
+        print(f"📊 Found {len(rows)} {spec.name} entries")
+        with profiler.stage(spec.name, "validate"):
+            valid = self.validate_rows(spec, rows)
+            if valid and interner is not None:
+                # Values the validator rebuilt (formatted dates...) are shared again
+                interner.intern(valid, intern_columns)
+            policy = self._duplicate_policy(spec, overrides)
+            if valid and policy is not None:
+                valid = self.deduplicate(spec, valid, policy)
+        if valid is None:
+            return {"status": "failed", "error": "duplicate keys rejected", "fetched": len(rows)}
+        if not valid:
+            print(f"❌ No valid {spec.name} data")
+            return {"status": "empty", "fetched": len(rows), "valid": 0}
+        if spec.summarize:
+            getattr(self, spec.summarize)(valid)
+
+        with profiler.stage(spec.name, "export"):
+            exported = self._export(spec, valid)
+        if self.config.export_only:
+            if exported is None:
+                return {"status": "failed", "error": "export failed", "fetched": len(rows), "valid": len(valid)}
+            return {"status": "success", "fetched": len(rows), "valid": len(valid), "exported": exported}
+
+        upload_fn = getattr(self.api_client, spec.upload)
+        if spec.name in self._bundle_tables:
+            upload = lambda data: self._add_to_bundle(spec.name, data)
+        elif plan is not None and plan["fetch"]:
+            batch_size = overrides.get("batch_size") or getattr(self.config, spec.batch_size or "batch_size")
+            upload = lambda data: self._upload_open_periods(spec, plan, data, batch_size)
+        elif self.config.reconcile and spec.ranges:
+            field, lengths = spec.ranges
+            batch_size = overrides.get("batch_size") or self.config.batch_size
+            upload = lambda data: self.api_client.reconcile(spec.name, spec.endpoint, field, lengths, data, batch_size)
+        elif spec.name in self.config.bulk_tables:
+            upload = lambda data: self.api_client.upload_bulk(spec.name, data)
+        elif spec.batch_size is not None:
+            batch_size = overrides.get("batch_size") or getattr(self.config, spec.batch_size)
+            upload = lambda data: upload_fn(data, batch_size=batch_size)
         else:
-            print("❌ Failed to fetch acc_ledgers data")
-
-        # Sync AccInvmast
-        acc_invmast = self.db_connector.fetch_acc_invmast()
-        if acc_invmast is not None:
-            if acc_invmast:
-                print(f"📊 Found {len(acc_invmast)} acc_invmast entries")
-                valid_acc_invmast = self.validate_acc_invmast_data(acc_invmast)
-                if valid_acc_invmast:
-                    self.api_client.upload_acc_invmast(valid_acc_invmast)
-                else:
-                    print("❌ No valid acc_invmast data")
+            upload = upload_fn
+        with profiler.stage(spec.name, "upload"):
+            uploaded = self._upload(upload, valid, spec.name)
+        if not uploaded:
+            return {"status": "failed", "error": "upload failed", "fetched": len(rows), "valid": len(valid)}
+        if reference_version is not None and not self.dry_run:
+            self._after_upload(spec.name, lambda: self.reference_cache.mark_uploaded(spec.name, reference_version))
+        if plan is not None and plan["signatures"] is not None and not self.dry_run:
+            self.partitions.seal(spec.name, plan["boundary"], plan["signatures"])
+        return {"status": "success", "fetched": len(rows), "valid": len(valid),
+                "payload_bytes": self._payload_bytes(valid)}
+
+    @staticmethod
+    def _payload_bytes(rows: List[Dict[str, Any]], samples: int = 100) -> int:
+        """JSON size of rows, extrapolated from an evenly spaced sample"""
+        sample = rows[::max(1, len(rows) // samples)][:samples]
+        return int(len(json.dumps(sample, default=str)) * len(rows) / len(sample))
+
+    def _add_to_bundle(self, table: str, rows: List[Dict[str, Any]]) -> bool:
+        self._bundle[table] = {"rows": rows, "on_success": []}
+        return True
+
+    def _after_upload(self, table: str, action):
+        """Run action now, or once the table's bundle upload succeeded"""
+        if table in self._bundle:
+            self._bundle[table]["on_success"].append(action)
+        else:
+            action()
+
+    def _send_bundle(self, specs: List[TableSpec], results: Dict[str, Dict[str, Any]]):
+        """Upload the collected small tables in one request, falling back to one upload per table"""
+        import time
+
+        bundle, self._bundle = self._bundle, {}
+        started = time.perf_counter()
+        outcome = self.api_client.upload_bundle({table: entry["rows"] for table, entry in bundle.items()})
+        if outcome is None:
+            logging.info("↩️ Uploading the bundled tables one by one")
+            by_name = {spec.name: spec for spec in specs}
+            outcome = {table: self._upload(getattr(self.api_client, by_name[table].upload), entry["rows"], table)
+                       for table, entry in bundle.items()}
+        seconds = round(time.perf_counter() - started, 3)
+        for table, entry in bundle.items():
+            result = results[table]
+            result["seconds"] = round(result.get("seconds", 0) + seconds, 3)
+            if outcome[table]:
+                for action in entry["on_success"]:
+                    action()
             else:
-                print("📊 Found 0 acc_invmast entries")
+                result.update(status="failed", error="upload failed")
+
+    def _partitioned(self, spec: TableSpec) -> bool:
+        # Bulk and reconcile uploads need the whole table; aggregated ledgers keep their own detail window
+        return (self.partitions is not None and spec.name in DatabaseConnector.PARTITION_FIELDS
+                and spec.name not in self.config.bulk_tables and not self.config.reconcile
+                and not (spec.name == "acc_ledgers" and self.config.ledger_aggregation_enabled))
+
+    def _partition_plan(self, spec: TableSpec, overrides: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        What to extract for a partitioned table (call under _db_lock):
+        fetch - fetch kwargs, empty for a full extraction (first run)
+        signatures - closed-month signatures to seal after the upload, None when not revalidated
+        replace - closed months to replace on the server (changed or deleted since sealed)
+        """
+        boundary = PeriodPartitions.closed_before(date.today(), self.config.financial_year_start_month,
+                                                  self.config.open_financial_years)
+        entry = self.partitions.table(spec.name)
+        hours = overrides.get("partition_revalidate_hours", self.config.partition_revalidate_hours)
+        signatures = None
+        if (entry is None or entry["boundary"] != boundary.isoformat() or self.config.revalidate_partitions
+                or self.partitions.due(spec.name, hours)):
+            signatures = self.db_connector.fetch_period_signatures(spec.name, boundary)
+        if entry is None:
+            print(f"🧊 {spec.name}: first partitioned run, extracting all periods")
+            return {"boundary": boundary, "fetch": {}, "signatures": signatures, "replace": []}
+
+        sealed = entry["sealed"]
+        if signatures is None:
+            stale, removed = [], []
         else:
-            print("❌ Failed to fetch acc_invmast data")
-
-        # Sync CashAndBankAccMaster
-        cashandbankaccmaster = self.db_connector.fetch_cashandbankaccmaster()
-        if cashandbankaccmaster:
-            print(f"📊 Found {len(cashandbankaccmaster)} cashandbankaccmaster entries")
-            valid_cashandbankaccmaster = self.validate_cashandbankaccmaster_data(cashandbankaccmaster)
-            if valid_cashandbankaccmaster:
-                self.api_client.upload_cashandbankaccmaster(valid_cashandbankaccmaster)
+            stale = sorted(period for period, signature in signatures.items() if sealed.get(period) != signature)
+            removed = sorted(set(sealed) - set(signatures))
+        print(f"🧊 {spec.name}: {len(sealed) - len(stale) - len(removed)} sealed periods before {boundary} skipped"
+              + (f", {len(stale) + len(removed)} changed" if stale or removed else "")
+              + (" (revalidated)" if signatures is not None else ""))
+        return {"boundary": boundary, "fetch": {"since": boundary, "periods": stale},
+                "signatures": signatures, "replace": stale + removed}
+
+    def _upload_open_periods(self, spec: TableSpec, plan: Dict[str, Any], rows: List[Dict[str, Any]],
+                             batch_size: int) -> bool:
+        """Replace the open months, undated rows and changed closed months on the server, month by month"""
+        field = DatabaseConnector.PARTITION_FIELDS[spec.name]
+        hashes = RangeHashes(rows, field)
+        months = set(plan["replace"]) | {key[:7] for key in hashes.keys} | {""}
+        month = plan["boundary"]
+        while month <= date.today():
+            months.add(month.strftime("%Y-%m"))
+            month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        months = sorted(months)
+        return self.api_client.upload_ranges(spec.name, spec.endpoint, field, 7, months,
+                                             hashes.rows_in(months, 7), batch_size)
+
+    def _export(self, spec: TableSpec, rows: List[Dict[str, Any]]) -> Optional[List[str]]:
+        """Feed validated rows to every export sink; None if any sink failed"""
+        outputs = []
+        for sink in self.sinks:
+            try:
+                outputs.append(sink.write_table(spec.name, rows))
+            except Exception as e:
+                logging.error(f"❌ Export of {spec.name} to {type(sink).__name__} failed: {e}")
+                return None
+        return outputs
+
+    def validate_rows(self, spec: TableSpec, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Validate on the process pool for large tables when validation_workers
+        > 1; the workers run the generated validators whatever
+        compiled_validators says, as only those can be built in a worker
+        """
+        if (self.config.validation_workers > 1 and len(rows) >= self.config.validation_min_rows
+                and not self._pushdown(spec) and spec.name in VALIDATOR_SCHEMAS):
+            with self._pool_lock:
+                if self._validation_pool is None:
+                    logging.info(f"⚙️ Starting {self.config.validation_workers} validation worker processes")
+                    self._validation_pool = create_validation_pool(self.config.validation_workers,
+                                                                   {"client_id": self.config.client_id})
+            return validate_in_pool(self._validation_pool, spec.name, rows, self.config.validation_chunk_rows)
+        return self.validator_for(spec)(rows)
+
+    def _shutdown_validation_pool(self):
+        if self._validation_pool is not None:
+            self._validation_pool.shutdown()
+            self._validation_pool = None
+
+    def _compiled(self, spec: TableSpec) -> bool:
+        """
+        settings.compiled_validators: true for every table or a list of
+        tables. Off by default: at 300k rows the generated validators
+        measured between 0.7x and 1.3x of the hand-written methods, with
+        no table consistently faster.
+        """
+        setting = self.config.compiled_validators
+        enabled = setting is True or (isinstance(setting, list) and spec.name in setting)
+        return enabled and spec.name in VALIDATOR_SCHEMAS
+
+    def validator_for(self, spec: TableSpec):
+        """Generated validator for the table when enabled and available, else the hand-written method"""
+        if self._pushdown(spec):
+            # Rows were normalized by the pushdown query
+            return compile_pushdown_validator(spec.name, VALIDATOR_SCHEMAS[spec.name],
+                                              {"client_id": self.config.client_id})
+        if self._compiled(spec):
+            validator = self._compiled_validators.get(spec.name)
+            if validator is None:
+                validator = compile_validator(spec.name, VALIDATOR_SCHEMAS[spec.name],
+                                              {"client_id": self.config.client_id})
+                self._compiled_validators[spec.name] = validator
+            return validator
+        return getattr(self, spec.validate)
+
+    def _sync_changes_once(self, spec: TableSpec, overrides: Dict[str, Any]) -> Dict[str, Any]:
+        """CDC node: re-sync only the accounts with pending captured changes"""
+        with self._db_lock:
+            high_water, keys = self.change_capture.drain(spec.name)
+        if not keys:
+            print(f"📊 No captured changes for {spec.name}")
+            return {"status": "empty", "fetched": 0, "valid": 0}
+
+        print(f"📊 {len(keys)} changed keys captured for {spec.name}")
+        profiler = self.profiler
+        with profiler.stage(spec.name, "fetch"):
+            rows = self._fetch(spec, codes=keys)
+        if rows is None:
+            return {"status": "failed", "error": "fetch failed"}
+        with profiler.stage(spec.name, "validate"):
+            valid = self.validate_rows(spec, rows) if rows else []
+            policy = self._duplicate_policy(spec, overrides)
+            if valid and policy is not None:
+                valid = self.deduplicate(spec, valid, policy)
+        if valid is None:
+            return {"status": "failed", "error": "duplicate keys rejected", "fetched": len(rows)}
+
+        upload = lambda data: self.api_client.upload_changes(
+            spec.name, spec.endpoint, ChangeCapture.UPLOAD_KEY[spec.name], keys, data)
+        with profiler.stage(spec.name, "upload"):
+            uploaded = self._upload(upload, valid, f"{spec.name} (changes)")
+        if not uploaded:
+            return {"status": "failed", "error": "upload failed", "fetched": len(rows), "valid": len(valid)}
+        if not self.dry_run:
+            # Acknowledged after the run so a snapshot transaction stays read-only
+            self._pending_acks.append((spec.name, high_water))
+        return {"status": "success", "fetched": len(rows), "valid": len(valid), "changed_keys": len(keys)}
+
+    def _acknowledge_changes(self):
+        for table, high_water in self._pending_acks:
+            try:
+                self.change_capture.acknowledge(table, high_water)
+                logging.info(f"✅ Acknowledged {table} changes up to change_id {high_water}")
+            except Exception as e:
+                logging.error(f"❌ Failed to acknowledge {table} changes: {e}")
+        self._pending_acks = []
+
+    def setup_change_capture(self, uninstall: bool = False) -> bool:
+        """Install (or remove) the CDC change table and triggers in the database"""
+        if not self.initialize() or not self.db_connector.connect():
+            return False
+        capture = ChangeCapture(self.db_connector.connection)
+        try:
+            if uninstall:
+                capture.uninstall()
+                print("✅ Change capture triggers and change table removed")
             else:
-                print("❌ No valid cashandbankaccmaster data")
-
-        # Sync acc_tt_servicemaster
-        acctt = self.db_connector.fetch_accttservicemaster()
-        if acctt:
-            print(f"📊 Found {len(acctt)} acc_tt_servicemaster rows")
-            valid = self.validate_accttservicemaster_data(acctt)
-            if valid:
-                self.api_client.upload_accttservicemaster(valid)
+                capture.install()
+                print(f"✅ Change capture installed on {', '.join(ChangeCapture.CAPTURED)}")
+                print("ℹ️  Run one full sync now; later runs with extraction_mode 'cdc' upload only changes")
+            return True
+        except Exception as e:
+            logging.error(f"❌ Change capture setup failed: {e}")
+            print(f"❌ Change capture setup failed: {e}")
+            return False
+        finally:
+            self.db_connector.close()
+
+    def _duplicate_policy(self, spec: TableSpec, overrides: Dict[str, Any]) -> Optional[str]:
+        """
+        Policy to deduplicate spec's rows with, None to upload them as fetched.
+        Replace uploads only dedup when a policy is configured; upserts always do,
+        since the server would merge the repeated keys anyway.
+        """
+        if not spec.natural_key:
+            return None
+        policy = overrides.get("duplicate_policy", self.config.duplicate_policy)
+        if policy is None and self.config.upload_mode == "upsert":
+            policy = "first-wins"
+        return policy
+
+    def deduplicate(self, spec: TableSpec, rows: List[Dict[str, Any]], policy: str) -> Optional[List[Dict[str, Any]]]:
+        """Drop rows with a repeated natural key; None when the reject policy finds conflicts"""
+        index = NaturalKeyIndex(spec.name, spec.natural_key, policy)
+        for row in rows:
+            index.add(row)
+        if index.duplicates:
+            logging.info(f"🧹 {spec.name}: dropped {index.duplicates} exact duplicate rows")
+        if index.unkeyed:
+            logging.info(f"ℹ️ {spec.name}: kept {index.unkeyed} rows with an empty {'/'.join(spec.natural_key)} as they are")
+        if index.conflicts:
+            sample = ", ".join("/".join(str(v) for v in key) for key in index.conflicts[:10])
+            logging.warning(f"⚠️ {spec.name}: {len(index.conflicts)} conflicting rows for the same "
+                            f"{'/'.join(spec.natural_key)} ({policy}): {sample}")
+        if index.rejected:
+            print(f"❌ {spec.name}: {len(index.conflicts)} duplicate key conflicts, upload rejected")
+            return None
+        return index.rows()
+
+    # Assumed when a table has no successful run in the history yet
+    DEFAULT_ROW_BYTES = 250
+
+    def estimate(self, specs: List[TableSpec]) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-table cost estimate from the rows this run's fetch would read and
+        the throughput of past runs: rows, payload bytes, upload requests and
+        seconds (None without history). Rows are counted like the fetch
+        reads them (DatabaseConnector.count_rows): CDC tables only for their
+        pending changed keys, partitioned tables only for their open and
+        changed periods, aggregated ledgers for their detail window and
+        acc_ledger_balances per code/period group. Tables without a source
+        entry fall back to the COUNT(*) of their probe, which reads the same
+        whole table as their fetch. "scope" says which of these applied.
+        """
+        import math
+
+        history = RunHistory(self.config.run_history_path).table_stats()
+        capture = None
+        if self.config.extraction_mode == "cdc":
+            capture = ChangeCapture(self.db_connector.connection, statements=self.db_connector.statements)
+        estimates = {}
+        for spec in specs:
+            fetch, scope = {}, "all rows"
+            if capture is not None and spec.name in ChangeCapture.CAPTURED:
+                try:
+                    fetch["codes"] = capture.drain(spec.name)[1]
+                    scope = f"{len(fetch['codes'])} changed keys"
+                except Exception as e:
+                    logging.warning(f"Could not read the pending {spec.name} changes: {e}")
+                    estimates[spec.name] = {"rows": None}
+                    continue
+            elif self._partitioned(spec):
+                fetch = self._partition_plan(spec, self.config.table_settings(spec.name))["fetch"]
+                scope = "open periods" if fetch else "all periods"
+            elif spec.name == "acc_ledgers" and self.config.ledger_aggregation_enabled:
+                scope = f"last {self.config.ledger_detail_days} days and undated"
+            elif spec.name == "acc_ledger_balances":
+                scope = "code/period groups"
+            rows = self.db_connector.count_rows(spec.name, **fetch)
+            if rows is None and spec.name not in self.db_connector.PUSHDOWN_SOURCES and spec.name != "acc_ledger_balances":
+                probe = self._probe_tables([spec])[spec.name]
+                try:
+                    rows = int(float(probe[0])) if probe else None
+                except (TypeError, ValueError):
+                    rows = None
+            stats = history.get(spec.name)
+            if rows is None:
+                estimates[spec.name] = {"rows": None}
+                continue
+            valid = int(rows * (stats["valid_ratio"] if stats else 1))
+            row_bytes = (stats and stats["bytes_per_row"]) or self.DEFAULT_ROW_BYTES
+            overrides = self.config.table_settings(spec.name)
+            batch_size = overrides.get("batch_size") or (getattr(self.config, spec.batch_size) if spec.batch_size else None)
+            if "codes" in fetch:
+                # upload_changes: one request per 500 changed keys
+                requests = math.ceil(len(fetch["codes"]) / 500)
             else:
-                print("❌ No valid acc_tt_servicemaster data")
+                requests = self.api_client.planned_requests(spec.name, valid, batch_size)
+            estimates[spec.name] = {
+                "rows": rows, "valid_rows": valid, "row_bytes": row_bytes, "scope": scope,
+                "payload_bytes": int(valid * row_bytes), "batch_size": batch_size, "requests": requests,
+                "seconds": rows / stats["rows_per_second"] if stats else None,
+                "history_runs": stats["runs"] if stats else 0,
+            }
+        return estimates
+
+    def recommend(self, specs: List[TableSpec], estimates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Batch sizes that keep each request near target_request_bytes (tables
+        with a configurable batch size only) and the worker count beyond
+        which the longest table dominates anyway: ceil(total / longest)
+        """
+        import math
+
+        batch_sizes = {}
+        for spec in specs:
+            estimate = estimates[spec.name]
+            if spec.batch_size and estimate.get("rows") is not None:
+                size = self.config.target_request_bytes // max(1, int(estimate["row_bytes"]))
+                batch_sizes[spec.name] = max(100, min(5000, size // 100 * 100))
+        seconds = [e["seconds"] for e in estimates.values() if e.get("seconds")]
+        workers = math.ceil(sum(seconds) / max(seconds)) if seconds else self.config.max_workers
+        return {"batch_sizes": batch_sizes, "max_workers": max(1, min(len(specs), workers))}
+
+    def _apply_recommendation(self, recommendation: Dict[str, Any]):
+        """auto_tune: adopt the recommended sizes where the config does not set a per-table batch_size"""
+        settings = self.config.config["settings"]
+        for table, size in recommendation["batch_sizes"].items():
+            table_settings = settings.setdefault("tables", {}).setdefault(table, {})
+            if "batch_size" not in table_settings:
+                table_settings["batch_size"] = size
+                logging.info(f"🎛️ Auto-tune: {table} batch_size {size}")
+        settings["max_workers"] = recommendation["max_workers"]
+        logging.info(f"🎛️ Auto-tune: max_workers {recommendation['max_workers']}")
+
+    def plan(self, tables: Optional[List[str]] = None) -> bool:
+        """--plan: estimate the sync without fetching or uploading any rows"""
+        if not self.initialize():
+            return False
+        try:
+            specs = self.select_tables(tables)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        if not self.db_connector.connect():
+            return False
+        try:
+            estimates = self.estimate(specs)
+        finally:
+            self.db_connector.close()
+        recommendation = self.recommend(specs, estimates)
 
-        self.db_connector.close()
+        print("\n📐 Sync plan:")
+        print(f"  {'table':<22} {'rows':>10} {'payload':>10} {'requests':>9} {'est. time':>10}  basis")
+        total_seconds, unknown = 0.0, False
+        for spec in specs:
+            e = estimates[spec.name]
+            if e.get("rows") is None:
+                print(f"  {spec.name:<22} {'?':>10}  count failed")
+                unknown = True
+                continue
+            if e["seconds"] is None:
+                unknown = True
+                eta, basis = "?", "no history"
+            else:
+                total_seconds += e["seconds"]
+                eta, basis = f"{e['seconds']:.1f}s", f"{e['history_runs']} past runs"
+            print(f"  {spec.name:<22} {e['rows']:>10,} {e['payload_bytes'] / 1e6:>8.1f}MB {e['requests']:>9,} {eta:>10}  "
+                  f"{basis}, {e['scope']}")
+        print(f"  Sequential total: {total_seconds:.1f}s" + (" + tables without history" if unknown else ""))
+        for table, size in recommendation["batch_sizes"].items():
+            print(f"  Recommended batch_size for {table}: {size} (now {estimates[table]['batch_size']})")
+        print(f"  Recommended max_workers: {recommendation['max_workers']} (now {self.config.max_workers})")
         return True
 
-    def run_interactive(self):
+    def _print_report(self, report: Dict[str, Any]):
+        icons = {"success": "✅", "empty": "➖", "failed": "❌", "skipped": "⏭️"}
+        print("\n📋 Sync summary:")
+        if report.get("snapshot_ts"):
+            print(f"  📸 Data as of snapshot {report['snapshot_ts']}")
+        for name, result in report["tables"].items():
+            detail = result.get("error") or ("unchanged" if result.get("unchanged") else f"{result.get('valid', 0)} records")
+            seconds = f" in {result['seconds']}s" if "seconds" in result else ""
+            if result.get("retries"):
+                seconds += f" ({result['retries']} HTTP retries, {result['retry_wait_seconds']}s waiting)"
+            print(f"  {icons.get(result['status'], '?')} {name:<22} {result['status']:<8} {detail}{seconds}")
+        for url, stats in report.get("endpoints", {}).items():
+            latency = "down" if stats["latency_ms"] is None else f"{stats['latency_ms']}ms"
+            print(f"  🌐 {url}: {stats['requests']} requests, {stats['failures']} failed, {latency}")
+
+    def run(self, tables: Optional[List[str]] = None) -> bool:
+        print("🔄 Starting SQL Anywhere to Web API sync...")
+        if not self.initialize():
+            return False
+        try:
+            specs = self.select_tables(tables)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        if not self.db_connector.connect():
+            return False
+        if self.config.auto_tune:
+            self._apply_recommendation(self.recommend(specs, self.estimate(specs)))
+        outbox = self.api_client.outbox
+        if outbox is not None and not self.dry_run:
+            # Deliver what earlier runs left behind while this run extracts
+            outbox.start()
+        try:
+            return self.sync_tables(specs)
+        finally:
+            self.db_connector.close()
+            if outbox is not None:
+                outbox.stop()
+                self._finish_outbox(outbox)
+            self._finish_profiling()
+            self._shutdown_validation_pool()
+
+    def _finish_profiling(self):
+        output_dir = self.profiler.finish()
+        if output_dir:
+            print(f"🔬 Profiles written to '{output_dir}' (view with: python -m pstats <file>.prof)")
+
+    def _finish_outbox(self, outbox: UploadOutbox):
+        if outbox.pending_count() and not self.dry_run:
+            print(f"📤 Delivering {outbox.pending_count()} queued uploads "
+                  f"(up to {self.config.outbox_drain_seconds}s)...")
+            outbox.drain(timeout=self.config.outbox_drain_seconds)
+        remaining = outbox.pending_count()
+        if remaining:
+            print(f"📥 {remaining} uploads remain queued in '{outbox.path}' for the next run")
+        outbox.close()
+
+    def drain_outbox(self) -> bool:
+        """Deliver every queued upload and exit (--drain-outbox)"""
+        if not self.initialize():
+            return False
+        outbox = self.api_client.outbox
+        if outbox is None:
+            print("❌ Outbox is not enabled (settings.outbox_enabled)")
+            return False
+        print(f"📤 Draining {outbox.pending_count()} queued uploads...")
+        remaining = outbox.drain(timeout=self.config.outbox_drain_seconds)
+        outbox.close()
+        print(f"{'✅' if not remaining else '📥'} {remaining} uploads still queued")
+        return remaining == 0
+
+    def sync_tables(self, specs: List[TableSpec]) -> bool:
+        """One sync cycle over specs on the already open database connection"""
+        import threading
+
+        if self.config.upload_mode == "upsert":
+            self.api_client.upsert_tables = {spec.name for spec in specs if spec.natural_key}
+        if self.config.dictionary_upload:
+            self.api_client.dictionary_tables = {spec.name: self.config.intern_columns[spec.name] for spec in specs
+                                                 if spec.name in self.config.intern_columns}
+
+        self.run_report = {"started_at": datetime.now().isoformat(timespec="seconds"),
+                           "snapshot_ts": None, "tables": {}}
+        self.api_client.metadata.pop("snapshot_ts", None)
+        if self.config.snapshot_extraction:
+            snapshot_ts = self.db_connector.begin_snapshot()
+            if snapshot_ts is None:
+                return False
+            self.run_report["snapshot_ts"] = snapshot_ts.isoformat() if hasattr(snapshot_ts, "isoformat") else str(snapshot_ts)
+            self.api_client.metadata["snapshot_ts"] = self.run_report["snapshot_ts"]
+
+        if self.config.extraction_mode == "cdc":
+            self.change_capture = ChangeCapture(self.db_connector.connection,
+                                                statements=self.db_connector.statements)
+
+        self._db_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        max_workers = self.config.max_workers
+        if self.profiler.enabled and max_workers > 1:
+            # cProfile and tracemalloc are process-wide; one table at a time
+            # keeps every stage's numbers attributable to that stage
+            logging.info("🔬 Profiling enabled, syncing tables one at a time")
+            max_workers = 1
+        self._bundle_tables = {spec.name for spec in specs if spec.name in self.config.bundle_tables}
+        scheduler = TableScheduler(specs, self.sync_table, max_workers=max_workers)
+        try:
+            results = scheduler.run()
+            if self._bundle:
+                self._send_bundle(specs, results)
+        finally:
+            if self.config.snapshot_extraction:
+                self.db_connector.end_snapshot()
+            if self._pending_acks:
+                self._acknowledge_changes()
+
+        ROW_WARNINGS.flush()
+        # Report in registry order regardless of completion order
+        self.run_report["tables"] = {spec.name: results[spec.name] for spec in specs}
+        self.run_report["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        if self.api_client.endpoints is not None:
+            self.run_report["endpoints"] = self.api_client.endpoints.summary()
+        self._print_report(self.run_report)
+        logging.info(f"Run report: {json.dumps(self.run_report)}")
+        if not self.dry_run:
+            try:
+                RunHistory(self.config.run_history_path).append(self.run_report)
+            except OSError as e:
+                logging.warning(f"⚠️ Could not record run history: {e}")
+        return not any(self.run_report["tables"][spec.name]["status"] == "failed" for spec in specs if spec.critical)
+
+    def _probe_tables(self, specs: List[TableSpec]) -> Dict[str, Any]:
+        """Read each table's change indicator; a table whose probe fails maps to None"""
+        names = {"table_name_users": self.config.table_name_users, "table_name_misel": self.config.table_name_misel}
+        fingerprints = {}
+        for spec in specs:
+            fingerprints[spec.name] = self.db_connector.probe(spec.probe.format(**names)) if spec.probe else None
+        return fingerprints
+
+    def watch(self, tables: Optional[List[str]] = None) -> bool:
+        """
+        Stay resident and sync only the tables whose change indicators moved.
+        Polls every watch_interval_seconds plus random jitter; a table's
+        fingerprint is remembered only after it synced successfully, so
+        failed tables are retried on the next poll.
+        """
+        import random
+        import time
+
+        print("👀 Starting watch mode (Ctrl+C to stop)...")
+        if not self.initialize():
+            return False
+        try:
+            specs = self.select_tables(tables)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        if not self.db_connector.connect():
+            return False
+
+        last_seen: Dict[str, Any] = {}
+        interval = max(1, self.config.watch_interval_seconds)
+        outbox = self.api_client.outbox
+        if outbox is not None and not self.dry_run:
+            outbox.start()
+        try:
+            while True:
+                cycle_started = time.monotonic()
+                try:
+                    fingerprints = self._probe_tables(specs)
+                    changed = [spec for spec in specs
+                               if fingerprints[spec.name] is None or fingerprints[spec.name] != last_seen.get(spec.name)]
+                    if changed:
+                        logging.info(f"👀 Changes detected in: {', '.join(spec.name for spec in changed)}")
+                        self.sync_tables(changed)
+                        for spec in changed:
+                            if self.run_report["tables"][spec.name]["status"] in ("success", "empty"):
+                                last_seen[spec.name] = fingerprints[spec.name]
+                    else:
+                        logging.debug("👀 No changes detected")
+                except Exception as e:
+                    logging.error(f"❌ Watch cycle failed: {e}")
+                    logging.error(f"{traceback.format_exc()}")
+                    self.db_connector.close()
+                    if not self.db_connector.connect():
+                        logging.error("❌ Reconnect failed, retrying next cycle")
+
+                elapsed = time.monotonic() - cycle_started
+                time.sleep(max(0.0, interval - elapsed) + random.uniform(0, self.config.watch_jitter_seconds))
+        except KeyboardInterrupt:
+            print("\n🛑 Watch mode stopped")
+            return True
+        finally:
+            self.db_connector.close()
+            if outbox is not None:
+                outbox.stop()
+                self._finish_outbox(outbox)
+            self._finish_profiling()
+            self._shutdown_validation_pool()
+
+    def run_interactive(self, pause: bool = True, tables: Optional[List[str]] = None) -> bool:
         print("=" * 60)
         print("    SQL Anywhere to Web API Sync Tool")
         print("=" * 60)
         print()
+        success = False
         try:
-            if self.run():
+            success = self.run(tables)
+            if success:
                 print("\n✅ Sync completed successfully!")
             else:
                 print("\n❌ Sync failed!")
         except Exception as e:
             print(f"❌ Critical error: {e}")
-        print("\nPress Enter to exit...")
-        input()
+        if pause:
+            print("\nPress Enter to exit...")
+            input()
+        return success
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="SyncTool", description="SQL Anywhere to Web API Sync Tool")
+    parser.add_argument("--config", default="config.json", help="Path to the configuration file (default: config.json)")
+    parser.add_argument("--check-config", action="store_true", help="Validate the configuration file and exit")
+    parser.add_argument("--plan", action="store_true",
+                        help="Estimate rows, payload, requests and duration per table from counts and past runs, then exit")
+    parser.add_argument("--auto-tune", action="store_true",
+                        help="Pick batch sizes and max_workers from the plan before syncing")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Fetch and validate data without uploading it (connects to the database, "
+                             "skips the HTTP stack)")
+    parser.add_argument("--no-pause", action="store_true", help="Do not wait for Enter before exiting (for schedulers)")
+    parser.add_argument("--tables", help="Comma-separated subset of tables to sync, e.g. acc_ledgers,acc_invmast")
+    parser.add_argument("--cdc", action="store_true",
+                        help="Upload only changes captured by the CDC triggers (see --install-cdc)")
+    parser.add_argument("--install-cdc", action="store_true",
+                        help="Install the change-capture table and triggers in the database and exit")
+    parser.add_argument("--uninstall-cdc", action="store_true",
+                        help="Remove the change-capture table and triggers and exit")
+    parser.add_argument("--watch", action="store_true",
+                        help="Stay resident and sync tables as soon as their change indicators move")
+    parser.add_argument("--drain-outbox", action="store_true",
+                        help="Deliver uploads queued in the outbox and exit")
+    parser.add_argument("--export", choices=["parquet", "arrow"],
+                        help="Also write validated tables to Parquet or Arrow IPC files")
+    parser.add_argument("--export-dir", help="Directory for --export files (default: exports)")
+    parser.add_argument("--export-only", action="store_true",
+                        help="Write export files without uploading to the web API")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Read all tables in one snapshot-isolation transaction (consistent point in time)")
+    parser.add_argument("--pushdown", action="store_true",
+                        help="Trim, cast and filter rows in the SQL Anywhere queries instead of in Python")
+    parser.add_argument("--revalidate-partitions", action="store_true",
+                        help="Re-check the checksums of sealed closed periods now instead of on their schedule")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Compare range hashes with the server and re-upload only the ranges that differ")
+    parser.add_argument("--bundle", metavar="TABLES", nargs="?", const="users,misel,cashandbankaccmaster,acc_tt_servicemaster",
+                        help="Upload these small tables together in one compressed request "
+                             "(default: users, misel, cashandbankaccmaster, acc_tt_servicemaster)")
+    parser.add_argument("--bulk", metavar="TABLES",
+                        help="Upload these comma-separated tables as one compressed file to the bulk-import endpoint")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write a cProfile .prof file per table and stage next to the logs")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Write top allocation reports (tracemalloc) per table and stage next to the logs")
+    return parser.parse_args(argv)
 
 
 def main():
-    sync_tool = SyncTool()
-    sync_tool.run_interactive()
-    
+    args = parse_args()
+    overrides = {}
+    if args.snapshot:
+        overrides["snapshot_extraction"] = True
+    if args.cdc:
+        overrides["extraction_mode"] = "cdc"
+    if args.export:
+        overrides["export_format"] = args.export
+    if args.export_dir:
+        overrides["export_dir"] = args.export_dir
+    if args.export_only:
+        overrides["export_only"] = True
+    if args.pushdown:
+        overrides["pushdown"] = True
+    if args.reconcile:
+        overrides["reconcile"] = True
+    if args.revalidate_partitions:
+        overrides["revalidate_partitions"] = True
+    if args.auto_tune:
+        overrides["auto_tune"] = True
+    if args.bundle:
+        overrides["bundle_tables"] = [t.strip() for t in args.bundle.split(",") if t.strip()]
+    if args.bulk:
+        overrides["bulk_tables"] = [t.strip() for t in args.bulk.split(",") if t.strip()]
+    if args.profile:
+        overrides["profile"] = True
+    if args.trace_memory:
+        overrides["trace_memory"] = True
+    sync_tool = SyncTool(config_file=args.config, dry_run=args.dry_run, settings_overrides=overrides)
+    if args.check_config:
+        sys.exit(0 if sync_tool.check_config() else 1)
+    if args.drain_outbox:
+        sys.exit(0 if sync_tool.drain_outbox() else 1)
+    if args.install_cdc or args.uninstall_cdc:
+        sys.exit(0 if sync_tool.setup_change_capture(uninstall=args.uninstall_cdc) else 1)
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()] if args.tables else None
+    if args.plan:
+        sys.exit(0 if sync_tool.plan(tables) else 1)
+    if args.watch:
+        sys.exit(0 if sync_tool.watch(tables) else 1)
+    success = sync_tool.run_interactive(pause=not args.no_pause, tables=tables)
+    sys.exit(0 if success else 1)
+
 
 if __name__ == "__main__":
+    import multiprocessing
+
+    # Validation worker processes re-launch the frozen executable
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,27 @@
+import json
+import os
+import sys
+
+import pytest
+
+# sync.py, bench.py and mock_api.py are top-level scripts, not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    """WebAPIClient against the given API base URL(s), with extra settings"""
+    import sync
+
+    monkeypatch.chdir(tmp_path)
+
+    def make(*base_urls, api=None, **settings):
+        config = tmp_path / "config.json"
+        config.write_text(json.dumps({
+            "database": {"dsn": "x", "username": "u", "password": "p"},
+            "api": {"base_url": base_urls[0], "base_urls": list(base_urls[1:]), **(api or {})},
+            "settings": {"client_id": "X", **settings},
+        }))
+        return sync.WebAPIClient(sync.DatabaseConfig(str(config)))
+
+    return make
@@ -0,0 +1,58 @@
+import json
+import time
+
+import pytest
+
+import sync
+from mock_api import MockAPIHandler, MockAPIServer
+
+
+class ProxyErrorHandler(MockAPIHandler):
+    """Answers the first chunk PUT and the first offset GET with an HTML page, like a proxy would"""
+    def _proxy_page(self, status):
+        page = b"<html><body>Conflict</body></html>"
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def do_PUT(self):
+        if not self.server.pages_sent["PUT"]:
+            self.server.pages_sent["PUT"] = True
+            self._route()
+            self._body()
+            return self._proxy_page(409)
+        super().do_PUT()
+
+    def do_GET(self):
+        if not self.server.pages_sent["GET"]:
+            self.server.pages_sent["GET"] = True
+            self._route()
+            return self._proxy_page(200)
+        super().do_GET()
+
+
+@pytest.fixture
+def server():
+    server = MockAPIServer()
+    server.httpd.RequestHandlerClass = ProxyErrorHandler
+    server.httpd.pages_sent = {"PUT": False, "GET": False}
+    with server:
+        yield server
+
+
+def test_non_json_responses_take_the_failure_path(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"database": {"dsn": "x", "username": "u", "password": "p"},
+                                  "api": {"base_url": server.base_url},
+                                  "settings": {"client_id": "X", "bulk_chunk_bytes": 512}}))
+    client = sync.WebAPIClient(sync.DatabaseConfig(str(config)))
+    rows = [{"code": f"C{i}", "debit": i * 1.5, "narration": f"entry {i} " * 3} for i in range(300)]
+
+    assert client.upload_bulk("acc_ledgers", rows)
+
+    assert server.httpd.pages_sent == {"PUT": True, "GET": True}
+    assert server.state.tables["acc_ledgers"] == json.loads(json.dumps(rows))
@@ -0,0 +1,110 @@
+import gzip
+import json
+import time
+
+import pytest
+
+import sync
+from mock_api import MockAPIHandler, MockAPIServer
+
+
+class RecordingHandler(MockAPIHandler):
+    """Keeps each bundle request's raw body; answers 404 for bundles when the server has no bundle endpoint"""
+    def do_POST(self):
+        if "/upload-bundle/" in self.path:
+            if not self.server.bundles_supported:
+                self._route()
+                self._body()
+                return self._reply(404, {"error": "not found"})
+            length = int(self.headers["Content-Length"])
+            body = self.rfile.read(length)
+            self.server.bundles.append((self.headers.get("Content-Encoding"), body))
+            self.rfile = _Replay(body)
+        super().do_POST()
+
+
+class _Replay:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self, n):
+        data, self.data = self.data[:n], self.data[n:]
+        return data
+
+
+TABLES = {
+    "users": [{"id": 1, "pass": "p", "role": "admin", "client_id": "X"}],
+    "misel": [{"firm_name": "Firm", "address": "Street 1", "client_id": "X"}],
+    "cashandbankaccmaster": [{"code": "B1", "name": "Bank", "super_code": "BANK", "opening_balance": 10.5,
+                              "opening_date": "2024-04-01", "debit": 0.0, "credit": 1.0, "client_id": "X"}],
+}
+
+
+@pytest.fixture
+def server():
+    server = MockAPIServer()
+    server.httpd.RequestHandlerClass = RecordingHandler
+    server.httpd.bundles = []
+    server.httpd.bundles_supported = True
+    with server:
+        yield server
+
+
+@pytest.fixture
+def tool(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    (tmp_path / "config.json").write_text(json.dumps({
+        "database": {"dsn": "x", "username": "u", "password": "p"},
+        "api": {"base_url": server.base_url},
+        "settings": {"client_id": "X", "log_dir": str(tmp_path), "bundle_tables": list(TABLES)},
+    }))
+    tool = sync.SyncTool("config.json")
+    assert tool.initialize()
+    return tool
+
+
+def _send(tool):
+    committed = []
+    results = {table: {"status": "success", "valid": len(rows)} for table, rows in TABLES.items()}
+    for table, rows in TABLES.items():
+        tool._add_to_bundle(table, rows)
+        tool._after_upload(table, lambda table=table: committed.append(table))
+    tool._send_bundle(tool.select_tables(list(TABLES)), results)
+    return results, committed
+
+
+def test_one_rejected_table_fails_alone(tool, server):
+    server.httpd.reject_tables = {"misel"}
+
+    results, committed = _send(tool)
+
+    assert results["misel"]["status"] == "failed"
+    assert [results[t]["status"] for t in ("users", "cashandbankaccmaster")] == ["success", "success"]
+    assert sorted(committed) == ["cashandbankaccmaster", "users"]
+    assert server.state.tables == {"users": TABLES["users"],
+                                   "cashandbankaccmaster": TABLES["cashandbankaccmaster"]}
+
+
+def test_bundle_body_is_gzip_and_round_trips(tool, server):
+    _send(tool)
+
+    [(encoding, body)] = server.httpd.bundles
+    assert encoding == "gzip"
+    assert body[:2] == b"\x1f\x8b"
+    envelope = json.loads(gzip.decompress(body))
+    assert {entry["table"]: entry["rows"] for entry in envelope["tables"]} == TABLES
+    assert all(entry["mode"] == "replace" for entry in envelope["tables"])
+    assert server.state.tables == TABLES
+
+
+def test_falls_back_to_one_upload_per_table(tool, server):
+    server.httpd.bundles_supported = False
+
+    results, committed = _send(tool)
+
+    assert all(result["status"] == "success" for result in results.values())
+    assert sorted(committed) == sorted(TABLES)
+    assert server.state.tables == TABLES
+    paths = [path for method, path, _ in server.state.requests if method == "POST"]
+    assert "/api/upload-bundle/" in paths and "/api/upload-users/" in paths
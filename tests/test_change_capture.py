@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+
+from sync import ChangeCapture, StatementCache
+
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    connection.executescript("""
+        CREATE TABLE acc_master (code TEXT, name TEXT);
+        CREATE TABLE acc_ledgers (code TEXT, debit REAL);
+        CREATE TABLE acc_invmast (customerid TEXT, nettotal REAL);
+    """)
+    yield connection
+    connection.close()
+
+
+@pytest.mark.parametrize("prepared", [False, True], ids=["cursor", "statement-cache"])
+def test_install_drain_acknowledge(connection, prepared):
+    capture = ChangeCapture(connection, "sqlite", StatementCache(connection) if prepared else None)
+    capture.install()
+    connection.execute("INSERT INTO acc_master VALUES ('C1', 'One')")
+    connection.execute("INSERT INTO acc_master VALUES ('C2', 'Two')")
+    connection.commit()
+
+    high_water, keys = capture.drain("acc_master")
+    assert keys == ["C1", "C2"]
+    capture.acknowledge("acc_master", high_water)
+    assert capture.drain("acc_master") == (None, [])
+
+
+def _objects(connection):
+    return {row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE 'sync_%'")}
+
+
+def test_install_creates_change_table_and_triggers(connection):
+    capture = ChangeCapture(connection, "sqlite")
+    capture.install()
+    expected = {ChangeCapture.CHANGE_TABLE} | {capture._trigger_name(table, event)
+                                               for table in ChangeCapture.CAPTURED for event in ChangeCapture.EVENTS}
+    assert _objects(connection) == expected
+
+
+def test_triggers_capture_each_event(connection):
+    capture = ChangeCapture(connection, "sqlite")
+    capture.install()
+    connection.execute("INSERT INTO acc_ledgers VALUES (' L1 ', 5)")
+    connection.execute("INSERT INTO acc_invmast VALUES ('K1', 10)")
+    connection.execute("INSERT INTO acc_master VALUES ('OLD', 'Renamed')")
+    connection.execute("UPDATE acc_master SET code = 'NEW' WHERE code = 'OLD'")
+    connection.execute("DELETE FROM acc_invmast WHERE customerid = 'K1'")
+    connection.commit()
+
+    ops = connection.execute(f"SELECT table_name, op, row_key FROM {ChangeCapture.CHANGE_TABLE} "
+                             f"ORDER BY change_id").fetchall()
+    assert ops == [
+        ("acc_ledgers", "I", "L1"),
+        ("acc_invmast", "I", "K1"),
+        ("acc_master", "I", "OLD"),
+        ("acc_master", "U", "OLD"),
+        ("acc_master", "U", "NEW"),
+        ("acc_invmast", "D", "K1"),
+    ]
+    # The update re-syncs the account under both its old and new code
+    assert capture.drain("acc_master")[1] == ["OLD", "NEW"]
+    assert capture.drain("acc_ledgers")[1] == ["L1"]
+    assert capture.drain("acc_invmast")[1] == ["K1"]
+
+
+def test_changes_after_high_water_survive_acknowledge(connection):
+    capture = ChangeCapture(connection, "sqlite")
+    capture.install()
+    connection.execute("INSERT INTO acc_master VALUES ('C1', 'One')")
+    connection.commit()
+    high_water, keys = capture.drain("acc_master")
+    assert keys == ["C1"]
+
+    # Arrives while the drained keys are being uploaded
+    connection.execute("INSERT INTO acc_master VALUES ('C2', 'Two')")
+    connection.execute("INSERT INTO acc_ledgers VALUES ('C1', 1)")
+    connection.commit()
+    capture.acknowledge("acc_master", high_water)
+
+    assert capture.drain("acc_master")[1] == ["C2"]
+    assert capture.drain("acc_ledgers")[1] == ["C1"]
+
+
+def test_uninstall_removes_triggers_and_change_table(connection):
+    capture = ChangeCapture(connection, "sqlite")
+    capture.install()
+    capture.uninstall()
+    assert _objects(connection) == set()
+    connection.execute("INSERT INTO acc_master VALUES ('C1', 'One')")
+
+
+def test_unknown_dialect_is_rejected(connection):
+    with pytest.raises(ValueError):
+        ChangeCapture(connection, "oracle")
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import sync
+
+
+def make_tool(tmp_path, monkeypatch, **settings):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(json.dumps({
+        "database": {"dsn": "x", "username": "u", "password": "p"},
+        "api": {"base_url": "http://127.0.0.1:1/api"},
+        "settings": {"client_id": "X", "log_dir": str(tmp_path), **settings},
+    }))
+    tool = sync.SyncTool("config.json")
+    assert tool.initialize()
+    return tool
+
+
+def spec(name):
+    return next(s for s in sync.TABLE_REGISTRY if s.name == name)
+
+
+def test_null_keys_are_kept_not_merged():
+    index = sync.NaturalKeyIndex("acc_tt_servicemaster", ("type", "code"))
+    rows = [{"type": "AREA", "code": None, "name": "North"}, {"type": "AREA", "code": None, "name": "South"},
+            {"type": "AREA", "code": "N", "name": "North"}, {"type": "AREA", "code": "N ", "name": "North"}]
+    for row in rows:
+        index.add(row)
+    assert index.rows() == rows[:3]
+    assert (index.unkeyed, index.duplicates, index.conflicts) == (2, 0, [("AREA", "N")])
+
+
+def test_last_wins_keeps_first_position():
+    index = sync.NaturalKeyIndex("t", ("code",), "last-wins")
+    for row in [{"code": "A", "v": 1}, {"code": "B", "v": 2}, {"code": "A", "v": 3}]:
+        index.add(row)
+    assert index.rows() == [{"code": "A", "v": 3}, {"code": "B", "v": 2}]
+
+
+def test_replace_mode_uploads_rows_as_fetched(tmp_path, monkeypatch):
+    tool = make_tool(tmp_path, monkeypatch)
+    assert tool._duplicate_policy(spec("acc_invmast"), {}) is None
+    assert tool._duplicate_policy(spec("acc_invmast"), {"duplicate_policy": "reject"}) == "reject"
+
+
+def test_configured_policy_and_upserts_dedup(tmp_path, monkeypatch):
+    tool = make_tool(tmp_path, monkeypatch, duplicate_policy="last-wins")
+    assert tool._duplicate_policy(spec("acc_invmast"), {}) == "last-wins"
+    tool = make_tool(tmp_path, monkeypatch, upload_mode="upsert")
+    assert tool._duplicate_policy(spec("acc_invmast"), {}) == "first-wins"
+    # No natural key, nothing to dedup on
+    assert tool._duplicate_policy(spec("acc_ledgers"), {}) is None
+
+
+def test_invoices_sharing_a_bill_ref_stay_apart(tmp_path, monkeypatch):
+    tool = make_tool(tmp_path, monkeypatch, upload_mode="upsert")
+    rows = [{"customerid": "C1", "bill_ref": "S-1", "invdate": "2024-04-01", "nettotal": 10.0},
+            {"customerid": "C2", "bill_ref": "S-1", "invdate": "2024-04-01", "nettotal": 20.0},
+            {"customerid": "C1", "bill_ref": "S-1", "invdate": "2025-04-01", "nettotal": 30.0},
+            {"customerid": "C1", "bill_ref": "S-1", "invdate": "2024-04-01", "nettotal": 10.0}]
+    assert tool.deduplicate(spec("acc_invmast"), rows, "first-wins") == rows[:3]
+
+
+@pytest.mark.parametrize("policy", [None, "first-wins", "reject"])
+def test_policy_validation(tmp_path, monkeypatch, policy):
+    tool = make_tool(tmp_path, monkeypatch, **({"duplicate_policy": policy} if policy else {}))
+    assert not [p for p in tool.config.validate() if "Duplicate policy" in p]
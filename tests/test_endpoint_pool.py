@@ -0,0 +1,113 @@
+import random
+import time
+
+import pytest
+
+from mock_api import MockAPIHandler, MockAPIServer, MockAPIState
+
+
+class BadPayloadHandler(MockAPIHandler):
+    """Answers 500 for one table's uploads, as a server does for a payload it cannot store"""
+    def do_POST(self):
+        if "/upload-bad/" in self.path:
+            self._route()
+            self._body()
+            return self._reply(500, {"error": "cannot store this payload"})
+        super().do_POST()
+
+
+@pytest.fixture
+def replicas():
+    state = MockAPIState()
+    servers = [MockAPIServer(state=state) for _ in range(2)]
+    for server in servers:
+        server.httpd.RequestHandlerClass = BadPayloadHandler
+        server.start()
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def waits(monkeypatch):
+    waits = []
+    monkeypatch.setattr(time, "sleep", waits.append)
+    return waits
+
+
+def test_unreachable_replica_fails_over_after_the_backoff(make_client, replicas, waits):
+    first, second = replicas
+    client = make_client(first.base_url, second.base_url, retry={"max_attempts": 3, "base_delay": 0.5})
+    client.endpoints._random = random.Random(0)
+    client.start_table("t")
+    client.endpoints.route("t")  # both replicas pass their first health check
+    client.endpoints.routes["t"] = first.base_url
+    first.httpd.down = True
+
+    res = client._post(client._url("/upload-t/"), [{"i": 1}], 10, table="t")
+
+    assert res.status_code == 200
+    assert first.state.tables["t"] == [{"i": 1}]
+    assert client.endpoints.routes["t"] == second.base_url
+    assert len(waits) == 1 and waits[0] >= 0.5
+    assert client.endpoints.summary()[first.base_url]["failures"] == 1
+
+
+def test_payload_errors_do_not_take_the_endpoint_out(make_client, replicas, waits):
+    first, second = replicas
+    client = make_client(first.base_url, second.base_url, retry={"max_attempts": 2})
+    client.start_table("bad")
+
+    res = client._post(client._url("/upload-bad/"), [{"i": 1}], 10, table="bad")
+
+    assert res.status_code == 500
+    pool = client.endpoints
+    assert pool.down_until == {}
+    assert all(pool.latency[url] is not None for url in pool.base_urls)
+    # Both attempts went to the table's endpoint and are counted as failed requests there
+    used = pool.routes["bad"]
+    assert pool.summary()[used]["failures"] == 2
+    assert first.httpd.requests + second.httpd.requests == 2 + 2  # two health checks
+
+
+def test_all_replicas_down_backs_off_and_honours_the_deadline(make_client, replicas, waits):
+    def failing_client(**retry):
+        client = make_client(*[s.base_url for s in replicas], retry=retry)
+        client.endpoints.route()  # both healthy until the first upload
+        return client
+
+    client = failing_client(max_attempts=4, base_delay=0.5)
+    for server in replicas:
+        server.httpd.down = True
+    client.start_table("t")
+    res = client._post(client._url("/upload-t/"), [{"i": 1}], 10, table="t")
+    assert res.status_code == 503
+    # A backoff before every retry, including the one that switched endpoints
+    assert len(waits) == 3 and all(wait >= 0.5 for wait in waits)
+
+    for server in replicas:
+        server.httpd.down = False
+    client = failing_client(max_attempts=4, base_delay=0.5)
+    for server in replicas:
+        server.httpd.down = True
+    sent = sum(server.httpd.requests for server in replicas)
+    client.start_table("t", deadline_seconds=0.2)
+    client._post(client._url("/upload-t/"), [{"i": 1}], 10, table="t")
+    # The first wait would overrun the deadline: no second attempt on the other replica
+    assert sum(server.httpd.requests for server in replicas) - sent == 1
+    assert len(waits) == 3
+
+
+def test_tables_are_weighted_towards_the_faster_replica(make_client, replicas):
+    slow, fast = replicas
+    slow.httpd.delay = 0.05
+    client = make_client(slow.base_url, fast.base_url)
+    pool = client.endpoints
+    pool._random = random.Random(1)
+
+    routes = [pool.route(f"t{i}") for i in range(200)]
+
+    assert routes.count(fast.base_url) > 150
+    assert pool.latency[slow.base_url] > pool.latency[fast.base_url]
+    # Sticky: a table keeps its endpoint while it is healthy
+    assert [pool.route(f"t{i}") for i in range(200)] == routes
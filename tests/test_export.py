@@ -0,0 +1,39 @@
+import pytest
+
+from sync import ArrowFileSink, ExportSink
+
+ROWS = [
+    {"code": "C1", "name": "Main", "debit": 12.5, "voucher_no": 14, "entry_date": "2024-04-01", "paid": True},
+    {"code": "C2", "name": None, "debit": 3, "voucher_no": None, "entry_date": "2024-04-01", "paid": False},
+    {"code": "C1", "name": "Main", "debit": None, "voucher_no": 15, "entry_date": None, "paid": None},
+]
+
+
+def test_sinks_must_implement_write_table():
+    class Incomplete(ExportSink):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("file_format", sorted(ArrowFileSink.FORMATS))
+def test_arrow_file_round_trip(tmp_path, file_format):
+    pa = pytest.importorskip("pyarrow")
+    sink = ArrowFileSink(str(tmp_path), file_format, row_group_size=2)
+
+    path = sink.write_table("acc_ledgers", ROWS)
+
+    assert path.endswith(ArrowFileSink.FORMATS[file_format])
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        assert pq.ParquetFile(path).num_row_groups == 2
+    else:
+        with pa.ipc.open_file(path) as reader:
+            table = reader.read_all()
+    assert pa.types.is_dictionary(table.schema.field("code").type)
+    assert table.schema.field("debit").type == pa.float64()
+    assert table.schema.field("voucher_no").type == pa.int64()
+    assert table.to_pylist() == [dict(row, debit=None if row["debit"] is None else float(row["debit"]))
+                                 for row in ROWS]
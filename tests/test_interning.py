@@ -0,0 +1,35 @@
+import sync
+
+
+def fresh(value):
+    # A new str object per row, as the ODBC driver returns them
+    return (value + " ")[:-1]
+
+
+def test_pool_never_grows_past_the_cap():
+    interner = sync.ColumnInterner(max_distinct=10)
+    rows = [{"narration": fresh(f"note {i}"), "entry_mode": fresh("S")} for i in range(1000)]
+    interner.intern(rows, ["narration", "entry_mode"])
+
+    assert "narration" not in interner._pools
+    assert len(interner._pools["entry_mode"]) == 1
+    assert len({id(row["narration"]) for row in rows}) == 1000
+    # The first values were shared before the cap was reached, nothing else is touched
+    assert [row["narration"] for row in rows] == [f"note {i}" for i in range(1000)]
+
+    interner.intern([{"narration": fresh("note 0")}], ["narration"])
+    assert "narration" not in interner._pools
+
+
+def test_low_cardinality_columns_share_one_object():
+    interner = sync.ColumnInterner(max_distinct=10)
+    rows = [{"super_code": fresh(code)} for code in ["DEBTO", "SUNCR"] * 500]
+    interner.intern(rows, ["super_code"])
+    assert len({id(row["super_code"]) for row in rows}) == 2
+    assert len(interner._pools["super_code"]) == 2
+
+
+def test_defaults_leave_out_free_text_columns():
+    columns = sync.DEFAULT_INTERN_COLUMNS["acc_ledgers"]
+    assert "narration" not in columns
+    assert "code" not in columns
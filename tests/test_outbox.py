@@ -0,0 +1,93 @@
+import sqlite3
+
+import sync
+from mock_api import MockAPIServer
+
+
+def _post_all(client, batches):
+    for table, table_batches in batches.items():
+        for b, rows in enumerate(table_batches):
+            url = client._url(f"/upload-{table}/", **({"append": "true"} if b else {}))
+            assert isinstance(client._post(url, rows, 10, table=table), sync.OutboxReceipt)
+
+
+def test_crash_replay_keeps_order_and_applies_each_batch_once(make_client):
+    batches = {f"t{i}": [[{"t": i, "batch": b, "row": r} for r in range(3)] for b in range(4)] for i in range(6)}
+    with MockAPIServer(fail_rate=1.0, seed=3, fail_methods=("POST",)) as server:
+        client = make_client(server.base_url, outbox_enabled=True, retry={"max_attempts": 1})
+        _post_all(client, batches)
+        # Some first requests were applied before their response was lost
+        applied = set(server.state.tables)
+        assert applied
+        client.outbox.close()
+
+        # Restart on the same outbox file while the API is still flaky
+        server.state.fail_rate = 0.5
+        outbox = make_client(server.base_url, outbox_enabled=True).outbox
+        outbox.base_delay, outbox.failure_threshold = 0, 1000
+        assert outbox.drain(timeout=60) == 0
+        outbox.close()
+
+    for table, table_batches in batches.items():
+        assert server.state.tables[table] == [row for rows in table_batches for row in rows]
+    assert server.state.replays >= len(applied)
+
+
+def test_circuit_opens_after_consecutive_failures(make_client):
+    with MockAPIServer() as server:
+        client = make_client(server.base_url, outbox_enabled=True, outbox_mode="always")
+        outbox = client.outbox
+        outbox.base_delay, outbox.failure_threshold = 0, 2
+        _post_all(client, {"t": [[{"i": 0}], [{"i": 1}]]})
+        server.httpd.down = True
+
+        assert not outbox.deliver_next()
+        assert not outbox.circuit_open
+        assert not outbox.deliver_next()
+        assert outbox.circuit_open
+        sent = server.httpd.requests
+        assert not outbox.deliver_next()
+        assert server.httpd.requests == sent
+
+        server.httpd.down = False
+        outbox._circuit_open_until = 0.0  # cooldown over
+        assert outbox.drain(timeout=10) == 0
+        outbox.close()
+    assert server.state.tables["t"] == [{"i": 0}, {"i": 1}]
+
+
+def test_rejected_requests_are_parked_without_blocking_the_table(make_client, tmp_path):
+    with MockAPIServer() as server:
+        client = make_client(server.base_url, outbox_enabled=True, outbox_mode="always")
+        client._post(client._url("/no-such-endpoint/"), [{"i": 0}], 10, table="t")
+        client._post(client._url("/upload-t/"), [{"i": 1}], 10, table="t")
+        assert client.outbox.drain(timeout=10) == 0
+        client.outbox.close()
+
+    assert server.state.tables["t"] == [{"i": 1}]
+    parked = sqlite3.connect(tmp_path / "outbox.db").execute("SELECT status, attempts, last_error FROM outbox").fetchall()
+    assert [(status, attempts) for status, attempts, _ in parked] == [("dead", 1)]
+    assert parked[0][2].startswith("404")
+
+
+def test_outbox_files_without_keys_are_upgraded(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute("""CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT NOT NULL,
+                  url TEXT NOT NULL, payload TEXT NOT NULL, timeout REAL NOT NULL,
+                  status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,
+                  next_attempt_at REAL NOT NULL DEFAULT 0, last_error TEXT,
+                  created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)""")
+    db.execute("INSERT INTO outbox (table_name, url, payload, timeout) VALUES ('t', 'u', '[]', 5)")
+    db.commit()
+    db.close()
+
+    class Lost:
+        status_code, text = 503, "lost"
+
+    keys = []
+    outbox = sync.UploadOutbox(path, lambda url, payload, timeout, key: keys.append(key) or Lost(), base_delay=0)
+    outbox.deliver_next()
+    outbox.deliver_next()
+    outbox.close()
+    assert len(keys) == 2 and keys[0] and keys[0] == keys[1]
@@ -0,0 +1,37 @@
+import threading
+from datetime import date
+
+from sync import PeriodPartitions
+
+
+def test_closed_before_uses_financial_year_start():
+    assert PeriodPartitions.closed_before(date(2026, 10, 18), 4, 2) == date(2025, 4, 1)
+    assert PeriodPartitions.closed_before(date(2026, 2, 1), 4, 2) == date(2024, 4, 1)
+    assert PeriodPartitions.closed_before(date(2026, 2, 1), 1, 1) == date(2026, 1, 1)
+
+
+def test_concurrent_seals_keep_every_table(tmp_path):
+    path = tmp_path / "partitions.json"
+    partitions = PeriodPartitions(str(path))
+    tables = [f"table_{i}" for i in range(8)]
+    barrier = threading.Barrier(len(tables))
+    errors = []
+
+    def seal(table):
+        barrier.wait()
+        try:
+            for month in range(50):
+                partitions.seal(table, date(2025, 4, 1), {f"2024-{month:02d}": [month, "md5"]})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=seal, args=(table,)) for table in tables]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    reloaded = PeriodPartitions(str(path))
+    assert all(reloaded.table(table)["sealed"] == {"2024-49": [49, "md5"]} for table in tables)
+    assert [p.name for p in tmp_path.iterdir()] == ["partitions.json"]
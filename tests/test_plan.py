@@ -0,0 +1,179 @@
+import json
+import math
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import sync
+from test_pushdown import _isnumeric
+
+
+class FakeCursor:
+    def __init__(self, queries):
+        self.queries = queries
+        self.row = None
+
+    def execute(self, sql, params=()):
+        self.queries.append(" ".join(sql.split()))
+        # Unfiltered counts are far larger than what the fetch actually reads
+        self.row = (40,) if "WHERE" in sql else (100000,)
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self.queries)
+
+
+@pytest.fixture
+def tool(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(json.dumps({
+        "database": {"dsn": "x", "username": "u", "password": "p"},
+        "api": {"base_url": "http://127.0.0.1:1/api"},
+        "settings": {"client_id": "X", "log_dir": str(tmp_path)},
+    }))
+    tool = sync.SyncTool("config.json")
+    assert tool.initialize()
+    tool.db_connector.connection = FakeConnection()
+    return tool
+
+
+def test_estimate_counts_with_the_fetch_filters(tool):
+    sync.RunHistory(tool.config.run_history_path).append(
+        {"tables": {"acc_invmast": {"status": "success", "fetched": 40, "valid": 40, "seconds": 2.0,
+                                    "payload_bytes": 4000}}})
+    specs = tool.select_tables(["acc_invmast", "acc_tt_servicemaster"])
+
+    estimates = tool.estimate(specs)
+
+    queries = tool.db_connector.connection.queries
+    assert any("FROM DBA.acc_invmast" in q and "inv.paid < inv.nettotal" in q for q in queries)
+    invmast = estimates["acc_invmast"]
+    assert invmast["rows"] == 40
+    assert invmast["seconds"] == pytest.approx(2.0)
+    assert invmast["payload_bytes"] == 4000
+    # No source entry: the probe's COUNT(*) over the whole table
+    assert estimates["acc_tt_servicemaster"]["rows"] == 100000
+    assert estimates["acc_tt_servicemaster"]["seconds"] is None
+
+
+def test_single_batch_uploads_send_no_clear_request(tool):
+    api = tool.api_client
+    assert api.planned_requests("acc_ledgers", 400, 500) == 1
+    assert api.planned_requests("acc_ledgers", 1200, 500) == 4
+    assert api.planned_requests("acc_invmast", 1500) == 1 + 3
+    assert api.planned_requests("acc_master", 10) == 2
+    api.upsert_tables = {"acc_ledgers"}
+    assert api.planned_requests("acc_ledgers", 1200, 500) == 3
+
+
+def _dateformat(value, fmt):
+    return None if value is None else str(value)[:len(fmt)]
+
+
+def _ledger_db():
+    """sqlite3 standing in for SQL Anywhere, with old and recent ledger rows"""
+    sqlite3.register_adapter(date, date.isoformat)
+    connection = sqlite3.connect(":memory:")
+    connection.create_function("DATEFORMAT", 2, _dateformat, deterministic=True)
+    connection.create_function("ISNUMERIC", 1, _isnumeric, deterministic=True)
+    connection.create_function("TRUNCNUM", 2, lambda v, digits: None if v is None else math.trunc(v), deterministic=True)
+    connection.executescript("""
+        CREATE TABLE acc_master (code TEXT, name TEXT, super_code TEXT);
+        CREATE TABLE acc_ledgers (code TEXT, particulars TEXT, debit REAL, credit REAL, entry_mode TEXT,
+                                  "date" DATE, voucher_no TEXT, narration TEXT);
+        CREATE TABLE acc_invmast (customerid TEXT);
+        INSERT INTO acc_master VALUES ('C1', 'One', 'DEBTO'), ('C2', 'Two', 'SUNCR'), ('X1', 'Other', 'STOCK');
+    """)
+    recent = date.today() - timedelta(days=10)
+    _add_ledgers(connection, [("C1", date(2020, 1, 5)), ("C1", date(2020, 1, 20)), ("C1", date(2020, 2, 1)),
+                              ("C1", recent), ("C2", date(2020, 1, 3)), ("C2", recent), ("X1", recent)])
+    return connection
+
+
+def _add_ledgers(connection, entries):
+    connection.executemany("INSERT INTO acc_ledgers VALUES (?, 'p', 1, 0, 'S', ?, '1', 'n')", entries)
+    connection.commit()
+
+
+def make_tool(tmp_path, monkeypatch, **settings):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(json.dumps({
+        "database": {"dsn": "x", "username": "u", "password": "p"},
+        "api": {"base_url": "http://127.0.0.1:1/api"},
+        "settings": {"client_id": "X", "log_dir": str(tmp_path), **settings},
+    }))
+    tool = sync.SyncTool("config.json")
+    assert tool.initialize()
+    tool.db_connector.connection = _ledger_db()
+    return tool
+
+
+def test_aggregated_mode_counts_the_detail_window_and_groups(tmp_path, monkeypatch):
+    tool = make_tool(tmp_path, monkeypatch, ledger_mode="aggregated", pushdown=True)
+    db = tool.db_connector
+
+    estimates = tool.estimate(tool.select_tables(["acc_ledgers", "acc_ledger_balances"]))
+
+    # Recent rows of DEBTO/SUNCR accounts only, as the detail fetch reads them
+    assert estimates["acc_ledgers"]["rows"] == 2 == len(db.fetch_pushdown("acc_ledgers"))
+    assert estimates["acc_ledgers"]["scope"] == "last 90 days and undated"
+    # C1: 2020-01, 2020-02 and this month; C2: 2020-01 and this month
+    assert estimates["acc_ledger_balances"]["rows"] == 5 == len(db.fetch_acc_ledger_balances())
+    assert estimates["acc_ledger_balances"]["requests"] == 1
+
+
+def test_aggregated_mode_keeps_undated_ledger_rows(tmp_path, monkeypatch):
+    tool = make_tool(tmp_path, monkeypatch, ledger_mode="aggregated", pushdown=True)
+    db = tool.db_connector
+    _add_ledgers(db.connection, [("C1", None), ("X1", None)])
+
+    estimates = tool.estimate(tool.select_tables(["acc_ledgers", "acc_ledger_balances"]))
+
+    # The balances have no period for them, so the detail rows must carry them
+    detail = db.fetch_pushdown("acc_ledgers")
+    assert [row["entry_date"] for row in detail if row["code"] == "C1"].count(None) == 1
+    assert estimates["acc_ledgers"]["rows"] == 3 == len(detail)
+    assert all(row["period"] for row in tool.validate_acc_ledger_balances_data(db.fetch_acc_ledger_balances()))
+def test_cdc_counts_only_the_changed_accounts(tmp_path, monkeypatch):
+    tool = make_tool(tmp_path, monkeypatch, extraction_mode="cdc")
+    connection = tool.db_connector.connection
+    sync.ChangeCapture(connection, "sqlite").install()
+    _add_ledgers(connection, [("C1", date.today()), ("C1", None)])
+
+    estimates = tool.estimate(tool.select_tables(["acc_ledgers", "acc_master"]))
+
+    # Every C1 row is re-read, nothing of C2
+    assert estimates["acc_ledgers"]["rows"] == 6
+    assert estimates["acc_ledgers"]["scope"] == "1 changed keys"
+    assert estimates["acc_ledgers"]["requests"] == 1
+    assert estimates["acc_master"]["rows"] == 0
+    assert estimates["acc_master"]["requests"] == 0
+    # Estimating does not acknowledge anything
+    assert sync.ChangeCapture(connection, "sqlite").drain("acc_ledgers")[1] == ["C1"]
+
+
+def test_sealed_periods_are_not_counted(tmp_path, monkeypatch):
+    tool = make_tool(tmp_path, monkeypatch, period_partitions=True)
+    config = tool.config
+    boundary = sync.PeriodPartitions.closed_before(date.today(), config.financial_year_start_month,
+                                                   config.open_financial_years)
+    spec = tool.select_tables(["acc_ledgers"])
+    first = tool.estimate(spec)["acc_ledgers"]
+    assert (first["rows"], first["scope"]) == (6, "all periods")
+
+    tool.partitions.seal("acc_ledgers", boundary, {"2020-01": ["3", "x"], "2020-02": ["1", "x"]})
+    estimate = tool.estimate(spec)["acc_ledgers"]
+
+    assert estimate["rows"] == 2
+    assert estimate["scope"] == "open periods"
@@ -0,0 +1,158 @@
+import math
+import random
+import sqlite3
+from datetime import date
+
+import pytest
+
+from sync import (VALIDATOR_SCHEMAS, compile_pushdown_validator, compile_validator,
+                  generate_pushdown_select)
+
+
+@pytest.mark.parametrize("column, expected", [
+    (("f", "src", "raw", ''), 'e AS "f"'),
+    (("f", "src", "str_strip"), 'TRIM(e) AS "f"'),
+    (("f", "src", "str_strip_or", ''), '''CASE WHEN e IS NULL OR TRIM(e) = '' THEN '' ELSE TRIM(e) END AS "f"'''),
+    (("f", "src", "str_strip_or", None), '''CASE WHEN e IS NULL OR TRIM(e) = '' THEN NULL ELSE TRIM(e) END AS "f"'''),
+    (("f", "src", "strip_or_none"), '''CASE WHEN e IS NULL OR TRIM(e) = '' THEN NULL ELSE TRIM(e) END AS "f"'''),
+    (("f", "src", "str_or_none"), '''CASE WHEN e IS NULL OR TRIM(e) = '' THEN NULL ELSE CAST(e AS LONG VARCHAR) END AS "f"'''),
+    (("f", "src", "int"), 'CAST(e AS INTEGER) AS "f"'),
+    (("f", "src", "float_or_none"), 'CAST(e AS DOUBLE) AS "f"'),
+    (("f", "src", "float_safe"), 'CASE WHEN ISNUMERIC(e) = 1 THEN CAST(e AS DOUBLE) END AS "f"'),
+    (("f", "src", "float_truthy"), 'CASE WHEN e <> 0 THEN CAST(e AS DOUBLE) END AS "f"'),
+    (("f", "src", "date"), '''DATEFORMAT(e, 'YYYY-MM-DD') AS "f"'''),
+    (("f", "src", "call", "parse_ledger_date"), '''DATEFORMAT(e, 'YYYY-MM-DD') AS "f"'''),
+    (("f", "src", "call", "parse_voucher_no"),
+     'CASE WHEN ISNUMERIC(e) = 1 THEN CAST(TRUNCNUM(CAST(e AS DOUBLE), 0) AS BIGINT) END AS "f"'),
+    (("f", "src", "call", "clean_area"),
+     '''CASE WHEN e IS NULL OR TRIM(e) IN ('', 'No Area') THEN NULL ELSE TRIM(e) END AS "f"'''),
+])
+def test_select_expression_per_kind(column, expected):
+    select, filters = generate_pushdown_select({"columns": [column]}, {"src": "e"})
+    assert select == expected
+    assert filters == (["e IS NOT NULL"] if column[2] == "int" else [])
+
+
+def test_const_columns_are_left_to_the_pass_through():
+    schema = {"columns": [("code", "code", "raw", ''), ("client_id", None, "const", "client_id")]}
+    assert generate_pushdown_select(schema, {})[0] == 'code AS "code"'
+    rows = compile_pushdown_validator("t", schema, {"client_id": "X"})([{"code": "C1"}])
+    assert rows == [{"code": "C1", "client_id": "X"}]
+    assert compile_pushdown_validator("t", {"columns": [("code", "code", "raw", '')]}) is list
+
+
+def test_required_filter_matches_column_type():
+    schema = {"required": ["code", "id"], "numeric": ["id"], "columns": []}
+    _, filters = generate_pushdown_select(schema, {"code": "m.code"})
+    assert filters == ["m.code IS NOT NULL AND TRIM(m.code) <> ''", "id IS NOT NULL AND id <> 0"]
+    # users.id is not a character column: never compared with ''
+    _, filters = generate_pushdown_select(VALIDATOR_SCHEMAS["users"], {})
+    assert filters == ["id IS NOT NULL AND id <> 0", "pass IS NOT NULL AND TRIM(pass) <> ''"]
+
+
+# Typed source values per field, as the database columns can hold them:
+# padded and empty strings, zeros, NULLs, numeric strings in character columns.
+# Blank-only strings are left out: pushdown treats them as empty, like SQL
+# Anywhere's blank-insensitive comparisons do (test_blank_only_values_are_empty)
+_TEXT = ["Sales", "  Payment ", "", None]
+_CODES = ["C001", " C002 ", "", None]
+_MONEY = [0, 1, 12.5, -3, None]
+_DATES = [date(2024, 4, 1), date(2023, 12, 31), None]
+SOURCE_VALUES = {
+    "users": {"id": [1, 27, 0, None], "pass": ["p", " p ", "", None], "role": ["admin ", "", None],
+              "accountcode": ["A1", " A2 ", None]},
+    "misel": {"firm_name": ["Firm", " Firm ", "", None], "address": _TEXT, "phones": ["1", None],
+              "mobile": [None], "address1": ["a"], "address2": [""], "address3": [None], "pagers": [None],
+              "tinno": ["T1", None]},
+    "acc_master": {"code": _CODES, "name": _TEXT, "super_code": ["DEBTO", "SUNCR ", "", None],
+                   "opening_balance": _MONEY, "debit": _MONEY, "credit": _MONEY, "place": _TEXT,
+                   "phone2": ["123", None], "openingdepartment": ["Main", "", None],
+                   "area": ["No Area", " North ", "", None]},
+    "acc_ledgers": {"code": _CODES, "particulars": _TEXT, "debit": _MONEY, "credit": _MONEY,
+                    "entry_mode": ["S", "R", None], "entry_date": _DATES,
+                    "voucher_no": ["12", " 14 ", "15.0", "15.9", "x", "", None], "narration": _TEXT,
+                    "super_code": ["DEBTO", " BANK", None]},
+    "acc_invmast": {"modeofpayment": ["C"], "customerid": _CODES, "invdate": _DATES, "nettotal": _MONEY,
+                    "paid": _MONEY, "bill_ref": ["S-1", None]},
+    "cashandbankaccmaster": {"code": _CODES, "name": _TEXT, "super_code": ["CASH", "BANK"],
+                             "opening_balance": _MONEY, "opening_date": _DATES, "debit": _MONEY,
+                             "credit": _MONEY},
+    "acc_tt_servicemaster": {"slno": [1, 2, None], "type": ["AREA", "", None], "code": ["N", None],
+                             "name": ["North", ""]},
+}
+
+
+def _isnumeric(value):
+    if value is None:
+        return 0
+    try:
+        float(value)
+        return 1
+    except (TypeError, ValueError):
+        return 0
+
+
+def _sqlite_connection():
+    """sqlite3 standing in for SQL Anywhere: DATE columns come back as dates, helpers emulated"""
+    sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+    connection = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+    connection.create_function("ISNUMERIC", 1, _isnumeric, deterministic=True)
+    connection.create_function("TRUNCNUM", 2, lambda value, digits: None if value is None else math.trunc(value),
+                               deterministic=True)
+    connection.create_function("DATEFORMAT", 2, lambda value, fmt: None if value is None else str(value)[:10],
+                               deterministic=True)
+    return connection
+
+
+def _column_type(values):
+    if any(isinstance(v, date) for v in values):
+        return "DATE"
+    if any(isinstance(v, (int, float)) for v in values):
+        return "DOUBLE"
+    return "VARCHAR(64)"
+
+
+@pytest.mark.parametrize("table", sorted(VALIDATOR_SCHEMAS))
+def test_pushdown_query_matches_python_validator(table):
+    values = SOURCE_VALUES[table]
+    fields = list(values)
+    rng = random.Random(table)
+    rows = [tuple(rng.choice(values[f]) for f in fields) for _ in range(500)]
+    connection = _sqlite_connection()
+    connection.execute(f"CREATE TABLE src ({', '.join(f'{f} {_column_type(values[f])}' for f in fields)})")
+    connection.executemany(f"INSERT INTO src VALUES ({', '.join('?' * len(fields))})", rows)
+
+    schema = VALIDATOR_SCHEMAS[table]
+    context = {"client_id": "TEST"}
+    cursor = connection.execute("SELECT rowid, * FROM src ORDER BY rowid")
+    raw = [dict(zip(fields, row[1:])) for row in cursor.fetchall()]
+    expected = compile_validator(table, schema, context)(raw)
+
+    select, filters = generate_pushdown_select(schema, {})
+    cursor = connection.execute(f"SELECT {select} FROM src WHERE 1 = 1"
+                                + "".join(f" AND {f}" for f in filters) + " ORDER BY rowid")
+    columns = [column[0] for column in cursor.description]
+    pushed = compile_pushdown_validator(table, schema, context)([dict(zip(columns, row)) for row in cursor])
+
+    assert expected
+    assert pushed == expected
+
+
+@pytest.mark.parametrize("blank", [" ", "   "])
+def test_blank_only_values_are_empty(blank):
+    schema = {"required": ["code"], "columns": [
+        ("code", "code", "str_strip"), ("name", "name", "str_strip_or", "Unnamed"),
+        ("place", "place", "strip_or_none"), ("phone", "phone", "str_or_none"),
+        ("area", "area", "call", "clean_area")]}
+    select, filters = generate_pushdown_select(schema, {})
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE src (code TEXT, name TEXT, place TEXT, phone TEXT, area TEXT)")
+    connection.executemany("INSERT INTO src VALUES (?, ?, ?, ?, ?)", [
+        ("C1", blank, blank, blank, blank),
+        ("C2", " Main ", " Town ", "123 ", "No Area "),
+        (blank, "dropped", None, None, None),
+    ])
+    cursor = connection.execute(f"SELECT {select} FROM src WHERE 1 = 1"
+                                + "".join(f" AND {f}" for f in filters) + " ORDER BY rowid")
+
+    assert cursor.fetchall() == [("C1", "Unnamed", None, None, None), ("C2", "Main", "Town", "123 ", None)]
@@ -0,0 +1,81 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+import sync
+from mock_api import MockAPIHandler, MockAPIServer
+
+
+class RecordingHandler(MockAPIHandler):
+    def _upload(self, table, query, payload):
+        self.server.uploads.append(payload)
+        return super()._upload(table, query, payload)
+
+
+@pytest.fixture
+def server():
+    server = MockAPIServer()
+    server.httpd.RequestHandlerClass = RecordingHandler
+    server.httpd.uploads = []
+    with server:
+        yield server
+
+
+def _ledger_rows():
+    start = date(2023, 11, 1)
+    rows = [{"code": f"C{i % 7}", "entry_date": (start + timedelta(days=i % 240)).isoformat(),
+             "debit": float(i), "credit": 0.0, "narration": f"entry {i}"} for i in range(600)]
+    rows.append({"code": "C0", "entry_date": None, "debit": 1.0, "credit": 0.0, "narration": "undated"})
+    return json.loads(json.dumps(rows))
+
+
+def _sorted(rows):
+    return sorted(rows, key=lambda row: json.dumps(row, sort_keys=True))
+
+
+def test_mock_verify_matches_local_hashes(server, make_client):
+    rows = _ledger_rows()
+    server.state.tables["acc_ledgers"] = list(rows)
+    client = make_client(server.base_url)
+    local = sync.RangeHashes(rows, "entry_date")
+    assert client.verify_ranges("acc_ledgers", "entry_date", 4) == local.level(4)
+    within = ["2024-02", "2024-03"]
+    assert client.verify_ranges("acc_ledgers", "entry_date", 10, within, 7) == local.level(10, within, 7)
+
+
+def test_only_the_corrupted_range_is_resent(server, make_client):
+    rows = _ledger_rows()
+    client = make_client(server.base_url)
+    endpoint = client.ENDPOINT_ACC_LEDGERS
+
+    assert client.reconcile("acc_ledgers", endpoint, "entry_date", (4, 7, 10), rows, batch_size=200)
+    assert _sorted(server.state.tables["acc_ledgers"]) == _sorted(rows)
+
+    # In sync: verified, nothing uploaded
+    server.httpd.uploads.clear()
+    assert client.reconcile("acc_ledgers", endpoint, "entry_date", (4, 7, 10), rows)
+    assert server.httpd.uploads == []
+
+    stored = server.state.tables["acc_ledgers"]
+    victim = next(row for row in stored if row["entry_date"] == "2024-03-05")
+    victim["debit"] += 0.01
+    assert client.reconcile("acc_ledgers", endpoint, "entry_date", (4, 7, 10), rows)
+
+    assert len(server.httpd.uploads) == 1
+    payload = server.httpd.uploads[0]
+    assert payload["replace_ranges"] == ["2024-03-05"]
+    assert payload["range_length"] == 10
+    assert _sorted(payload["rows"]) == _sorted([row for row in rows if row["entry_date"] == "2024-03-05"])
+    assert _sorted(server.state.tables["acc_ledgers"]) == _sorted(rows)
+
+
+def test_rows_missing_on_the_server_are_restored(server, make_client):
+    rows = _ledger_rows()
+    client = make_client(server.base_url)
+    server.state.tables["acc_ledgers"] = [row for row in rows if row["entry_date"] is not None]
+
+    assert client.reconcile("acc_ledgers", client.ENDPOINT_ACC_LEDGERS, "entry_date", (4, 7, 10), rows)
+
+    assert [payload["replace_ranges"] for payload in server.httpd.uploads] == [[""]]
+    assert _sorted(server.state.tables["acc_ledgers"]) == _sorted(rows)
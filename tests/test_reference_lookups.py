@@ -0,0 +1,73 @@
+import json
+import logging
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import sync
+
+SPECS = {spec.name: spec for spec in sync.TABLE_REGISTRY}
+
+
+def _connector(tmp_path, departments, areas, masters):
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"database": {"dsn": "x", "username": "u", "password": "p"},
+                                  "api": {"base_url": "http://127.0.0.1:1/api"}, "settings": {"client_id": "X"}}))
+    connector = sync.DatabaseConnector(sync.DatabaseConfig(str(config)))
+    connector.connection = sqlite3.connect(":memory:")
+    connector.connection.executescript("""
+        CREATE TABLE acc_departments (department_id, department);
+        CREATE TABLE acc_tt_servicemaster (slno, type, code, name);
+        CREATE TABLE acc_master (code, name, super_code, opening_balance, debit, credit, place, phone2,
+                                 openingdepartment, area);
+    """)
+    connector.connection.executemany("INSERT INTO acc_departments VALUES (?, ?)", departments)
+    connector.connection.executemany("INSERT INTO acc_tt_servicemaster VALUES (?, 'AREA', ?, ?)",
+                                     [(i, code, name) for i, (code, name) in enumerate(areas)])
+    connector.connection.executemany("INSERT INTO acc_master VALUES (?, 'N', 'DEBTO', 0, 0, 0, '', '', ?, ?)",
+                                     [(f"C{i}", dep, area) for i, (dep, area) in enumerate(masters)])
+    return connector
+
+
+def _lookups(departments, areas):
+    tool = sync.SyncTool.__new__(sync.SyncTool)
+    tool.config = SimpleNamespace(resolve_references=True)
+    tool.reference_cache = object()
+    rows = {"acc_departments": [{"department_id": k, "department": v} for k, v in departments],
+            "acc_tt_servicemaster": [{"slno": i, "type": "AREA", "code": k, "name": v}
+                                     for i, (k, v) in enumerate(areas)]}
+    tool._reference_rows = rows.get
+    return tool._reference_kwargs(SPECS["acc_master"]).get("lookups")
+
+
+DEPARTMENTS = [(1, "Main"), (2, "Branch")]
+AREAS = [("N", "North"), ("S", None), ("E", "")]
+
+
+def test_exact_keys_resolve_like_the_joins(tmp_path, caplog):
+    masters = [(1, "N"), (2, "S"), (None, "E"), (3, "W"), (2, None)]
+    connector = _connector(tmp_path, DEPARTMENTS, AREAS, masters)
+    lookups = _lookups(DEPARTMENTS, AREAS)
+    with caplog.at_level(logging.INFO):
+        resolved = connector.fetch_acc_master(lookups=lookups)
+    assert "with the joins" not in caplog.text
+    assert resolved == connector.fetch_acc_master()
+    assert [(r["openingdepartment"], r["area"]) for r in resolved] == [
+        ("Main", "North"), ("Branch", "No Area"), (None, ""), (None, "No Area"), ("Branch", "No Area")]
+
+
+@pytest.mark.parametrize("masters", [[(1, " N")], [(1, "n")], [("01", "N")]],
+                         ids=["padded", "case", "numeric-string"])
+def test_keys_equal_only_under_collation_use_the_joins(tmp_path, caplog, masters):
+    connector = _connector(tmp_path, DEPARTMENTS, AREAS, masters)
+    with caplog.at_level(logging.INFO):
+        resolved = connector.fetch_acc_master(lookups=_lookups(DEPARTMENTS, AREAS))
+    assert "with the joins" in caplog.text
+    assert resolved == connector.fetch_acc_master()
+
+
+@pytest.mark.parametrize("areas", [AREAS + [("N", "North 2")], AREAS + [("n ", "north")]],
+                         ids=["duplicate", "near-duplicate"])
+def test_non_unique_reference_keys_leave_the_join_to_the_database(areas):
+    assert _lookups(DEPARTMENTS, areas) is None
@@ -0,0 +1,101 @@
+import random
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import sync
+from mock_api import MockAPIHandler, MockAPIServer
+
+
+class KeyRecordingHandler(MockAPIHandler):
+    """Records each POST's Idempotency-Key; while busy, answers 503 without applying anything"""
+    def do_POST(self):
+        self.server.keys.append(self.headers.get("Idempotency-Key"))
+        if self.server.busy:
+            self._route()
+            self._body()
+            return self._fail()
+        super().do_POST()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.sleep advances time.monotonic instead of blocking"""
+    real = time.monotonic
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+
+    monkeypatch.setattr(time, "sleep", sleep)
+    monkeypatch.setattr(time, "monotonic", lambda: real() + sum(waits))
+    return waits
+
+
+def _server(busy=False, **options):
+    server = MockAPIServer(fail_methods=("POST",), **options)
+    server.httpd.RequestHandlerClass = KeyRecordingHandler
+    server.httpd.keys = []
+    server.httpd.busy = busy
+    return server
+
+
+def test_retry_after_header_replaces_the_backoff(make_client, clock):
+    with _server(busy=True, retry_after=7) as server:
+        client = make_client(server.base_url, retry={"max_attempts": 3, "base_delay": 0.1})
+        client.start_table("t")
+        res = client._post(client._url("/upload-t/"), [{"i": 1}], 10, table="t")
+
+    assert res.status_code == 503
+    assert clock == [7.0, 7.0]
+    assert client.retry_stats["t"] == {"retries": 2, "retry_wait_seconds": 14.0, "retries_exhausted": 1}
+
+
+def test_retry_after_http_date():
+    class Response:
+        headers = {"Retry-After": format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)}
+
+    assert 25 <= sync.RetryPolicy.retry_after(Response()) <= 30
+    Response.headers = {"Retry-After": "soon"}
+    assert sync.RetryPolicy.retry_after(Response()) is None
+
+
+def test_retries_stop_at_the_table_deadline(make_client, clock):
+    with _server(busy=True, retry_after=5) as server:
+        client = make_client(server.base_url, retry={"max_attempts": 10})
+        client.start_table("t", deadline_seconds=12)
+        client._post(client._url("/upload-t/"), [{"i": 1}], 10, table="t")
+
+    # Waits of 5s fit twice into 12s; the third would overrun it
+    assert len(server.httpd.keys) == 3
+    assert clock == [5.0, 5.0]
+
+
+def test_decorrelated_jitter_stays_within_bounds():
+    policy = sync.RetryPolicy(base_delay=0.5, max_delay=10.0)
+    random.seed(4)
+    delay, seen = policy.base_delay, []
+    for _ in range(2000):
+        previous, delay = delay, policy.backoff(delay)
+        assert policy.base_delay <= delay <= min(policy.max_delay, max(policy.base_delay, previous * 3))
+        seen.append(delay)
+    assert max(seen) == pytest.approx(policy.max_delay, rel=0.2)
+
+
+def test_one_idempotency_key_across_retries(make_client, clock):
+    with _server(busy=True) as server:
+        client = make_client(server.base_url, retry={"max_attempts": 4})
+        client._post(client._url("/upload-t/"), [{"i": 1}], 10, table="t")
+    assert len(server.httpd.keys) == 4
+    assert len(set(server.httpd.keys)) == 1 and server.httpd.keys[0]
+
+    with _server(fail_rate=0.5, seed=2) as server:
+        client = make_client(server.base_url, retry={"max_attempts": 20})
+        for i in range(20):
+            res = client._post(client._url("/upload-t/", append="true"), [{"i": i}], 10, table="t")
+            assert res.status_code == 200
+        # Responses lost after applying were answered from the replay cache, not applied twice
+        assert server.state.replays > 0
+        assert server.state.tables["t"] == [{"i": i} for i in range(20)]
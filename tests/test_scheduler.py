@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+
+import pytest
+
+import sync
+
+
+def spec(name, *depends_on, critical=False):
+    return sync.TableSpec(name, fetch=f"fetch_{name}", validate="v", upload="u", endpoint="/e/",
+                          depends_on=depends_on, critical=critical)
+
+
+class Recorder:
+    """run_node that logs start/end events and returns the scripted status"""
+    def __init__(self, statuses=None, seconds=0.02):
+        self.statuses = statuses or {}
+        self.seconds = seconds
+        self.events = []
+        self.lock = threading.Lock()
+
+    def __call__(self, node):
+        with self.lock:
+            self.events.append(("start", node.name))
+        time.sleep(self.seconds)
+        with self.lock:
+            self.events.append(("end", node.name))
+        status = self.statuses.get(node.name, "success")
+        if status == "raise":
+            raise RuntimeError("boom")
+        return {"status": status}
+
+    def index(self, kind, name):
+        return self.events.index((kind, name))
+
+
+def test_tables_start_after_their_dependencies():
+    specs = [spec("d", "b", "c"), spec("b", "a"), spec("c", "a"), spec("a"), spec("e")]
+    recorder = Recorder()
+
+    results = sync.TableScheduler(specs, recorder, max_workers=3).run()
+
+    assert all(result["status"] == "success" for result in results.values())
+    for node in specs:
+        for dep in node.depends_on:
+            assert recorder.index("end", dep) < recorder.index("start", node.name)
+    # b and c only wait for a, so they run side by side
+    assert recorder.index("start", "c") < recorder.index("end", "b")
+    assert recorder.index("start", "b") < recorder.index("end", "c")
+
+
+def test_dependencies_outside_the_selection_count_as_done():
+    recorder = Recorder()
+    results = sync.TableScheduler([spec("b", "a")], recorder).run()
+    assert results == {"b": {"status": "success"}}
+
+
+def test_failed_dependency_skips_its_dependents():
+    specs = [spec("a"), spec("b", "a"), spec("c", "b"), spec("e"), spec("x"), spec("y", "x")]
+    recorder = Recorder({"a": "failed", "x": "raise"})
+
+    results = sync.TableScheduler(specs, recorder, max_workers=2).run()
+
+    assert results["a"]["status"] == "failed"
+    assert results["x"] == {"status": "failed", "error": "boom"}
+    for name in ("b", "c", "y"):
+        assert results[name] == {"status": "skipped", "error": "dependency failed"}
+        assert ("start", name) not in recorder.events
+    assert results["e"]["status"] == "success"
+
+
+def test_empty_dependency_does_not_block():
+    results = sync.TableScheduler([spec("a"), spec("b", "a")], Recorder({"a": "empty"})).run()
+    assert results["b"]["status"] == "success"
+
+
+def test_critical_failure_aborts_tables_not_started_yet():
+    specs = [spec("master", critical=True), spec("slow"), spec("after", "slow")]
+    recorder = Recorder({"master": "failed"})
+    recorder.seconds = 0.05
+
+    results = sync.TableScheduler(specs, recorder, max_workers=2).run()
+
+    assert results["slow"]["status"] == "success"
+    assert results["after"] == {"status": "skipped", "error": "run aborted"}
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        sync.TableScheduler([spec("a", "b"), spec("b", "a")], Recorder()).run()
+
+
+class SerialCheckingConnector:
+    """Fetch methods that fail the test if two of them ever run at once"""
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def _fetch(self, rows):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        return rows
+
+    def fetch_users(self):
+        return self._fetch([{"id": 1, "pass": "p", "role": "admin", "accountcode": "A"}])
+
+    def fetch_misel(self):
+        return self._fetch([{"firm_name": "Firm", "address": "a", "phones": "1", "mobile": None, "address1": "",
+                             "address2": "", "address3": "", "pagers": None, "tinno": None}])
+
+    def fetch_cashandbankaccmaster(self):
+        return self._fetch([{"code": "B1", "name": "Bank", "super_code": "BANK", "opening_balance": 1,
+                             "opening_date": None, "debit": 0, "credit": 0}])
+
+    def fetch_accttservicemaster(self):
+        return self._fetch([{"slno": 1, "type": "AREA", "code": "N", "name": "North"}])
+
+
+def test_fetches_are_serialized_while_uploads_overlap(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(json.dumps({
+        "database": {"dsn": "x", "username": "u", "password": "p"},
+        "api": {"base_url": "http://127.0.0.1:1/api"},
+        "settings": {"client_id": "X", "log_dir": str(tmp_path)},
+    }))
+    tool = sync.SyncTool("config.json")
+    assert tool.initialize()
+    tool.db_connector = SerialCheckingConnector()
+    tool._db_lock, tool._pool_lock = threading.Lock(), threading.Lock()
+    uploads = {"active": 0, "max_active": 0}
+    lock = threading.Lock()
+
+    def upload(upload_fn, rows, label):
+        with lock:
+            uploads["active"] += 1
+            uploads["max_active"] = max(uploads["max_active"], uploads["active"])
+        time.sleep(0.1)
+        with lock:
+            uploads["active"] -= 1
+        return True
+
+    monkeypatch.setattr(tool, "_upload", upload)
+    specs = tool.select_tables(["users", "misel", "cashandbankaccmaster", "acc_tt_servicemaster"])
+
+    results = sync.TableScheduler(specs, tool.sync_table, max_workers=4).run()
+
+    assert all(result["status"] == "success" for result in results.values()), results
+    assert tool.db_connector.max_active == 1
+    assert uploads["max_active"] > 1
@@ -0,0 +1,27 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _loaded_modules(code):
+    out = subprocess.run([sys.executable, "-c", code + "\nimport sys, json; print(json.dumps(sorted(sys.modules)))"],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return set(json.loads(out.splitlines()[-1]))
+
+
+def test_import_and_client_setup_load_neither_odbc_nor_http(tmp_path):
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({
+        "database": {"dsn": "x", "username": "u", "password": "p"},
+        "api": {"base_url": "http://127.0.0.1:1/api"},
+        "settings": {"client_id": "X", "log_dir": str(tmp_path)},
+    }))
+    # What a dry run sets up besides the database connection
+    modules = _loaded_modules(f"import sync\ntool = sync.SyncTool({str(config)!r}, dry_run=True)\n"
+                              f"assert tool.initialize()")
+    assert "pyodbc" not in modules
+    assert "requests" not in modules
+    assert "urllib3" not in modules
@@ -0,0 +1,101 @@
+import logging
+import threading
+from concurrent.futures import TimeoutError
+from logging.handlers import QueueHandler
+
+import pytest
+
+import sync
+from bench import synthetic_rows
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "sync.log"
+    sync.configure_logging(logging.INFO, str(path), console=False)
+    yield path
+    # The test stops the listener itself to flush the file before reading it
+    sync._log_listener = None
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, QueueHandler)]:
+        root.removeHandler(handler)
+
+
+def test_pool_matches_in_process_and_keeps_worker_warnings(log_file):
+    rows = synthetic_rows("acc_ledgers", 2000)
+    context = {"client_id": "TEST"}
+    validator = sync.compile_validator("acc_ledgers", sync.VALIDATOR_SCHEMAS["acc_ledgers"], context)
+    sync.ROW_WARNINGS.reset()
+    expected = validator(rows)
+    bad_vouchers = sync.ROW_WARNINGS.take_counts()["voucher_no"]
+
+    # The parent has counted warnings of its own before the workers start
+    pool = sync.create_validation_pool(2, context)
+    try:
+        pooled = sync.validate_in_pool(pool, "acc_ledgers", rows, 500)
+    finally:
+        pool.shutdown()
+    sync.ROW_WARNINGS.flush()
+    sync._log_listener.stop()
+
+    assert pooled == expected
+    log = log_file.read_text(encoding="utf-8")
+    # Beyond the parent's own samples: logged in the workers, written by the parent's file handler
+    assert log.count("Could not parse voucher_no") > sync.ROW_WARNINGS.samples
+    assert f"{2 * bad_vouchers} 'voucher_no' warnings in total" in log
+
+
+def test_pool_started_from_a_thread_while_locks_are_held():
+    # A scheduler thread starts the pool while another thread is inside
+    # ROW_WARNINGS: forked workers would inherit the held lock and hang
+    rows = synthetic_rows("acc_ledgers", 200)
+    context = {"client_id": "TEST"}
+    expected = sync.compile_validator("acc_ledgers", sync.VALIDATOR_SCHEMAS["acc_ledgers"], context)(rows)
+    sync.ROW_WARNINGS.reset()
+    columns = tuple(rows[0])
+    chunk = [tuple(row.values()) for row in rows]
+    started = {}
+
+    def start_pool():
+        started["pool"] = sync.create_validation_pool(2, context)
+        started["future"] = started["pool"]._executor.submit(sync._validate_chunk, "acc_ledgers", columns, chunk)
+
+    with sync.ROW_WARNINGS._lock:
+        thread = threading.Thread(target=start_pool)
+        thread.start()
+        thread.join()
+    pool = started["pool"]
+    try:
+        out_columns, values, _ = started["future"].result(timeout=60)
+    except TimeoutError:
+        for process in pool._executor._processes.values():
+            process.kill()
+        raise
+    pool.shutdown()
+
+    assert [dict(zip(out_columns, v)) for v in values] == expected
+
+
+def test_worker_warnings_reach_the_parent_log_file_from_a_scheduler_thread(log_file):
+    rows = synthetic_rows("acc_ledgers", 1000)
+    sync.ROW_WARNINGS.reset()
+    result = {}
+
+    def validate():
+        pool = sync.create_validation_pool(2, {"client_id": "TEST"})
+        try:
+            result["rows"] = sync.validate_in_pool(pool, "acc_ledgers", rows, 250)
+        finally:
+            pool.shutdown()
+
+    thread = threading.Thread(target=validate)
+    thread.start()
+    thread.join(timeout=60)
+    bad_vouchers = sync.ROW_WARNINGS.take_counts()["voucher_no"]
+    sync._log_listener.stop()
+
+    assert result["rows"]
+    log = log_file.read_text(encoding="utf-8")
+    # The parent validated nothing itself: every sample was logged by a worker
+    assert log.count("Could not parse voucher_no") >= min(bad_vouchers, sync.ROW_WARNINGS.samples)
+    assert "Further 'voucher_no' warnings will be counted and summarized" in log